@@ -0,0 +1,307 @@
+"""
+Service de chat multi-sessions (HTTP et WebSocket) :
+
+    python chat_server.py --port 8080            # modèle Bedrock (Titan)
+    python chat_server.py --port 8080 --stub     # modèle local simulé, pour les tests de charge
+
+POST /sessions/<id>/messages {"message": "..."} retourne {"response", "ttft", "total"} ;
+GET /sessions/<id>/ws ouvre un WebSocket qui reçoit les questions en texte et renvoie les morceaux
+de réponse ({"type": "chunk"}) puis {"type": "done"}, ou {"type": "error"} si l'appel est refusé ou échoue
+(POST : 503 ou 502). GET /stats expose l'état du pool et des sessions.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiohttp import WSMsgType, web
+
+from conversation_memory import ConversationMemory
+from streaming_chat import MODEL_ID, TurnStats, stream_completion
+
+# ----------------------------------------------------------------
+# Serveur de chat asynchrone (sessions, pool d'appels au modèle)
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_MAX_WAITING = 256
+DEFAULT_MAX_SESSIONS = 10000
+DEFAULT_SESSION_IDLE_TIMEOUT = 3600
+RETRY_AFTER_SECONDS = 1
+_END = object()
+
+
+def get_configuration(prompt: str) -> str:
+    return json.dumps({
+            "inputText": prompt,
+            "textGenerationConfig": {
+                "maxTokenCount": 4096,
+                "stopSequences": [],
+                "temperature": 0,
+                "topP": 1
+            }
+    })
+
+
+class PoolSaturated(Exception):
+    """
+    Trop d'appels en attente : la requête est refusée plutôt que mise en file sans limite.
+    """
+
+
+class BedrockModel:
+    """
+    Appels en streaming à Bedrock (client boto3 bloquant) exécutés dans un pool de threads borné.
+    """
+    def __init__(self, client, model_id: str = MODEL_ID, max_workers: int = DEFAULT_MAX_CONCURRENCY):
+        self.client = client
+        self.model_id = model_id
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bedrock")
+
+    async def stream(self, body: str) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def pump():
+            try:
+                for text in stream_completion(self.client, body, self.model_id):
+                    loop.call_soon_threadsafe(queue.put_nowait, text)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, _END)
+
+        future = loop.run_in_executor(self._executor, pump)
+        while True:
+            item = await queue.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+        await future
+
+
+class StubModel:
+    """
+    Modèle local pour les tests de charge : répète la dernière ligne du prompt, mot par mot, avec des délais simulés.
+    """
+    def __init__(self, first_token_delay: float = 0.2, token_delay: float = 0.02):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+
+    async def stream(self, body: str) -> AsyncIterator[str]:
+        prompt = json.loads(body)["inputText"]
+        words = f"Echo: {prompt.splitlines()[-1]}".split(" ")
+        await asyncio.sleep(self.first_token_delay)
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+            await asyncio.sleep(self.token_delay)
+
+
+class ModelPool:
+    """
+    Limite le nombre d'appels simultanés au modèle ; au-delà de `max_waiting` appels en attente,
+    les nouveaux sont refusés (PoolSaturated) pour que les clients réessaient plus tard.
+    """
+    def __init__(self, model, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, max_waiting: int = DEFAULT_MAX_WAITING):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def stream(self, body: str) -> AsyncIterator[str]:
+        if self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise PoolSaturated()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            async for text in self.model.stream(body):
+                yield text
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def to_dict(self) -> Dict:
+        return {"active": self.active, "waiting": self.waiting, "rejected": self.rejected,
+                "max_concurrency": self.max_concurrency, "max_waiting": self.max_waiting}
+
+
+class ChatSession:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.memory = ConversationMemory()
+        # Les tours d'une même session sont traités dans l'ordre
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class SessionStore:
+    """
+    Sessions en mémoire ; les plus anciennes sont oubliées au-delà de `max_sessions` ou après `idle_timeout` secondes.
+    """
+    def __init__(self, max_sessions: int = DEFAULT_MAX_SESSIONS, idle_timeout: float = DEFAULT_SESSION_IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+
+    def get(self, session_id: str) -> ChatSession:
+        now = time.monotonic()
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = ChatSession(session_id)
+        session.last_used = now
+        self._sessions.move_to_end(session_id)
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if len(self._sessions) <= self.max_sessions and now - oldest.last_used <= self.idle_timeout:
+                break
+            self._sessions.popitem(last=False)
+        return session
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class ChatService:
+    def __init__(self, pool: ModelPool, sessions: Optional[SessionStore] = None):
+        self.pool = pool
+        self.sessions = sessions if sessions is not None else SessionStore()
+
+    async def turn(self, session_id: str, message: str,
+                   on_chunk: Optional[Callable[[str], Awaitable[None]]] = None) -> Tuple[str, TurnStats]:
+        """
+        Un tour de conversation : la question n'est ajoutée à l'historique qu'avec sa réponse,
+        pour qu'un appel refusé ou en échec ne laisse pas de tour orphelin.
+        """
+        session = self.sessions.get(session_id)
+        async with session.lock:
+            question = "User: " + message
+            history = session.memory.prompt()
+            prompt = f"{history}\n{question}" if history else question
+            stats = TurnStats()
+            parts = []
+            try:
+                async for text in self.pool.stream(get_configuration(prompt)):
+                    stats.token()
+                    parts.append(text)
+                    if on_chunk is not None:
+                        await on_chunk(text)
+            finally:
+                stats.finish()
+            output_text = "".join(parts).strip()
+            session.memory.append(question)
+            session.memory.append(output_text)
+        return output_text, stats
+
+
+# Routes HTTP / WebSocket
+def _saturated_response() -> web.Response:
+    return web.json_response({"error": "Service saturé, réessayez plus tard."}, status=503,
+                             headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+
+async def post_message(request: web.Request) -> web.Response:
+    service: ChatService = request.app["service"]
+    payload = await request.json()
+    message = payload.get("message", "").strip()
+    if not message:
+        return web.json_response({"error": "Le champ 'message' est requis."}, status=400)
+    try:
+        response, stats = await service.turn(request.match_info["session_id"], message)
+    except PoolSaturated:
+        return _saturated_response()
+    except Exception as e:
+        # Échec du modèle (ClientError Bedrock, délai dépassé…) : l'historique de la session est inchangé
+        logger.error(f"Échec du tour de la session {request.match_info['session_id']} : {e}")
+        return web.json_response({"error": "Le modèle n'a pas pu répondre, réessayez."}, status=502)
+    return web.json_response({"response": response, "ttft": stats.time_to_first_token,
+                              "total": stats.total_latency})
+
+
+async def websocket_chat(request: web.Request) -> web.WebSocketResponse:
+    service: ChatService = request.app["service"]
+    session_id = request.match_info["session_id"]
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+    async for msg in ws:
+        if msg.type != WSMsgType.TEXT:
+            continue
+        message = msg.data.strip()
+        if not message:
+            continue
+        try:
+            _, stats = await service.turn(session_id, message,
+                                          on_chunk=lambda text: ws.send_json({"type": "chunk", "text": text}))
+        except PoolSaturated:
+            await ws.send_json({"type": "error", "error": "saturated", "retry_after": RETRY_AFTER_SECONDS})
+            continue
+        except Exception as e:
+            # Le WebSocket reste ouvert : le client peut reposer sa question
+            logger.error(f"Échec du tour de la session {session_id} : {e}")
+            if ws.closed:
+                break
+            await ws.send_json({"type": "error", "error": "model"})
+            continue
+        await ws.send_json({"type": "done", "ttft": stats.time_to_first_token, "total": stats.total_latency})
+    return ws
+
+
+async def get_stats(request: web.Request) -> web.Response:
+    service: ChatService = request.app["service"]
+    return web.json_response({"pool": service.pool.to_dict(), "sessions": len(service.sessions)})
+
+
+def create_app(model, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+               max_waiting: int = DEFAULT_MAX_WAITING) -> web.Application:
+    app = web.Application()
+    app["service"] = ChatService(ModelPool(model, max_concurrency, max_waiting))
+    app.router.add_post("/sessions/{session_id}/messages", post_message)
+    app.router.add_get("/sessions/{session_id}/ws", websocket_chat)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+def bedrock_model(max_concurrency: int) -> BedrockModel:
+    import boto3
+    from botocore.config import Config
+    # Un seul client partagé, avec autant de connexions que d'appels simultanés
+    client = boto3.client(service_name='bedrock-runtime', region_name="us-west-2",
+                          endpoint_url=os.environ.get("BEDROCK_ENDPOINT_URL"),
+                          config=Config(max_pool_connections=max_concurrency))
+    return BedrockModel(client, max_workers=max_concurrency)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Service de chat multi-sessions (HTTP / WebSocket).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--stub", action="store_true", help="Utilise un modèle local simulé au lieu de Bedrock")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help="Appels simultanés au modèle")
+    parser.add_argument("--max-waiting", type=int, default=DEFAULT_MAX_WAITING,
+                        help="Appels en attente au-delà desquels les requêtes sont refusées (503)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    model = StubModel() if args.stub else bedrock_model(args.max_concurrency)
+    web.run_app(create_app(model, args.max_concurrency, args.max_waiting), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import re
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+# ----------------------------------------------------------------
+# Mémoire de conversation bornée (budget de tokens, résumé glissant)
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+DEFAULT_MAX_TOKENS = 3000
+DEFAULT_KEEP_LAST = 6
+DEFAULT_SUMMARY_MAX_TOKENS = 400
+# Après une éviction, la mémoire redescend à cette fraction du budget : les évictions (et la
+# reconstruction du préfixe) ont lieu par paquets plutôt qu'à chaque tour
+EVICTION_TARGET = 0.75
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+SUMMARY_SENTENCE_WORDS = 30
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimation du nombre de tokens (environ 4 caractères par token pour les modèles Titan / Claude).
+    """
+    return max(1, (len(text) + 3) // 4)
+
+
+def first_sentence_summary(turns: List[str]) -> List[str]:
+    """
+    Résumé extractif par défaut : la première phrase (tronquée) de chaque tour évincé.
+    """
+    lines = []
+    for turn in turns:
+        sentence = _SENTENCE_END.split(turn.strip(), maxsplit=1)[0]
+        words = sentence.split()
+        if len(words) > SUMMARY_SENTENCE_WORDS:
+            sentence = " ".join(words[:SUMMARY_SENTENCE_WORDS]) + " ..."
+        if sentence:
+            lines.append("- " + sentence)
+    return lines
+
+
+class ConversationMemory:
+    """
+    Historique d'une session : les `keep_last` derniers tours sont conservés mot pour mot ; quand le budget
+    de tokens est dépassé, les plus anciens sont évincés vers un résumé glissant (lui-même borné).
+    Le prompt sérialisé est mis en cache et prolongé à chaque tour, sans être reconstruit entièrement.
+    """
+    def __init__(self, max_tokens: int = DEFAULT_MAX_TOKENS, keep_last: int = DEFAULT_KEEP_LAST,
+                 summary_max_tokens: int = DEFAULT_SUMMARY_MAX_TOKENS,
+                 token_counter: Callable[[str], int] = estimate_tokens,
+                 summarizer: Callable[[List[str]], List[str]] = first_sentence_summary):
+        self.max_tokens = max_tokens
+        self.keep_last = keep_last
+        # Le résumé ne peut occuper plus de la moitié du budget
+        self.summary_max_tokens = min(summary_max_tokens, max_tokens // 2)
+        self.count_tokens = token_counter
+        self.summarize = summarizer
+        self.turns: Deque[Tuple[str, int]] = deque()
+        self.summary: Deque[Tuple[str, int]] = deque()
+        self._turn_tokens = 0
+        self._summary_tokens = 0
+        self._prompt: Optional[str] = None
+
+    @property
+    def tokens(self) -> int:
+        return self._turn_tokens + self._summary_tokens
+
+    def append(self, text: str) -> None:
+        tokens = self.count_tokens(text)
+        self.turns.append((text, tokens))
+        self._turn_tokens += tokens
+        if self.tokens > self.max_tokens and len(self.turns) > self.keep_last:
+            self._evict()
+        elif self._prompt is not None:
+            # Cas courant : le préfixe en cache est simplement prolongé
+            self._prompt = f"{self._prompt}\n{text}" if self._prompt else text
+
+    def _evict(self) -> None:
+        target = int(self.max_tokens * EVICTION_TARGET)
+        evicted = []
+        while self.tokens > target and len(self.turns) > self.keep_last:
+            text, tokens = self.turns.popleft()
+            self._turn_tokens -= tokens
+            evicted.append(text)
+        for line in self.summarize(evicted):
+            tokens = self.count_tokens(line)
+            self.summary.append((line, tokens))
+            self._summary_tokens += tokens
+        while self._summary_tokens > self.summary_max_tokens and self.summary:
+            _, tokens = self.summary.popleft()
+            self._summary_tokens -= tokens
+        self._prompt = None
+
+    def prompt(self) -> str:
+        """
+        Historique sérialisé (résumé puis derniers tours), mis en cache entre deux tours.
+        """
+        if self._prompt is None:
+            parts = []
+            if self.summary:
+                parts.append(SUMMARY_HEADER)
+                parts.extend(line for line, _ in self.summary)
+            parts.extend(text for text, _ in self.turns)
+            self._prompt = "\n".join(parts)
+        return self._prompt
+
+    def clear(self) -> None:
+        self.turns.clear()
+        self.summary.clear()
+        self._turn_tokens = 0
+        self._summary_tokens = 0
+        self._prompt = None
@@ -0,0 +1,121 @@
+import json
+import time
+import base64
+import struct
+import binascii
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+# Serveur local qui imite les API de streaming de Bedrock Runtime (InvokeModelWithResponseStream et
+# ConverseStream) au format binaire application/vnd.amazon.eventstream, pour tester les chatbots hors ligne :
+#
+#     client = boto3.client("bedrock-runtime", endpoint_url=server.base_url, region_name="us-west-2",
+#                           aws_access_key_id="test", aws_secret_access_key="test")
+
+
+def default_reply(prompt):
+    return f"Echo: {prompt.strip().splitlines()[-1] if prompt.strip() else ''}"
+
+
+def encode_event(event_type, payload):
+    """
+    Encode un message event-stream (prélude, en-têtes, charge utile, CRC32).
+    """
+    headers = b""
+    for name, value in ((":event-type", event_type), (":content-type", "application/json"),
+                        (":message-type", "event")):
+        name, value = name.encode("utf-8"), value.encode("utf-8")
+        headers += struct.pack("!B", len(name)) + name + struct.pack("!BH", 7, len(value)) + value
+    body = json.dumps(payload).encode("utf-8")
+    total_length = 16 + len(headers) + len(body)
+    prelude = struct.pack("!II", total_length, len(headers))
+    message = prelude + struct.pack("!I", binascii.crc32(prelude)) + headers + body
+    return message + struct.pack("!I", binascii.crc32(message))
+
+
+def split_tokens(text):
+    """
+    Découpe la réponse en morceaux d'un mot (espace compris), comme les deltas du modèle.
+    """
+    words = text.split(" ")
+    return [word + " " for word in words[:-1]] + [words[-1]]
+
+
+class FakeBedrockHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 3 or parts[0] != "model":
+            self.send_error(404)
+            return
+        model_id, operation = unquote(parts[1]), parts[2]
+        self.server.requests.append((operation, model_id, body))
+        if operation == "invoke-with-response-stream":
+            prompt = body.get("inputText", "")
+            events = self._invoke_events(self.server.reply(prompt), prompt)
+        elif operation == "converse-stream":
+            prompt = "\n".join(block.get("text", "") for message in body.get("messages", [])
+                               for block in message.get("content", []))
+            events = self._converse_events(self.server.reply(prompt), prompt)
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.amazon.eventstream")
+        self.send_header("x-amzn-bedrock-content-type", "application/json")
+        self.end_headers()
+        time.sleep(self.server.first_token_delay)
+        for event_type, payload in events:
+            self.wfile.write(encode_event(event_type, payload))
+            self.wfile.flush()
+            time.sleep(self.server.token_delay)
+
+    def _invoke_events(self, reply, prompt):
+        tokens = split_tokens(reply)
+        for i, token in enumerate(tokens):
+            chunk = {"outputText": token, "index": 0, "totalOutputTextTokenCount": None,
+                     "completionReason": None, "inputTextTokenCount": None}
+            if i == len(tokens) - 1:
+                chunk.update({"totalOutputTextTokenCount": len(tokens), "completionReason": "FINISH",
+                              "inputTextTokenCount": len(prompt.split()),
+                              "amazon-bedrock-invocationMetrics": {"inputTokenCount": len(prompt.split()),
+                                                                   "outputTokenCount": len(tokens)}})
+            data = base64.b64encode(json.dumps(chunk).encode("utf-8")).decode("ascii")
+            yield "chunk", {"bytes": data}
+
+    def _converse_events(self, reply, prompt):
+        tokens = split_tokens(reply)
+        yield "messageStart", {"role": "assistant"}
+        for token in tokens:
+            yield "contentBlockDelta", {"contentBlockIndex": 0, "delta": {"text": token}}
+        yield "contentBlockStop", {"contentBlockIndex": 0}
+        yield "messageStop", {"stopReason": "end_turn"}
+        yield "metadata", {"usage": {"inputTokens": len(prompt.split()), "outputTokens": len(tokens),
+                                     "totalTokens": len(prompt.split()) + len(tokens)},
+                           "metrics": {"latencyMs": 0}}
+
+
+def start_fake_bedrock(host="127.0.0.1", port=0, reply=default_reply, first_token_delay=0.0, token_delay=0.0):
+    """
+    Démarre le serveur dans un thread et le retourne (server.base_url, server.requests).
+    `reply(prompt)` calcule le texte renvoyé, diffusé mot par mot.
+    """
+    server = ThreadingHTTPServer((host, port), FakeBedrockHandler)
+    server.daemon_threads = True
+    server.base_url = f"http://{host}:{server.server_address[1]}"
+    server.requests = []
+    server.reply = reply
+    server.first_token_delay = first_token_delay
+    server.token_delay = token_delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    server = start_fake_bedrock(port=8766, first_token_delay=0.3, token_delay=0.05)
+    print(f"Bedrock Runtime simulé disponible sur {server.base_url}")
+    threading.Event().wait()
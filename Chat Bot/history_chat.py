@@ -1,12 +1,17 @@
+import os
 import boto3
 import json
 
-client = boto3.client(service_name='bedrock-runtime', region_name="us-west-2")
+from conversation_memory import ConversationMemory
+from streaming_chat import TurnStats, print_stream, stream_completion
 
-history = []
+client = boto3.client(service_name='bedrock-runtime', region_name="us-west-2",
+                      endpoint_url=os.environ.get("BEDROCK_ENDPOINT_URL"))
+
+memory = ConversationMemory(max_tokens=3000, keep_last=6)
 
 def get_history():
-    return "\n".join(history)
+    return memory.prompt()
 
 def get_configuration():
     return json.dumps({
@@ -25,15 +30,10 @@ print(
 
 while True:
     user_input = input("User: ")
-    history.append("User: " + user_input)
+    memory.append("User: " + user_input)
     if user_input.lower() == "exit":
         break
-    response = client.invoke_model(
-        body=get_configuration(), 
-        modelId="amazon.titan-text-express-v1", 
-        accept="application/json", 
-        contentType="application/json")
-    response_body = json.loads(response.get('body').read())
-    output_text = response_body.get('results')[0].get('outputText').strip()
-    print(output_text)
-    history.append(output_text)
+    stats = TurnStats()
+    output_text = print_stream(stream_completion(client, get_configuration(), stats=stats)).strip()
+    print(stats.summary())
+    memory.append(output_text)
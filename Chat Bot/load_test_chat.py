@@ -0,0 +1,99 @@
+"""
+Test de charge du service de chat :
+
+    python load_test_chat.py --sessions 500 --turns 3                 # serveur local avec le modèle simulé
+    python load_test_chat.py --url http://127.0.0.1:8080 --sessions 200
+
+Chaque session envoie ses questions l'une après l'autre (POST /sessions/<id>/messages) ; les sessions sont
+concurrentes. Affiche les latences (médiane, p95, max), le nombre de refus (503) et le débit.
+"""
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict, List
+
+import aiohttp
+from aiohttp import web
+
+from chat_server import DEFAULT_MAX_CONCURRENCY, DEFAULT_MAX_WAITING, StubModel, create_app
+
+# ----------------------------------------------------------------
+# Test de charge (sessions concurrentes)
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run_session(http: aiohttp.ClientSession, url: str, session_id: str, turns: int, results: Dict) -> None:
+    for turn in range(turns):
+        started = time.perf_counter()
+        async with http.post(f"{url}/sessions/{session_id}/messages",
+                             json={"message": f"Question {turn} de la session {session_id}"}) as response:
+            await response.read()
+            if response.status == 503:
+                results["rejected"] += 1
+                continue
+            response.raise_for_status()
+        results["latencies"].append(time.perf_counter() - started)
+
+
+async def run_load_test(url: str, sessions: int, turns: int) -> Dict:
+    results = {"latencies": [], "rejected": 0}
+    started = time.perf_counter()
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as http:
+        await asyncio.gather(*(run_session(http, url, f"s{i}", turns, results) for i in range(sessions)))
+    elapsed = time.perf_counter() - started
+    latencies = results["latencies"]
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "rejected": results["rejected"],
+        "elapsed": elapsed,
+        "turns_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_max": max(latencies, default=0.0),
+    }
+
+
+async def run_with_local_server(args) -> Dict:
+    model = StubModel(first_token_delay=args.stub_latency, token_delay=args.stub_token_delay)
+    runner = web.AppRunner(create_app(model, args.max_concurrency, args.max_waiting))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        return await run_load_test(f"http://127.0.0.1:{port}", args.sessions, args.turns)
+    finally:
+        await runner.cleanup()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Test de charge du service de chat.")
+    parser.add_argument("--url", help="Serveur à tester (par défaut : serveur local avec le modèle simulé)")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("--max-waiting", type=int, default=DEFAULT_MAX_WAITING)
+    parser.add_argument("--stub-latency", type=float, default=0.2, help="Délai du premier token simulé (s)")
+    parser.add_argument("--stub-token-delay", type=float, default=0.02, help="Délai entre deux mots simulés (s)")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        report = asyncio.run(run_load_test(args.url.rstrip("/"), args.sessions, args.turns))
+    else:
+        report = asyncio.run(run_with_local_server(args))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
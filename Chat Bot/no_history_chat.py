@@ -1,17 +1,31 @@
+import os
+import sys
 import boto3
 import json
 
-client = boto3.client(service_name='bedrock-runtime', region_name="us-west-2")
+# Racine du dépôt sur le chemin d'import : le script se lance aussi depuis Chat Bot/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from genia.response_cache import DiskBackend, ResponseCache, bedrock_embedder
+from streaming_chat import MODEL_ID, TurnStats, print_stream, stream_completion
+
+client = boto3.client(service_name='bedrock-runtime', region_name="us-west-2",
+                      endpoint_url=os.environ.get("BEDROCK_ENDPOINT_URL"))
+
+# Sans historique, la réponse ne dépend que de la question : les questions déjà posées
+# (ou très proches) sont servies depuis le cache local
+cache = ResponseCache(DiskBackend(), embed=bedrock_embedder(client))
+
+generation_config = {
+    "maxTokenCount": 4096,
+    "stopSequences": [],
+    "temperature": 0,
+    "topP": 1
+}
 
 def get_configuration(prompt:str):
     return json.dumps({
             "inputText": prompt,
-            "textGenerationConfig": {
-                "maxTokenCount": 4096,
-                "stopSequences": [],
-                "temperature": 0,
-                "topP": 1
-            }
+            "textGenerationConfig": generation_config
     })
 
 print(
@@ -22,10 +36,12 @@ while True:
     user_input = input("User: ")
     if user_input.lower() == "exit":
         break
-    response = client.invoke_model(
-        body=get_configuration(user_input), 
-        modelId="amazon.titan-text-express-v1", 
-        accept="application/json", 
-        contentType="application/json")
-    response_body = json.loads(response.get('body').read())
-    print(response_body.get('results')[0].get('outputText'))
+    lookup = cache.lookup(user_input, MODEL_ID, generation_config)
+    if lookup.hit:
+        print(lookup.response)
+        print(f"[réponse en cache : {lookup.tier}]")
+        continue
+    stats = TurnStats()
+    output_text = print_stream(stream_completion(client, get_configuration(user_input), stats=stats))
+    print(stats.summary())
+    cache.store(lookup, output_text)
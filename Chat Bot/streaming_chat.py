@@ -0,0 +1,112 @@
+import json
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+# ----------------------------------------------------------------
+# Réponses en streaming (invoke_model_with_response_stream, converse_stream) et mesure de latence
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+MODEL_ID = "amazon.titan-text-express-v1"
+
+
+class TurnStats:
+    """
+    Latences d'un tour de conversation : délai avant le premier token et durée totale.
+    """
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.chunks = 0
+        self.output_tokens: Optional[int] = None
+
+    def token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.chunks += 1
+
+    def finish(self) -> None:
+        self.finished_at = time.perf_counter()
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        return None if self.first_token_at is None else self.first_token_at - self.started_at
+
+    @property
+    def total_latency(self) -> Optional[float]:
+        return None if self.finished_at is None else self.finished_at - self.started_at
+
+    def summary(self) -> str:
+        ttft = self.time_to_first_token
+        ttft_text = "-" if ttft is None else f"{ttft:.2f} s"
+        return f"[premier token : {ttft_text}, total : {self.total_latency or 0:.2f} s, {self.chunks} morceaux]"
+
+
+def stream_completion(client, body: str, model_id: str = MODEL_ID,
+                      stats: Optional[TurnStats] = None) -> Iterator[str]:
+    """
+    Appelle le modèle en streaming et produit le texte au fur et à mesure de son arrivée.
+    `body` est la charge utile de invoke_model (voir get_configuration).
+    """
+    stats = stats if stats is not None else TurnStats()
+    response = client.invoke_model_with_response_stream(
+        body=body,
+        modelId=model_id,
+        accept="application/json",
+        contentType="application/json")
+    try:
+        for event in response["body"]:
+            chunk = event.get("chunk")
+            if chunk is None:
+                continue
+            payload = json.loads(chunk["bytes"])
+            text = payload.get("outputText")
+            if text:
+                stats.token()
+                yield text
+            metrics = payload.get("amazon-bedrock-invocationMetrics")
+            if metrics:
+                stats.output_tokens = metrics.get("outputTokenCount")
+    finally:
+        stats.finish()
+
+
+def stream_converse(client, messages: List[Dict], model_id: str, inference_config: Optional[Dict] = None,
+                    stats: Optional[TurnStats] = None,
+                    on_complete: Optional[Callable[[str], None]] = None) -> Iterator[str]:
+    """
+    Appelle le modèle via converse_stream et produit les deltas de texte au fur et à mesure de leur arrivée.
+    `on_complete(réponse)` est appelé une seule fois, avec la réponse complète, quand le flux se termine
+    (messageStop) ; une réponse interrompue n'est pas transmise.
+    """
+    stats = stats if stats is not None else TurnStats()
+    response = client.converse_stream(modelId=model_id, messages=messages, inferenceConfig=inference_config or {})
+    parts = []
+    complete = False
+    try:
+        for event in response["stream"]:
+            text = event.get("contentBlockDelta", {}).get("delta", {}).get("text")
+            if text:
+                stats.token()
+                parts.append(text)
+                yield text
+            elif "messageStop" in event:
+                complete = True
+            elif "metadata" in event:
+                stats.output_tokens = event["metadata"].get("usage", {}).get("outputTokens")
+    finally:
+        stats.finish()
+    if complete and on_complete is not None:
+        on_complete("".join(parts))
+
+
+def print_stream(chunks: Iterable[str]) -> str:
+    """
+    Affiche les morceaux dès leur réception et retourne le texte complet.
+    """
+    parts = []
+    for text in chunks:
+        print(text, end="", flush=True)
+        parts.append(text)
+    print()
+    return "".join(parts)
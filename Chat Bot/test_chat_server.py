@@ -0,0 +1,102 @@
+import json
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from chat_server import SessionStore, StubModel, create_app
+
+class RecordingModel(StubModel):
+    """
+    Modèle simulé sans délai qui garde les prompts reçus ; échoue sur les questions contenant « panne ».
+    """
+    def __init__(self, first_token_delay=0.0, token_delay=0.0):
+        super().__init__(first_token_delay, token_delay)
+        self.prompts = []
+
+    async def stream(self, body):
+        prompt = json.loads(body)["inputText"]
+        self.prompts.append(prompt)
+        if "panne" in prompt.splitlines()[-1]:
+            raise RuntimeError("ThrottlingException")
+        async for text in super().stream(body):
+            yield text
+
+def run_app(model, scenario, **options):
+    async def main():
+        async with TestClient(TestServer(create_app(model, **options))) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+def test_sessions_keep_separate_histories():
+    model = RecordingModel()
+
+    async def scenario(client):
+        first = await client.post("/sessions/a/messages", json={"message": "Risques à Nantes ?"})
+        assert (await first.json())["response"] == "Echo: User: Risques à Nantes ?"
+        await client.post("/sessions/b/messages", json={"message": "Risques à Lyon ?"})
+        await client.post("/sessions/a/messages", json={"message": "Et les crues ?"})
+        return await (await client.get("/stats")).json()
+
+    stats = run_app(model, scenario)
+
+    assert "Nantes" not in model.prompts[1]
+    assert "Risques à Nantes ?" in model.prompts[2] and "Lyon" not in model.prompts[2]
+    assert stats["sessions"] == 2
+
+def test_session_store_evicts_least_recently_used_and_idle_sessions():
+    store = SessionStore(max_sessions=2, idle_timeout=60)
+    a = store.get("a")
+    store.get("b")
+    assert store.get("a") is a
+    store.get("c")
+    assert len(store) == 2 and store.get("a") is a
+
+    a.last_used -= 120
+    store.get("d")
+    assert store.get("a") is not a
+
+def test_saturated_pool_returns_503():
+    async def scenario(client):
+        responses = await asyncio.gather(*[
+            client.post(f"/sessions/s{i}/messages", json={"message": f"Question {i}"}) for i in range(3)
+        ])
+        return [(response.status, response.headers.get("Retry-After")) for response in responses]
+
+    results = run_app(StubModel(first_token_delay=0.3, token_delay=0), scenario, max_concurrency=1, max_waiting=1)
+
+    assert sorted(status for status, _ in results) == [200, 200, 503]
+    assert [retry for status, retry in results if status == 503] == ["1"]
+
+def test_model_error_returns_json_and_keeps_history_clean():
+    model = RecordingModel()
+
+    async def scenario(client):
+        failed = await client.post("/sessions/a/messages", json={"message": "panne"})
+        await client.post("/sessions/a/messages", json={"message": "Bonjour"})
+        return failed.status, await failed.json()
+
+    status, payload = run_app(model, scenario)
+
+    assert status == 502 and "error" in payload
+    assert "panne" not in model.prompts[1]
+
+def test_websocket_streams_chunks_and_survives_model_errors():
+    async def scenario(client):
+        frames = []
+        async with client.ws_connect("/sessions/a/ws") as ws:
+            for question in ("panne", "Quels risques ?"):
+                await ws.send_str(question)
+                while True:
+                    frame = await ws.receive_json(timeout=5)
+                    frames.append(frame)
+                    if frame["type"] in ("done", "error"):
+                        break
+        return frames
+
+    frames = run_app(RecordingModel(), scenario)
+
+    assert frames[0] == {"type": "error", "error": "model"}
+    chunks = [frame["text"] for frame in frames[1:-1]]
+    assert all(frame["type"] == "chunk" for frame in frames[1:-1])
+    assert "".join(chunks) == "Echo: User: Quels risques ?"
+    assert frames[-1]["type"] == "done" and frames[-1]["total"] >= frames[-1]["ttft"]
@@ -0,0 +1,100 @@
+from conversation_memory import (
+    SUMMARY_HEADER,
+    SUMMARY_SENTENCE_WORDS,
+    ConversationMemory,
+    first_sentence_summary,
+)
+
+def words(text):
+    return len(text.split())
+
+def turn(i, length=10):
+    return f"Tour {i}. " + " ".join(f"mot{i}_{j}" for j in range(length - 2))
+
+def rebuilt_prompt(memory):
+    parts = [SUMMARY_HEADER] + [line for line, _ in memory.summary] if memory.summary else []
+    return "\n".join(parts + [text for text, _ in memory.turns])
+
+def test_turns_within_budget_are_kept_verbatim():
+    memory = ConversationMemory(max_tokens=100, keep_last=2, token_counter=words)
+    for i in range(5):
+        memory.append(turn(i))
+
+    assert memory.prompt() == "\n".join(turn(i) for i in range(5))
+    assert not memory.summary and memory.tokens == 50
+
+def test_oldest_turns_are_evicted_into_the_summary():
+    summarized = []
+
+    def summarizer(turns):
+        summarized.append(list(turns))
+        return first_sentence_summary(turns)
+
+    memory = ConversationMemory(max_tokens=100, keep_last=2, summary_max_tokens=20, token_counter=words,
+                                summarizer=summarizer)
+    for i in range(12):
+        memory.append(turn(i))
+        assert memory.tokens <= 100
+
+    assert [text for text, _ in memory.turns][-2:] == [turn(10), turn(11)]
+    # Les tours évincés le sont par paquets, dans l'ordre, et une seule fois
+    evicted = [text for batch in summarized for text in batch]
+    assert evicted == [turn(i) for i in range(len(evicted))]
+    assert len(summarized) < len(evicted)
+    assert memory.prompt().startswith(SUMMARY_HEADER + "\n- Tour ")
+
+def test_keep_last_turns_survive_even_over_budget():
+    memory = ConversationMemory(max_tokens=50, keep_last=3, token_counter=words)
+    for i in range(6):
+        memory.append(turn(i, length=40))
+
+    assert [text for text, _ in memory.turns] == [turn(i, length=40) for i in (3, 4, 5)]
+
+def test_summary_stays_within_its_budget_and_keeps_recent_lines():
+    memory = ConversationMemory(max_tokens=60, keep_last=1, summary_max_tokens=12, token_counter=words)
+    for i in range(40):
+        memory.append(turn(i))
+
+    assert sum(tokens for _, tokens in memory.summary) <= 12
+    lines = [line for line, _ in memory.summary]
+    assert lines and lines[-1].startswith("- Tour ")
+    # Les lignes les plus anciennes sont oubliées les premières
+    numbers = [int(line.split()[2].rstrip(".")) for line in lines]
+    assert numbers == sorted(numbers) and numbers[0] > 0
+
+def test_summary_budget_is_capped_at_half_the_memory():
+    assert ConversationMemory(max_tokens=100, summary_max_tokens=400).summary_max_tokens == 50
+
+def test_cached_prompt_matches_a_full_rebuild():
+    memory = ConversationMemory(max_tokens=80, keep_last=2, summary_max_tokens=20, token_counter=words)
+    for i in range(25):
+        memory.append(turn(i))
+        assert memory.prompt() == rebuilt_prompt(memory)
+
+def test_cached_prompt_is_extended_between_evictions():
+    memory = ConversationMemory(max_tokens=1000, token_counter=words)
+    memory.append("User: Bonjour")
+    first = memory.prompt()
+
+    memory.append("Bot: Bonjour, que puis-je faire ?")
+
+    assert memory._prompt is not None
+    assert memory.prompt() == first + "\nBot: Bonjour, que puis-je faire ?"
+
+def test_first_sentence_summary_truncates_long_sentences():
+    long_sentence = " ".join(f"mot{i}" for i in range(50)) + ". Suite."
+
+    lines = first_sentence_summary(["User: Quels risques ? Et ensuite.", long_sentence, "   "])
+
+    assert lines[0] == "- User: Quels risques ?"
+    assert lines[1].endswith(" ...") and len(lines[1].split()) == SUMMARY_SENTENCE_WORDS + 2
+    assert len(lines) == 2
+
+def test_clear_resets_everything():
+    memory = ConversationMemory(max_tokens=30, keep_last=1, token_counter=words)
+    for i in range(10):
+        memory.append(turn(i))
+
+    memory.clear()
+
+    assert memory.prompt() == "" and memory.tokens == 0 and not memory.summary
@@ -0,0 +1,70 @@
+import json
+import boto3
+import pytest
+
+from fake_bedrock_server import start_fake_bedrock
+from streaming_chat import TurnStats, stream_completion, stream_converse
+
+@pytest.fixture
+def fake_bedrock():
+    server = start_fake_bedrock(reply=lambda prompt: "Paris est exposé aux inondations.",
+                                first_token_delay=0.2, token_delay=0.01)
+    yield server
+    server.shutdown()
+
+@pytest.fixture
+def client(fake_bedrock):
+    return boto3.client("bedrock-runtime", endpoint_url=fake_bedrock.base_url, region_name="us-west-2",
+                        aws_access_key_id="test", aws_secret_access_key="test")
+
+def test_stream_completion_yields_chunks_as_they_arrive(fake_bedrock, client):
+    body = json.dumps({"inputText": "User: Quels risques pour Paris ?", "textGenerationConfig": {"maxTokenCount": 4096}})
+    stats = TurnStats()
+
+    chunks = list(stream_completion(client, body, stats=stats))
+
+    assert "".join(chunks) == "Paris est exposé aux inondations."
+    assert len(chunks) == stats.chunks == 5
+    assert stats.output_tokens == 5
+    assert fake_bedrock.requests[0][:2] == ("invoke-with-response-stream", "amazon.titan-text-express-v1")
+
+def test_turn_stats_report_time_to_first_token(client):
+    stats = TurnStats()
+    body = json.dumps({"inputText": "User: Bonjour"})
+
+    chunks = stream_completion(client, body, stats=stats)
+    next(chunks)
+    assert stats.time_to_first_token >= 0.2
+    assert stats.total_latency is None
+    list(chunks)
+
+    assert stats.total_latency > stats.time_to_first_token
+
+def test_stream_converse_yields_deltas_in_order_and_stores_answer_once(fake_bedrock, client):
+    stored = []
+    stats = TurnStats()
+    messages = [{"role": "user", "content": [{"text": "Quels risques pour Paris ?"}]}]
+
+    chunks = stream_converse(client, messages, "anthropic.claude-3-sonnet-20240229-v1:0", {"maxTokens": 2000},
+                             stats=stats, on_complete=stored.append)
+    received = []
+    for text in chunks:
+        received.append(text)
+        assert stored == []
+
+    assert received == ["Paris ", "est ", "exposé ", "aux ", "inondations."]
+    assert stored == ["Paris est exposé aux inondations."]
+    assert stats.chunks == stats.output_tokens == 5
+    operation, model_id, body = fake_bedrock.requests[0]
+    assert (operation, model_id) == ("converse-stream", "anthropic.claude-3-sonnet-20240229-v1:0")
+    assert body["messages"] == messages
+
+def test_interrupted_converse_stream_is_not_stored(client):
+    stored = []
+    chunks = stream_converse(client, [{"role": "user", "content": [{"text": "Bonjour"}]}],
+                             "anthropic.claude-3-sonnet-20240229-v1:0", on_complete=stored.append)
+
+    next(chunks)
+    chunks.close()
+
+    assert stored == []
@@ -1,25 +1,61 @@
+import os
+import sys
 import streamlit as st
 import boto3
 import json
 
+# Racine du dépôt (genia) et dossier des chatbots (streaming_chat) sur le chemin d'import : le script se lance aussi depuis TEST/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "Chat Bot"))
+from genia.response_cache import ResponseCache, bedrock_embedder
+from streaming_chat import TurnStats, stream_converse
+
 # Initialiser le client AWS Bedrock
-bedrock = boto3.client("bedrock-runtime")
+bedrock = boto3.client("bedrock-runtime", endpoint_url=os.environ.get("BEDROCK_ENDPOINT_URL"))
+
+MODEL_ID = "anthropic.claude-3-sonnet-20240229-v1:0"
+INFERENCE_CONFIG = {"maxTokens": 2000, "temperature": 0}
+
+@st.cache_resource
+def get_response_cache():
+    """
+    Cache des réponses partagé par toutes les sessions (les questions fréquentes ne rappellent pas le modèle).
+    """
+    return ResponseCache(embed=bedrock_embedder(bedrock))
+
+def stream_answer(client, question, stats, on_complete=None):
+    """
+    Produit la réponse du modèle morceau par morceau (converse_stream) ;
+    `stats` reçoit le délai avant le premier token et la durée totale, `on_complete` la réponse complète.
+    """
+    return stream_converse(client, [{"role": "user", "content": [{"text": question}]}], MODEL_ID,
+                           INFERENCE_CONFIG, stats=stats, on_complete=on_complete)
 
 def chatbot_section():
     st.subheader("🤖 Chatbot IA - Posez vos questions")
-    
+
     # Champ de texte pour la question utilisateur
     user_input = st.text_input("Entrez votre question :", "")
 
     if st.button("Envoyer"):
         if user_input:
-            response = bedrock.converse(
-                modelId="anthropic.claude-3-sonnet-20240229-v1:0",
-                messages=[{"role": "user", "content": [{"text": user_input}]}],
-                inferenceConfig={"maxTokens": 2000, "temperature": 0}
-            )
-
             st.success("✅ Réponse de l'IA :")
-            st.write(response['output']['message']['content'][0]['text'])
+            cache = get_response_cache()
+            lookup = cache.lookup(user_input, MODEL_ID, INFERENCE_CONFIG)
+            if lookup.hit:
+                st.write(lookup.response)
+                st.caption(f"Réponse en cache ({lookup.tier})")
+                return
+            # La réponse est affichée au fur et à mesure de sa génération
+            placeholder = st.empty()
+            stats = TurnStats()
+            answer = ""
+            # La réponse n'est mise en cache qu'une fois complète
+            for text in stream_answer(bedrock, user_input, stats, on_complete=lambda full: cache.store(lookup, full)):
+                answer += text
+                placeholder.markdown(answer + "▌")
+            placeholder.markdown(answer)
+            st.caption(f"Premier token : {stats.time_to_first_token or 0:.2f} s — total : {stats.total_latency:.2f} s")
         else:
             st.warning("Veuillez entrer une question.")
@@ -0,0 +1,105 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Serveur local qui imite l'API datasets de data.gouv.fr (pagination par next_page)
+# et sert les fichiers des ressources, pour tester la collecte hors ligne.
+
+FIXTURE_FILES = {
+    "dicrim-paris.pdf": b"%PDF-1.4 DICRIM Paris" * 50,
+    "pcs-paris.csv": b"commune;risque\nParis;inondation\n",
+    "plu-paris.json": b'{"commune": "Paris", "document": "PLU"}',
+    "notice.txt": b"ne doit pas etre telecharge",
+}
+
+
+def fixture_datasets(base_url):
+    return [
+        {"id": "ds-1", "slug": "dicrim-paris", "resources": [
+            {"url": f"{base_url}/files/dicrim-paris.pdf", "format": "pdf"},
+            {"url": f"{base_url}/files/notice.txt", "format": "txt"},
+        ]},
+        {"id": "ds-2", "slug": "pcs-paris", "resources": [
+            {"url": f"{base_url}/files/pcs-paris.csv", "format": "csv"},
+        ]},
+        {"id": "ds-3", "slug": "plu-paris", "resources": [
+            {"url": f"{base_url}/files/plu-paris.json", "format": "json"},
+            # Même ressource référencée par deux jeux de données
+            {"url": f"{base_url}/files/dicrim-paris.pdf", "format": "pdf"},
+        ]},
+    ]
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        parsed = urlparse(self.path)
+        if parsed.path == "/api/1/datasets/":
+            self._datasets(parse_qs(parsed.query))
+        elif parsed.path.startswith("/files/"):
+            self._file(parsed.path[len("/files/"):])
+        else:
+            self.send_error(404)
+
+    def _datasets(self, query):
+        datasets = fixture_datasets(self.server.base_url)
+        # Comme l'API réelle, la taille de page demandée est plafonnée
+        page_size = min(int(query.get("page_size", ["20"])[0]), self.server.max_page_size)
+        page = int(query.get("page", ["1"])[0])
+        start = (page - 1) * page_size
+        next_page = None
+        if start + page_size < len(datasets):
+            next_page = (f"{self.server.base_url}/api/1/datasets/?q={query.get('q', [''])[0]}"
+                         f"&page_size={page_size}&page={page + 1}")
+        body = json.dumps({
+            "data": datasets[start:start + page_size],
+            "next_page": next_page,
+            "page": page,
+            "page_size": page_size,
+            "total": len(datasets),
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _file(self, name):
+        if name not in FIXTURE_FILES:
+            self.send_error(404)
+            return
+        content = FIXTURE_FILES[name]
+        etag = f'"{name}-{len(content)}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def start_fixture_server(host="127.0.0.1", port=0, max_page_size=2):
+    """
+    Démarre le serveur dans un thread et le retourne (server.base_url, server.api_url, server.requests).
+    """
+    server = ThreadingHTTPServer((host, port), FixtureHandler)
+    server.base_url = f"http://{host}:{server.server_address[1]}"
+    server.api_url = f"{server.base_url}/api/1/"
+    server.requests = []
+    server.max_page_size = max_page_size
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    server = start_fixture_server(port=8765)
+    print(f"API de test disponible sur {server.api_url}")
+    threading.Event().wait()
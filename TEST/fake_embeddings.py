@@ -0,0 +1,42 @@
+import io
+import json
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from genia.rag_pipeline import HashingEmbedder
+
+# Client bedrock-runtime simulé pour les embeddings : vecteurs déterministes (hachage des mots),
+# format de réponse Titan ou Cohere selon le modèle, limitation de débit simulée sur les premiers appels.
+
+class FakeEmbeddingClient:
+    def __init__(self, dimension=64, throttle_first=0, latency=0.0):
+        self.embed = HashingEmbedder(dimension)
+        self.throttle_first = throttle_first
+        self.latency = latency
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def invoke_model(self, body, modelId, **kwargs):
+        payload = json.loads(body)
+        with self._lock:
+            self.calls.append((modelId, payload))
+            throttled = len(self.calls) <= self.throttle_first
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.latency)
+            if throttled:
+                raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Too many requests"}},
+                                  "InvokeModel")
+            if "texts" in payload:
+                result = {"embeddings": [self.embed(text).tolist() for text in payload["texts"]]}
+            else:
+                result = {"embedding": self.embed(payload["inputText"]).tolist()}
+            return {"body": io.BytesIO(json.dumps(result).encode("utf-8"))}
+        finally:
+            with self._lock:
+                self.active -= 1
@@ -0,0 +1,104 @@
+import re
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Serveur local de fichiers avec requêtes conditionnelles (ETag, Last-Modified) et requêtes Range (If-Range),
+# pour tester l'index des téléchargements et le téléchargement par plages hors ligne.
+# server.faults[nom] simule une réponse défectueuse :
+#   "truncate"     : la connexion est coupée à mi-réponse (Content-Length annoncé non atteint)
+#   "short_range"  : réponse 206 plus courte que la plage annoncée dans Content-Range
+#   "wrong_offset" : réponse 206 décalée d'un octet
+#   "ignore_range" : réponse 200 complète à une requête Range
+# Une panne listée dans server.faults_once n'est appliquée qu'une fois.
+
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+_RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)")
+
+
+def etag_for(content):
+    return f'"{hashlib.sha1(content).hexdigest()[:12]}"'
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append((self.path, dict(self.headers)))
+            name = self.path.lstrip("/")
+            content = self.server.files.get(name)
+            fault = self.server.faults.get(name)
+            if fault and name in self.server.faults_once:
+                del self.server.faults[name]
+        if content is None:
+            self.send_error(404)
+            return
+        etag = etag_for(content)
+        if self.headers.get("If-None-Match") == etag or (
+                "If-None-Match" not in self.headers and self.headers.get("If-Modified-Since") == LAST_MODIFIED):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        match = _RANGE_RE.match(self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        if match and fault != "ignore_range" and (if_range is None or if_range in (etag, LAST_MODIFIED)):
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(content) - 1
+            if start >= len(content):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(content)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            end = min(end, len(content) - 1)
+            body = content[start:end + 1]
+            if fault == "short_range":
+                body = body[:len(body) // 2]
+            elif fault == "wrong_offset":
+                body = content[start + 1:end + 2]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(content)}")
+        else:
+            body = content
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if fault == "truncate":
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+class FileServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Client qui abandonne une réponse (plage refusée, téléchargement interrompu) : attendu dans les tests
+        pass
+
+
+def start_file_server(files=None, host="127.0.0.1", port=0):
+    """
+    Démarre le serveur dans un thread et le retourne (server.base_url, server.files, server.faults,
+    server.faults_once, server.requests). Les fichiers sont servis sous /<nom>.
+    """
+    server = FileServer((host, port), FileHandler)
+    server.base_url = f"http://{host}:{server.server_address[1]}"
+    server.files = dict(files or {})
+    server.faults = {}
+    server.faults_once = set()
+    server.requests = []
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,41 @@
+import io
+import threading
+import time
+
+# Client S3 en mémoire (sous-ensemble de l'API boto3 utilisé par les Lambda) pour tester l'ingestion hors ligne.
+# Les envois sont lus par blocs, comme un envoi multipart, avec un délai optionnel par bloc.
+
+class MemoryS3:
+    def __init__(self, part_size=64 * 1024, part_delay=0.0):
+        self.objects = {}
+        self.part_size = part_size
+        self.part_delay = part_delay
+        self.upload_started = threading.Event()
+        self._lock = threading.Lock()
+
+    def upload_fileobj(self, fileobj, bucket, key, **kwargs):
+        self.upload_started.set()
+        parts = []
+        while True:
+            part = fileobj.read(self.part_size)
+            if not part:
+                break
+            parts.append(part)
+            time.sleep(self.part_delay)
+        with self._lock:
+            self.objects[(bucket, key)] = b"".join(parts)
+
+    def upload_file(self, filename, bucket, key, **kwargs):
+        with open(filename, "rb") as f:
+            self.upload_fileobj(f, bucket, key)
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        data = Body if isinstance(Body, bytes) else Body.read()
+        with self._lock:
+            self.objects[(Bucket, Key)] = data
+        return {}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        with self._lock:
+            data = self.objects[(Bucket, Key)]
+        return {"Body": io.BytesIO(data), "ContentLength": len(data)}
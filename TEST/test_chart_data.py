@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from genia.chart_data import histogram_bins, lttb_downsample, lttb_indices, stratified_sample
+
+def communes(rows, groups, seed=0):
+    rng = np.random.default_rng(seed)
+    # Quelques grandes communes et une longue traîne de petites
+    weights = 1 / np.arange(1, groups + 1)
+    names = rng.choice(groups, rows, p=weights / weights.sum())
+    return pd.DataFrame({"commune": [f"c{i}" for i in names], "valeur": rng.random(rows)})
+
+def test_lttb_keeps_endpoints_and_budget():
+    x = np.arange(10000, dtype=float)
+    y = np.sin(x / 100)
+
+    indices = lttb_indices(x, y, 500)
+
+    assert len(indices) == 500 and indices[0] == 0 and indices[-1] == 9999
+    assert (np.diff(indices) > 0).all()
+
+def test_lttb_keeps_isolated_peaks():
+    x = np.arange(5000, dtype=float)
+    y = np.zeros(5000)
+    y[1234] = 100.0
+
+    assert 1234 in lttb_indices(x, y, 50)
+
+def test_lttb_small_thresholds():
+    x = np.arange(10, dtype=float)
+
+    assert lttb_indices(x, x, 20).tolist() == list(range(10))
+    assert lttb_indices(x, x, 2).tolist() == [0, 9]
+    assert lttb_indices(x, x, 0).tolist() == []
+
+def test_lttb_downsample_sorts_and_drops_missing():
+    df = pd.DataFrame({"x": np.arange(3000, 0, -1, dtype=float), "y": np.cos(np.arange(3000) / 50)})
+    df.loc[10, "y"] = np.nan
+
+    sampled = lttb_downsample(df, "x", "y", budget=300)
+
+    assert len(sampled) == 300 and sampled["x"].is_monotonic_increasing
+    assert sampled["y"].notna().all()
+
+@pytest.mark.parametrize("rows, groups, budget", [
+    (20000, 50, 2000),
+    (20000, 1900, 2000),
+    (20000, 2000, 2000),
+    (50000, 8000, 2000),
+    (5000, 4999, 100),
+])
+def test_stratified_sample_never_exceeds_budget(rows, groups, budget):
+    df = communes(rows, groups)
+
+    sampled = stratified_sample(df, "commune", budget=budget)
+
+    assert len(sampled) <= budget
+    assert sampled.index.is_unique and sampled.index.isin(df.index).all()
+
+def test_stratified_sample_many_small_groups_regression():
+    # Plus de communes que de points : l'ancienne règle « au moins une ligne par groupe »
+    # retournait une ligne par commune, bien au-delà du budget
+    df = communes(200000, 35000)
+    df["commune"] = df["commune"].astype("category")
+
+    sampled = stratified_sample(df, "commune", budget=5000)
+
+    assert len(sampled) == 5000
+    assert sampled["commune"].nunique() == 5000
+
+def test_stratified_sample_keeps_every_group_and_proportions():
+    df = communes(20000, 40)
+
+    sampled = stratified_sample(df, "commune", budget=2000, seed=1)
+
+    assert set(sampled["commune"]) == set(df["commune"])
+    share = df["commune"].value_counts(normalize=True)
+    sampled_share = sampled["commune"].value_counts(normalize=True)
+    assert abs(sampled_share["c0"] - share["c0"]) < 0.02
+
+def test_stratified_sample_without_group_column():
+    df = communes(5000, 10)
+
+    assert len(stratified_sample(df, None, budget=100)) == 100
+    assert len(stratified_sample(df, "absente", budget=100)) == 100
+    assert len(stratified_sample(df.head(50), "commune", budget=100)) == 50
+
+def test_histogram_bins_ignores_non_numeric_values():
+    bins = histogram_bins(pd.Series([1, 2, "x", None, 3, np.inf]), maxbins=2)
+
+    assert bins["count"].sum() == 3 and len(bins) == 2
+    assert histogram_bins(pd.Series(["a", None])).empty
@@ -0,0 +1,87 @@
+from genia.chunking import MERGE_SLACK, MinHasher, NearDuplicateFilter, chunk_page, chunk_pages, is_heading
+
+PARAGRAPH = ("La commune de Nantes est exposée aux crues de la Loire et de l'Erdre. "
+             "Les quartiers de l'île de Nantes sont les plus vulnérables en cas de crue centennale. "
+             "Le plan communal de sauvegarde prévoit l'alerte des habitants par SMS et par sirène. "
+             "Les digues sont inspectées chaque automne par les services techniques. ")
+
+def page_text(number, body):
+    return f"VILLE DE NANTES - DICRIM 2024\n{body}\nDocument public - page {number} sur 12"
+
+def test_chunks_follow_sentences_and_record_offsets():
+    text = "2. RISQUE INONDATION\n" + PARAGRAPH * 3
+    chunks = list(chunk_page(4, text, max_tokens=60, overlap_tokens=30, min_tokens=5))
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.page == 4 and chunk.section == "2. RISQUE INONDATION"
+        assert " ".join(text[chunk.start:chunk.end].split()) == chunk.text
+        assert chunk.text.endswith(".") and chunk.tokens <= 60 * 1.25
+    # Recouvrement : chaque morceau reprend la fin du précédent
+    assert all(b.start < a.end for a, b in zip(chunks, chunks[1:]))
+
+def test_headings_start_new_chunks():
+    text = "1. Présentation\nLa ville compte 300 000 habitants.\n2. RISQUE SISMIQUE\nLe zonage sismique est faible."
+    chunks = list(chunk_page(1, text, min_tokens=1))
+
+    assert [c.section for c in chunks] == ["1. Présentation", "2. RISQUE SISMIQUE"]
+    assert chunks[1].text == "2. RISQUE SISMIQUE Le zonage sismique est faible."
+
+def test_repeated_headers_footers_and_duplicate_chunks_are_dropped():
+    pages = [(1, page_text(1, PARAGRAPH)), (2, page_text(2, "Les écoles disposent d'un plan particulier de mise en sûreté.")),
+             (3, page_text(3, PARAGRAPH))]
+
+    chunks = list(chunk_pages(pages))
+
+    assert [c.page for c in chunks] == [1, 2]
+    assert "page 2 sur 12" not in chunks[1].text and "VILLE DE NANTES" not in chunks[1].text
+
+def test_chunks_differing_only_in_figures_are_kept():
+    pages = [(1, page_text(1, "Zone A : 1250 habitants exposés, crue de référence de 1910, hauteur d'eau 2.5 m.")),
+             (2, page_text(2, "Zone B : 3400 habitants exposés, crue de référence de 1955, hauteur d'eau 1.8 m."))]
+
+    assert [c.page for c in chunk_pages(pages, min_tokens=1)] == [1, 2]
+
+def test_heading_at_end_of_page_applies_to_next_page():
+    pages = [(1, "1. RISQUE INONDATION\nLa Loire déborde au printemps.\n2. PLAN DE SECOURS"),
+             (2, "Les habitants sont alertés par sirène.")]
+
+    chunks = list(chunk_pages(pages, min_tokens=1, dedupe=False))
+
+    assert [(c.page, c.section) for c in chunks] == [(1, "1. RISQUE INONDATION"), (2, "2. PLAN DE SECOURS")]
+
+def test_decimals_do_not_end_sentences():
+    chunks = list(chunk_page(1, "La hauteur d'eau atteint 2.5 m en 1910. Les digues ont cédé.", min_tokens=1))
+
+    assert chunks[0].text == "La hauteur d'eau atteint 2.5 m en 1910. Les digues ont cédé."
+
+def test_near_duplicate_filter():
+    seen = NearDuplicateFilter(hasher=MinHasher(mask_digits=True))
+
+    assert not seen.seen("Direction de la prévention des risques - page 1 sur 40")
+    assert seen.seen("Direction de la prévention des risques - page 17 sur 40")
+    assert not seen.seen("Le risque de submersion marine concerne le littoral.")
+
+def test_heading_detection():
+    assert is_heading("3.2 Mesures de prévention")
+    assert is_heading("RISQUE TECHNOLOGIQUE")
+    assert not is_heading("La ville est traversée par la Seine.")
+
+def test_unpunctuated_page_is_split_to_the_token_budget():
+    words = [f"mot{i}" for i in range(3000)]
+
+    chunks = list(chunk_pages([(1, " ".join(words))], max_tokens=300, overlap_tokens=0))
+
+    assert len(chunks) > 10
+    assert max(chunk.tokens for chunk in chunks) <= 300 * MERGE_SLACK
+    assert " ".join(chunk.text for chunk in chunks).split() == words
+
+def test_table_lines_are_split_at_line_breaks():
+    rows = [f"Commune {i} | {1000 + i} habitants | zone {i % 7}" for i in range(400)]
+
+    chunks = list(chunk_pages([(3, "\n".join(rows))], max_tokens=300, overlap_tokens=0))
+
+    assert len(chunks) > 1
+    assert max(chunk.tokens for chunk in chunks) <= 300 * MERGE_SLACK
+    # Aucune ligne du tableau n'est coupée en deux
+    assert all(chunk.text.startswith("Commune ") and chunk.text.endswith(tuple("0123456")) for chunk in chunks)
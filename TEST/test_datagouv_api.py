@@ -0,0 +1,63 @@
+import json
+import os
+import pytest
+
+from datagouv_fixture_server import start_fixture_server
+from genia.scraper import find_and_download_files
+from genia.datagouv_api import JSONPageStream
+from genia.crawl import main
+
+@pytest.fixture
+def fixture_server():
+    server = start_fixture_server()
+    yield server
+    server.shutdown()
+
+def test_api_backend_downloads_matching_resources(fixture_server, tmp_path):
+    # Le serveur renvoie deux jeux de données par page : le curseur next_page doit être suivi
+    downloaded = find_and_download_files("Paris", str(tmp_path), ["pdf", "csv", "json"],
+                                         backend="api", api_url=fixture_server.api_url)
+
+    assert sorted(os.path.basename(path) for path in downloaded) == ["dicrim-paris.pdf", "pcs-paris.csv", "plu-paris.json"]
+    with open(tmp_path / "Paris" / "download_summary.json", encoding="utf-8") as f:
+        assert sorted(json.load(f)) == sorted(downloaded)
+    api_requests = [path for path, _ in fixture_server.requests if path.startswith("/api/1/datasets/")]
+    assert len(api_requests) == 2
+
+def test_api_backend_recrawl_uses_conditional_requests(fixture_server, tmp_path):
+    find_and_download_files("Paris", str(tmp_path), ["pdf"], backend="api", api_url=fixture_server.api_url)
+    fixture_server.requests.clear()
+
+    downloaded = find_and_download_files("Paris", str(tmp_path), ["pdf"], backend="api", api_url=fixture_server.api_url)
+
+    assert downloaded == []
+    file_requests = [headers for path, headers in fixture_server.requests if path.startswith("/files/")]
+    assert file_requests and all("If-None-Match" in headers for headers in file_requests)
+
+def test_json_page_stream_handles_arbitrary_chunk_boundaries():
+    page = {"data": [{"id": "a", "resources": [{"url": "https://exemple.fr/é.pdf", "format": "pdf"}]},
+                     {"id": "b", "resources": []}],
+            "next_page": None, "total": 12}
+    payload = json.dumps(page, ensure_ascii=False).encode("utf-8")
+
+    stream = JSONPageStream()
+    items = []
+    for i in range(len(payload)):
+        items.extend(stream.feed_bytes(payload[i:i + 1]))
+    items.extend(stream.feed_bytes(b"", final=True))
+
+    assert items == page["data"]
+    assert stream.meta == {"next_page": None, "total": 12}
+
+def test_crawl_cli_async_engine_uses_api_url(fixture_server, tmp_path, capsys):
+    communes = tmp_path / "communes.txt"
+    communes.write_text("Paris\n", encoding="utf-8")
+
+    main([str(communes), "--output-dir", str(tmp_path / "out"), "--file-types", "pdf", "csv", "json",
+          "--engine", "async", "--api-url", fixture_server.api_url])
+
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    done = [event for event in events if event["event"] == "commune_done"]
+    assert sorted(os.path.basename(path) for path in done[0]["files"]) == ["dicrim-paris.pdf", "pcs-paris.csv", "plu-paris.json"]
+    api_requests = [path for path, _ in fixture_server.requests if path.startswith("/api/1/datasets/")]
+    assert len(api_requests) == 2
@@ -0,0 +1,57 @@
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from genia import dataset_cache
+from genia.dataset_cache import CACHE_SUFFIX, cache_upload, content_hash, dataset_hash, load_columns
+
+CSV = (b"date,commune,documents,population,surface\n"
+       b"2024-01-01,Nantes,DICRIM,320000,65.2\n"
+       b"2024-02-01,Lyon,PPRI,520000,47.9\n"
+       b"2024-03-01,Nantes,PCS,321000,65.2\n")
+
+@pytest.fixture
+def cached(tmp_path):
+    return cache_upload(io.BytesIO(CSV), "communes.csv", str(tmp_path))
+
+def test_cache_is_keyed_on_content_not_name(tmp_path, cached):
+    other_name = cache_upload(io.BytesIO(CSV), "renomme.csv", str(tmp_path))
+    other_content = cache_upload(io.BytesIO(CSV + b"2024-04-01,Lille,DICRIM,236000,34.8\n"), "communes.csv",
+                                 str(tmp_path))
+
+    assert other_name == cached and other_content != cached
+    assert dataset_hash(cached) == content_hash(io.BytesIO(CSV))
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in (cached, other_content))
+    assert cached.endswith(CACHE_SUFFIX)
+
+def test_cached_file_is_not_converted_again(tmp_path, cached, monkeypatch):
+    def fail(fileobj, name):
+        raise AssertionError("fichier déjà en cache relu")
+
+    monkeypatch.setattr(dataset_cache, "_read_table", fail)
+    upload = io.BytesIO(CSV)
+
+    assert cache_upload(upload, "communes.csv", str(tmp_path)) == cached
+    assert upload.tell() == 0
+
+def test_unsupported_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        cache_upload(io.BytesIO(CSV), "communes.xlsx", str(tmp_path))
+    assert not os.listdir(tmp_path)
+
+def test_load_columns_projects_and_limits(cached):
+    df = load_columns(cached, ["population", "absente", "commune", "population"], limit=2)
+
+    assert list(df.columns) == ["population", "commune"]
+    assert df["population"].tolist() == [320000, 520000]
+    assert isinstance(df["commune"].dtype, pd.CategoricalDtype)
+
+def test_whole_dataset_keeps_types(cached):
+    df = load_columns(cached)
+
+    assert len(df) == 3 and list(df.columns) == ["date", "commune", "documents", "population", "surface"]
+    assert pd.api.types.is_datetime64_any_dtype(df["date"])
+    assert isinstance(df["documents"].dtype, pd.CategoricalDtype)
+    assert dataset_cache.numeric_columns(cached) == ["population", "surface"]
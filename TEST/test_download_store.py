@@ -0,0 +1,176 @@
+import os
+import sqlite3
+
+import pytest
+import requests
+
+from file_fixture_server import start_file_server
+from genia.download_store import (
+    INDEX_FILENAME,
+    STATUS_DEDUPLICATED,
+    STATUS_DOWNLOADED,
+    STATUS_NOT_MODIFIED,
+    DownloadStore,
+)
+
+CONTENT = bytes(range(256)) * 80
+
+@pytest.fixture
+def server():
+    server = start_file_server({"dicrim.pdf": CONTENT, "copie/dicrim.pdf": CONTENT,
+                                "autre/dicrim.pdf": b"autre contenu" * 10})
+    yield server
+    server.shutdown()
+
+@pytest.fixture
+def store(tmp_path):
+    store = DownloadStore(str(tmp_path))
+    yield store
+    store.close()
+
+def fetch(store, server, name, folder):
+    os.makedirs(folder, exist_ok=True)
+    with requests.Session() as session:
+        return store.fetch(f"{server.base_url}/{name}", folder, session)
+
+def last_headers(server):
+    return server.requests[-1][1]
+
+def test_download_is_stored_once_and_linked(server, store, tmp_path):
+    path, status = fetch(store, server, "dicrim.pdf", str(tmp_path / "Paris"))
+
+    assert status == STATUS_DOWNLOADED
+    assert path == str(tmp_path / "Paris" / "dicrim.pdf")
+    with open(path, "rb") as f:
+        assert f.read() == CONTENT
+    entry = store.get(f"{server.base_url}/dicrim.pdf", str(tmp_path / "Paris"))
+    assert entry["size"] == len(CONTENT)
+    assert os.path.samefile(path, store.object_path(entry["sha256"]))
+    assert not os.path.exists(path + ".part")
+
+def test_recrawl_sends_conditional_request(server, store, tmp_path):
+    fetch(store, server, "dicrim.pdf", str(tmp_path / "Paris"))
+
+    _, status = fetch(store, server, "dicrim.pdf", str(tmp_path / "Paris"))
+
+    assert status == STATUS_NOT_MODIFIED
+    assert "If-None-Match" in last_headers(server) and "If-Modified-Since" in last_headers(server)
+
+def test_modified_resource_is_downloaded_again(server, store, tmp_path):
+    path, _ = fetch(store, server, "dicrim.pdf", str(tmp_path / "Paris"))
+    server.files["dicrim.pdf"] = b"nouvelle version" * 100
+
+    _, status = fetch(store, server, "dicrim.pdf", str(tmp_path / "Paris"))
+
+    assert status == STATUS_DOWNLOADED
+    with open(path, "rb") as f:
+        assert f.read() == b"nouvelle version" * 100
+
+def test_identical_content_at_another_url_is_deduplicated(server, store, tmp_path):
+    first, _ = fetch(store, server, "dicrim.pdf", str(tmp_path / "Paris"))
+
+    second, status = fetch(store, server, "copie/dicrim.pdf", str(tmp_path / "Lyon"))
+
+    assert status == STATUS_DEDUPLICATED
+    assert os.path.samefile(first, second)
+
+def test_same_basename_in_one_folder_gets_a_suffix(server, store, tmp_path):
+    folder = str(tmp_path / "Paris")
+    first, _ = fetch(store, server, "dicrim.pdf", folder)
+
+    second, _ = fetch(store, server, "autre/dicrim.pdf", folder)
+
+    assert first != second and os.path.dirname(second) == folder
+    assert os.path.basename(second).startswith("dicrim-") and second.endswith(".pdf")
+    with open(first, "rb") as f:
+        assert f.read() == CONTENT
+    with open(second, "rb") as f:
+        assert f.read() == b"autre contenu" * 10
+
+def test_interrupted_download_resumes_with_range(server, store, tmp_path):
+    folder = str(tmp_path / "Paris")
+    server.faults["dicrim.pdf"] = "truncate"
+    server.faults_once.add("dicrim.pdf")
+    with pytest.raises(requests.RequestException):
+        fetch(store, server, "dicrim.pdf", folder)
+    part = os.path.join(folder, "dicrim.pdf.part")
+    received = os.path.getsize(part)
+    assert 0 < received < len(CONTENT)
+
+    path, status = fetch(store, server, "dicrim.pdf", folder)
+
+    headers = last_headers(server)
+    assert headers["Range"] == f"bytes={received}-" and "If-Range" in headers
+    assert status == STATUS_DOWNLOADED
+    with open(path, "rb") as f:
+        assert f.read() == CONTENT
+    assert not os.path.exists(part)
+
+def test_resume_restarts_when_the_resource_changed(server, store, tmp_path):
+    folder = str(tmp_path / "Paris")
+    server.faults["dicrim.pdf"] = "truncate"
+    server.faults_once.add("dicrim.pdf")
+    with pytest.raises(requests.RequestException):
+        fetch(store, server, "dicrim.pdf", folder)
+    server.files["dicrim.pdf"] = b"version corrigee" * 500
+
+    path, _ = fetch(store, server, "dicrim.pdf", folder)
+
+    # If-Range ne correspond plus : le serveur renvoie tout le fichier (200), écrit depuis le début
+    assert "If-Range" in last_headers(server)
+    with open(path, "rb") as f:
+        assert f.read() == b"version corrigee" * 500
+
+def test_resource_shared_by_two_communes_keeps_both_paths(server, store, tmp_path):
+    url = f"{server.base_url}/dicrim.pdf"
+    paris, _ = fetch(store, server, "dicrim.pdf", str(tmp_path / "Paris"))
+    lyon, status = fetch(store, server, "dicrim.pdf", str(tmp_path / "Lyon"))
+    # La seconde commune profite du contenu déjà connu : requête conditionnelle, puis lien
+    assert status == STATUS_DEDUPLICATED
+    assert "If-None-Match" in last_headers(server)
+
+    statuses = [fetch(store, server, "dicrim.pdf", str(tmp_path / name))[1] for name in ("Paris", "Lyon")]
+
+    assert statuses == [STATUS_NOT_MODIFIED, STATUS_NOT_MODIFIED]
+    assert store.get(url, str(tmp_path / "Paris"))["path"] == paris
+    assert store.get(url, str(tmp_path / "Lyon"))["path"] == lyon
+
+def test_copy_fallback_is_not_recopied_when_not_modified(server, store, tmp_path, monkeypatch):
+    copies = []
+    real_copyfile = __import__("shutil").copyfile
+
+    def no_link(source, target):
+        raise OSError("liens physiques non pris en charge")
+
+    def copyfile(source, target):
+        copies.append(target)
+        return real_copyfile(source, target)
+
+    monkeypatch.setattr("genia.download_store.os.link", no_link)
+    monkeypatch.setattr("genia.download_store.shutil.copyfile", copyfile)
+    for name in ("Paris", "Lyon"):
+        fetch(store, server, "dicrim.pdf", str(tmp_path / name))
+    assert len(copies) == 2
+
+    for name in ("Paris", "Lyon"):
+        assert fetch(store, server, "dicrim.pdf", str(tmp_path / name))[1] == STATUS_NOT_MODIFIED
+
+    assert len(copies) == 2
+
+def test_index_with_one_row_per_url_is_migrated(tmp_path):
+    folder = str(tmp_path / "Paris")
+    conn = sqlite3.connect(str(tmp_path / INDEX_FILENAME))
+    conn.execute("CREATE TABLE downloads (url TEXT PRIMARY KEY, path TEXT NOT NULL, etag TEXT, last_modified TEXT,"
+                 " size INTEGER, sha256 TEXT, updated_at TEXT)")
+    conn.execute("INSERT INTO downloads VALUES (?, ?, ?, NULL, 3, 'abc', '2025-01-01')",
+                 ("http://exemple.fr/a.pdf", os.path.join(folder, "a.pdf"), '"v1"'))
+    conn.commit()
+    conn.close()
+
+    store = DownloadStore(str(tmp_path))
+    try:
+        entry = store.get("http://exemple.fr/a.pdf", folder)
+    finally:
+        store.close()
+
+    assert entry["path"] == os.path.join(folder, "a.pdf") and entry["etag"] == '"v1"'
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from botocore.exceptions import ClientError
+
+from fake_embeddings import FakeEmbeddingClient
+from genia.embeddings import EmbeddingCache, EmbeddingExecutor
+
+CHUNKS = [f"Chunk {i} : risque d'inondation dans la commune {i}" for i in range(40)]
+
+def test_requests_run_concurrently_and_keep_order():
+    client = FakeEmbeddingClient(latency=0.01)
+    executor = EmbeddingExecutor(client, max_workers=8)
+
+    vectors = executor.embed(CHUNKS)
+
+    assert vectors.shape == (40, 64) and vectors.dtype == np.float32
+    assert np.allclose(vectors[7], client.embed(CHUNKS[7]))
+    assert client.max_active > 1
+    assert len(client.calls) == 40
+
+def test_batching_models_send_several_texts_per_request():
+    client = FakeEmbeddingClient()
+    executor = EmbeddingExecutor(client, model_id="cohere.embed-multilingual-v3")
+
+    executor.embed(CHUNKS * 3)
+
+    assert len(client.calls) == 1
+    assert len(client.calls[0][1]["texts"]) == 40
+
+def test_throttled_requests_are_retried():
+    client = FakeEmbeddingClient(throttle_first=3)
+    executor = EmbeddingExecutor(client, max_workers=1, base_delay=0.001)
+
+    vectors = executor.embed(CHUNKS[:2])
+
+    assert vectors.shape == (2, 64)
+    assert executor.stats["retries"] == 3
+
+def test_retries_are_bounded():
+    executor = EmbeddingExecutor(FakeEmbeddingClient(throttle_first=100), max_retries=2, base_delay=0.001)
+
+    with pytest.raises(ClientError):
+        executor.embed(CHUNKS[:1])
+
+def test_edited_document_only_embeds_new_chunks(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    EmbeddingExecutor(FakeEmbeddingClient(), cache=cache).embed(CHUNKS)
+    client = FakeEmbeddingClient()
+    executor = EmbeddingExecutor(client, cache=cache)
+
+    edited = CHUNKS[:35] + ["Nouveau paragraphe sur les vagues de chaleur"]
+    windows = list(executor.embed_stream(enumerate(edited), window=16))
+
+    assert [len(keys) for keys, _ in windows] == [16, 16, 4]
+    assert len(client.calls) == 1
+    assert executor.stats["cached"] == 35
@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+from genia.forecast import FORECAST_HORIZON, forecast_all_series
+
+def yearly(communes, years):
+    return pd.DataFrame([{"commune": commune, "date": f"{year}-12-31", "budget": 100.0 + 10 * i + (year - 2000)}
+                         for i, commune in enumerate(communes) for year in years])
+
+def test_default_strategy_forecasts_series_shorter_than_the_horizon():
+    df = yearly(["Nantes", "Rennes"], range(2019, 2024))
+
+    table = forecast_all_series(df, "budget", epochs=2)
+
+    assert len(table) == 2 * FORECAST_HORIZON
+    assert sorted(table["commune"].unique()) == ["Nantes", "Rennes"]
+    assert table["date"].min() == pd.Timestamp("2024-12-31")
+
+def test_direct_strategy_falls_back_to_autoregressive_on_short_series():
+    df = yearly(["Nantes"], range(2019, 2024))
+
+    table = forecast_all_series(df, "budget", epochs=2, strategy="direct")
+
+    assert len(table) == FORECAST_HORIZON
+    assert table["forecast"].notna().all()
+
+def test_direct_strategy_on_long_series():
+    df = yearly(["Nantes", "Rennes"], range(2000, 2024))
+
+    table = forecast_all_series(df, "budget", epochs=2, strategy="direct")
+
+    assert len(table) == 2 * FORECAST_HORIZON
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        forecast_all_series(yearly(["Nantes"], range(2019, 2024)), "budget", epochs=1, strategy="magique")
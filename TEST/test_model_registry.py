@@ -0,0 +1,61 @@
+import os
+import time
+
+import torch
+
+from genia.model_registry import MODEL_SUFFIX, ModelRegistry, model_key
+
+def entry(value):
+    return {"state_dict": {"weight": torch.full((2, 2), float(value))}, "min": value}
+
+def age(registry, key, seconds):
+    timestamp = time.time() - seconds
+    os.utime(registry.path(key), (timestamp, timestamp))
+
+def stored(registry):
+    return sorted(name[:-len(MODEL_SUFFIX)] for name in os.listdir(registry.root) if name.endswith(MODEL_SUFFIX))
+
+def test_model_key_depends_on_every_parameter():
+    base = model_key("abc", "population", 12, {"hidden": 64, "epochs": 10})
+
+    assert base == model_key("abc", "population", 12, {"epochs": 10, "hidden": 64})
+    assert len({base, model_key("abd", "population", 12, {"hidden": 64, "epochs": 10}),
+                model_key("abc", "surface", 12, {"hidden": 64, "epochs": 10}),
+                model_key("abc", "population", 24, {"hidden": 64, "epochs": 10}),
+                model_key("abc", "population", 12, {"hidden": 32, "epochs": 10})}) == 5
+
+def test_least_recently_used_model_is_evicted_from_disk(tmp_path):
+    registry = ModelRegistry(str(tmp_path), max_models=2)
+    registry.put("a", entry(1))
+    age(registry, "a", 200)
+    registry.put("b", entry(2))
+    age(registry, "b", 100)
+
+    registry.get("a")
+    registry.put("c", entry(3))
+
+    assert stored(registry) == ["a", "c"]
+    assert registry.get("b") is None
+
+def test_entry_is_reloaded_from_disk(tmp_path):
+    registry = ModelRegistry(str(tmp_path), memory_models=1)
+    registry.put("a", entry(1))
+    registry.put("b", entry(2))
+    assert list(registry._memory) == ["b"]
+
+    reloaded = registry.get("a")
+
+    assert torch.equal(reloaded["state_dict"]["weight"], entry(1)["state_dict"]["weight"])
+    assert reloaded["min"] == 1 and list(registry._memory) == ["a"]
+    # Un autre processus (nouveau registre) retrouve le modèle enregistré
+    other = ModelRegistry(str(tmp_path))
+    assert other.get("b")["min"] == 2
+
+def test_put_overwrites_and_leaves_no_temporary_file(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    registry.put("a", entry(1))
+
+    registry.put("a", entry(5))
+
+    assert os.listdir(tmp_path) == ["a" + MODEL_SUFFIX]
+    assert ModelRegistry(str(tmp_path)).get("a")["min"] == 5
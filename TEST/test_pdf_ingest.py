@@ -0,0 +1,79 @@
+import base64
+
+import pytest
+
+from memory_s3 import MemoryS3
+from genia.chunking import chunk_pages
+from genia.pdf_ingest import TextPrefix, decode_base64_pdf, ingest_pdf
+
+def make_pdf(pages):
+    """
+    PDF minimal (une ligne de texte par page), écrit à la main pour ne dépendre d'aucun générateur.
+    """
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return out
+
+PAGES = [f"Page {i} du DICRIM de Paris : risque inondation" for i in range(1, 6)]
+
+def test_pages_are_streamed_while_the_upload_runs():
+    pdf = make_pdf(PAGES)
+    s3 = MemoryS3(part_size=256, part_delay=0.01)
+    seen = []
+
+    def consume(pages):
+        for number, text in pages:
+            # La première page est disponible avant la fin de l'envoi
+            seen.append((number, text, ("bucket", "doc.pdf") in s3.objects))
+        return len(seen)
+
+    assert ingest_pdf(pdf, s3, "bucket", "doc.pdf", consume) == 5
+    assert [number for number, _, _ in seen] == [1, 2, 3, 4, 5]
+    assert "risque inondation" in seen[0][1]
+    assert seen[0][2] is False
+    assert s3.objects[("bucket", "doc.pdf")] == pdf
+
+def test_document_already_in_s3_is_read_without_upload():
+    pdf = make_pdf(PAGES[:2])
+    s3 = MemoryS3()
+    s3.put_object(Bucket="bucket", Key="raw/doc.pdf", Body=pdf)
+
+    pages = ingest_pdf(s3.get_object(Bucket="bucket", Key="raw/doc.pdf")["Body"], s3, "bucket", "raw/doc.pdf",
+                       consume=list, upload=False)
+
+    assert [number for number, _ in pages] == [1, 2]
+    assert not s3.upload_started.is_set()
+
+def test_chunks_keep_page_numbers_and_summary_prefix_is_bounded():
+    prefix = TextPrefix(max_chars=60)
+    pages = [(number, " ".join(f"Phrase {word} numéro {i} de la page {number}." for i in range(6)))
+             for number, word in ((1, "alpha"), (2, "beta"), (3, "gamma"))]
+
+    chunks = list(chunk_pages(prefix.collect(pages), max_tokens=20, overlap_tokens=0, min_tokens=1))
+
+    assert [chunk.page for chunk in chunks] == [1] * 3 + [2] * 3 + [3] * 3
+    for chunk in chunks:
+        assert chunk.text in dict(pages)[chunk.page]
+    assert len(prefix.text) <= 61 and prefix.text == pages[0][1][:60]
+
+def test_invalid_base64_is_rejected():
+    assert decode_base64_pdf(base64.b64encode(b"%PDF").decode()) == b"%PDF"
+    with pytest.raises(ValueError):
+        decode_base64_pdf("pas du base64 !")
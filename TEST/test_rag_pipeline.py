@@ -0,0 +1,113 @@
+import pytest
+
+from genia.rag_pipeline import (
+    HashingEmbedder,
+    KnowledgeBaseRetriever,
+    LocalRetriever,
+    Passage,
+    PassageIndex,
+    RagPipeline,
+    RagSession,
+    compress_context,
+)
+from genia.vector_store import VectorStore, VectorStoreRetriever
+
+DOCUMENTS = {
+    "dicrim-paris": "Paris est exposée au risque d'inondation par crue de la Seine. La crue de 1910 reste la référence.",
+    "dicrim-lyon": "Lyon est exposée aux crues du Rhône et de la Saône. Un plan de prévention encadre l'urbanisme.",
+    "pcs-nice": "Nice est concernée par le risque sismique et les feux de forêt. Les exercices sont annuels.",
+    "plu-lille": "Lille prévoit des îlots de fraîcheur pour limiter les vagues de chaleur en été.",
+}
+
+@pytest.fixture
+def index():
+    embed = HashingEmbedder()
+    index = PassageIndex(embed.dimension)
+    passages = [Passage(doc_id, text, metadata={"document": doc_id}) for doc_id, text in DOCUMENTS.items()]
+    index.add(passages, [embed(p.text) for p in passages])
+    return index
+
+@pytest.fixture
+def pipeline(index):
+    prompts = []
+    pipeline = RagPipeline(LocalRetriever(index, HashingEmbedder()), generate=lambda prompt: prompts.append(prompt) or "ok",
+                           top_k=3, top_n=2)
+    pipeline.prompts = prompts
+    return pipeline
+
+def test_pipeline_retrieves_reranks_and_calls_the_model_once(pipeline):
+    result = pipeline.answer("Quels risques d'inondation pour Paris ?")
+
+    assert result.passages[0].passage_id == "dicrim-paris"
+    assert "crue de la Seine" in result.context
+    assert len(pipeline.prompts) == 1 and result.context in pipeline.prompts[0]
+    assert set(result.timings) == {"retrieve", "rerank", "compress", "generate"}
+    assert result.cached == []
+
+def test_repeated_question_is_served_from_stage_caches(pipeline):
+    pipeline.answer("Quels risques d'inondation pour Paris ?")
+    result = pipeline.answer("quels risques d'inondation pour paris")
+
+    assert result.cached == ["retrieve", "rerank", "compress", "generate"]
+    assert len(pipeline.prompts) == 1
+
+def test_session_passages_are_candidates_for_follow_up_questions(index):
+    pipeline = RagPipeline(LocalRetriever(index, HashingEmbedder()), generate=lambda prompt: "ok", top_k=1, top_n=2)
+    session = RagSession()
+    pipeline.answer("Risque d'inondation à Paris ?", session)
+
+    result = pipeline.answer("Et les feux de forêt à Nice ?", session)
+
+    assert {p.passage_id for p in result.passages} == {"pcs-nice", "dicrim-paris"}
+
+def test_compress_context_respects_budget_and_drops_repeated_sentences():
+    passages = [Passage("a", "Le risque inondation est élevé. En-tête commun."),
+                Passage("b", "En-tête commun. Les crues sont fréquentes au printemps.")]
+
+    context = compress_context("risque inondation", passages, max_tokens=12)
+
+    assert context.startswith("Le risque inondation est élevé.")
+    assert context.count("En-tête commun.") <= 1
+    assert sum(len(line) for line in context.splitlines()) <= 12 * 4
+
+def test_stage_caches_follow_vector_store_updates(tmp_path):
+    embed = HashingEmbedder()
+    store = VectorStore(str(tmp_path))
+    for doc_id, text in DOCUMENTS.items():
+        store.add(doc_id, [embed(text)], [{"chunk_id": "0", "page": 1, "text": text}])
+    pipeline = RagPipeline(VectorStoreRetriever(store, embed), generate=lambda prompt: "ok", top_k=3, top_n=2)
+    assert pipeline.answer("Risque d'inondation à Paris ?").passages[0].metadata["doc_id"] == "dicrim-paris"
+
+    # Autre processus (lambda d'envoi) : nouvelle version du document
+    VectorStore(str(tmp_path)).replace("dicrim-paris", [embed(DOCUMENTS["dicrim-paris"])],
+                                       [{"chunk_id": "1", "page": 2, "text": DOCUMENTS["dicrim-paris"]}])
+    result = pipeline.answer("Risque d'inondation à Paris ?")
+
+    assert "retrieve" not in result.cached
+    assert result.passages[0].metadata["page"] == 2
+
+class FakeKnowledgeBase:
+    def __init__(self):
+        self.calls = 0
+        self.text = DOCUMENTS["dicrim-paris"]
+
+    def retrieve(self, knowledgeBaseId, retrievalQuery, retrievalConfiguration):
+        self.calls += 1
+        return {"retrievalResults": [{"content": {"text": self.text}, "score": 0.9,
+                                      "location": {"s3Location": {"uri": "s3://corpus/dicrim-paris.pdf"}}}]}
+
+def test_knowledge_base_results_expire_from_stage_caches(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("genia.rag_pipeline.time.monotonic", lambda: now[0])
+    knowledge_base = FakeKnowledgeBase()
+    pipeline = RagPipeline(KnowledgeBaseRetriever(knowledge_base, "kb", cache_ttl=60), generate=lambda prompt: "ok")
+    pipeline.answer("Risque d'inondation à Paris ?")
+    assert "retrieve" in pipeline.answer("Risque d'inondation à Paris ?").cached
+
+    # Synchronisation de la base de connaissances hors du processus
+    knowledge_base.text = "Paris : nouveau plan de prévention du risque inondation."
+    now[0] += 61
+    result = pipeline.answer("Risque d'inondation à Paris ?")
+
+    assert knowledge_base.calls == 2 and "retrieve" not in result.cached
+    assert "nouveau plan" in result.context
@@ -0,0 +1,133 @@
+import os
+import asyncio
+
+import aiohttp
+import pytest
+import requests
+
+from file_fixture_server import etag_for, start_file_server
+from genia.download_store import STATUS_DOWNLOADED, DownloadStore
+from genia.ranged_download import (
+    MAX_RANGE_SIZE,
+    MIN_RANGE_SIZE,
+    MappedOutput,
+    RangePlanner,
+    download_ranges,
+    download_ranges_async,
+    ranged_download_size,
+)
+
+# Plusieurs plages de MIN_RANGE_SIZE, dont une dernière incomplète
+LARGE = bytes(i % 251 for i in range(3 * MIN_RANGE_SIZE + 12345))
+
+@pytest.fixture
+def server():
+    server = start_file_server({"gros.pdf": LARGE})
+    yield server
+    server.shutdown()
+
+def ranges_of(planner, throughput=None):
+    ranges = []
+    while True:
+        byte_range = planner.next_range(throughput)
+        if byte_range is None:
+            return ranges
+        ranges.append(byte_range)
+
+def test_planner_covers_every_byte_once():
+    planner = RangePlanner(len(LARGE), workers=4)
+
+    ranges = ranges_of(planner)
+
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(LARGE) - 1
+    assert all(end + 1 == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    assert all(end - start + 1 <= MAX_RANGE_SIZE for start, end in ranges)
+
+def test_planner_sizes_follow_throughput_within_bounds():
+    total = 4 * MAX_RANGE_SIZE
+
+    slow = ranges_of(RangePlanner(total, workers=2), throughput=1)
+    fast = ranges_of(RangePlanner(total, workers=2), throughput=10 * MAX_RANGE_SIZE)
+
+    assert slow[0] == (0, MIN_RANGE_SIZE - 1)
+    assert fast[0] == (0, MAX_RANGE_SIZE - 1)
+
+def test_planner_stops_after_abort():
+    planner = RangePlanner(len(LARGE), workers=4)
+    planner.next_range()
+
+    planner.abort()
+
+    assert planner.next_range() is None
+
+def test_mapped_output_writes_at_offsets_and_rejects_overflow(tmp_path):
+    path = str(tmp_path / "sortie.part")
+    with MappedOutput(path, 10) as output:
+        assert output.write_at(5, b"fghij", 9) == 10
+        assert output.write_at(0, b"abcde", 4) == 5
+        with pytest.raises(IOError):
+            output.write_at(8, b"xyz", 9)
+    with open(path, "rb") as f:
+        assert f.read() == b"abcdefghij"
+
+def test_ranged_download_size_requires_length_and_ranges():
+    headers = {"Accept-Ranges": "bytes", "Content-Length": str(len(LARGE))}
+
+    assert ranged_download_size(200, headers, threshold=MIN_RANGE_SIZE) == len(LARGE)
+    assert ranged_download_size(200, headers, threshold=len(LARGE) + 1) is None
+    assert ranged_download_size(200, {"Content-Length": str(len(LARGE))}, threshold=MIN_RANGE_SIZE) is None
+    assert ranged_download_size(200, dict(headers, **{"Content-Encoding": "gzip"}), threshold=1) is None
+    assert ranged_download_size(206, headers, threshold=1) is None
+
+def test_download_ranges_reassembles_the_file(server, tmp_path):
+    path = str(tmp_path / "gros.pdf.part")
+    with requests.Session() as session:
+        written = download_ranges(session, f"{server.base_url}/gros.pdf", path, len(LARGE), etag_for(LARGE), workers=3)
+
+    assert written == len(LARGE)
+    with open(path, "rb") as f:
+        assert f.read() == LARGE
+    range_requests = [headers for _, headers in server.requests if "Range" in headers]
+    assert len(range_requests) >= 4 and all(headers["If-Range"] == etag_for(LARGE) for headers in range_requests)
+
+@pytest.mark.parametrize("fault", ["short_range", "wrong_offset", "ignore_range", "truncate"])
+def test_faulty_range_response_fails_the_download(server, tmp_path, fault):
+    server.faults["gros.pdf"] = fault
+
+    with requests.Session() as session, pytest.raises((IOError, requests.RequestException)):
+        download_ranges(session, f"{server.base_url}/gros.pdf", str(tmp_path / "gros.pdf.part"), len(LARGE),
+                        etag_for(LARGE), workers=2)
+
+def test_size_mismatch_is_detected(server, tmp_path):
+    # Taille annoncée différente de la ressource : la dernière plage ne correspond pas
+    with requests.Session() as session, pytest.raises(IOError):
+        download_ranges(session, f"{server.base_url}/gros.pdf", str(tmp_path / "gros.pdf.part"), len(LARGE) + 10,
+                        etag_for(LARGE), workers=2)
+
+def test_async_download_ranges_reassembles_the_file(server, tmp_path):
+    path = str(tmp_path / "gros.pdf.part")
+
+    async def main():
+        async with aiohttp.ClientSession() as session:
+            return await download_ranges_async(session, f"{server.base_url}/gros.pdf", path, len(LARGE),
+                                               etag_for(LARGE), workers=3)
+
+    assert asyncio.run(main()) == len(LARGE)
+    with open(path, "rb") as f:
+        assert f.read() == LARGE
+
+def test_store_uses_ranges_for_large_files(server, tmp_path):
+    folder = str(tmp_path / "Paris")
+    os.makedirs(folder)
+    store = DownloadStore(str(tmp_path))
+    try:
+        with requests.Session() as session:
+            path, status = store.fetch(f"{server.base_url}/gros.pdf", folder, session,
+                                       large_file_threshold=MIN_RANGE_SIZE)
+    finally:
+        store.close()
+
+    assert status == STATUS_DOWNLOADED
+    with open(path, "rb") as f:
+        assert f.read() == LARGE
+    assert any("Range" in headers for _, headers in server.requests)
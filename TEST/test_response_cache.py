@@ -0,0 +1,89 @@
+import time
+
+from genia.response_cache import TIER_EXACT, TIER_SEMANTIC, DiskBackend, MemoryBackend, ResponseCache
+
+MODEL_ID = "amazon.titan-text-express-v1"
+CONFIG = {"temperature": 0}
+
+def fake_embed(text):
+    # Vecteur par thème : les questions sur le même thème sont « proches »
+    return [1.0, 0.0, 0.1] if "inondation" in text else [0.0, 1.0, 0.1]
+
+def failing_embed(text):
+    raise ConnectionError("bedrock indisponible")
+
+def test_exact_hit_ignores_case_spacing_and_final_punctuation():
+    cache = ResponseCache()
+    cache.store(cache.lookup("Quel est le risque à Nantes ?", MODEL_ID, CONFIG), "Inondation.")
+
+    lookup = cache.lookup("  quel est le risque à nantes", MODEL_ID, CONFIG)
+
+    assert lookup.hit and lookup.tier == TIER_EXACT and lookup.response == "Inondation."
+    assert not cache.lookup("Quel est le risque à Nantes ?", MODEL_ID, {"temperature": 0.7}).hit
+
+def test_semantic_hit_and_miss():
+    cache = ResponseCache(embed=fake_embed)
+    cache.store(cache.lookup("Risque d'inondation à Tours ?", MODEL_ID, CONFIG), "Crue de la Loire.")
+
+    hit = cache.lookup("Quel risque d'inondation pour Tours ?", MODEL_ID, CONFIG)
+    miss = cache.lookup("Quel est le risque sismique à Nice ?", MODEL_ID, CONFIG)
+
+    assert hit.hit and hit.tier == TIER_SEMANTIC and hit.similarity > 0.99
+    assert not miss.hit
+    assert cache.stats == {"exact": 0, "semantic": 1, "miss": 2}
+
+def test_embedding_failure_is_a_miss():
+    cache = ResponseCache(embed=failing_embed)
+
+    assert cache.get_or_call("Risque à Lyon ?", MODEL_ID, CONFIG, lambda: "Rhône.") == "Rhône."
+    # La réponse reste accessible par correspondance exacte
+    assert cache.lookup("risque à lyon", MODEL_ID, CONFIG).tier == TIER_EXACT
+    assert cache.stats["miss"] == 1
+
+def test_expired_entries_and_lru_eviction():
+    cache = ResponseCache(MemoryBackend(max_entries=2), ttl=60)
+    for question in ("Inondation à Paris ?", "Séisme à Nice ?", "Canicule à Lyon ?"):
+        cache.store(cache.lookup(question, MODEL_ID, CONFIG), "réponse")
+    cache.backend.get(cache.lookup("Canicule à Lyon ?", MODEL_ID, CONFIG).key)["created_at"] = time.time() - 120
+
+    assert not cache.lookup("Inondation à Paris ?", MODEL_ID, CONFIG).hit
+    assert not cache.lookup("Canicule à Lyon ?", MODEL_ID, CONFIG).hit
+    assert cache.lookup("Séisme à Nice ?", MODEL_ID, CONFIG).hit
+
+def test_disk_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    first = ResponseCache(DiskBackend(path), embed=fake_embed)
+    first.store(first.lookup("Risque d'inondation à Tours ?", MODEL_ID, CONFIG), "Crue de la Loire.")
+
+    second = ResponseCache(DiskBackend(path), embed=fake_embed)
+
+    assert second.lookup("Risque d'inondation à Tours", MODEL_ID, CONFIG).tier == TIER_EXACT
+    assert second.lookup("Inondation : quel risque à Tours ?", MODEL_ID, CONFIG).tier == TIER_SEMANTIC
+
+def test_semantic_index_follows_writes_from_other_processes(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    reader = ResponseCache(DiskBackend(path), embed=fake_embed)
+    writer = ResponseCache(DiskBackend(path), embed=fake_embed)
+    assert not reader.lookup("Inondation : quel risque à Tours ?", MODEL_ID, CONFIG).hit
+
+    lookup = writer.lookup("Risque d'inondation à Tours ?", MODEL_ID, CONFIG)
+    writer.store(lookup, "Crue de la Loire.")
+
+    assert reader.lookup("Inondation : quel risque à Tours ?", MODEL_ID, CONFIG).tier == TIER_SEMANTIC
+
+    writer.backend.delete(lookup.key)
+
+    assert not reader.lookup("Inondation : quel risque à Tours ?", MODEL_ID, CONFIG).hit
+    assert not reader._vectors.get(lookup.scope)
+
+def test_semantic_index_is_not_reloaded_without_outside_writes(tmp_path, monkeypatch):
+    cache = ResponseCache(DiskBackend(str(tmp_path / "responses.sqlite3")), embed=fake_embed)
+    cache.store(cache.lookup("Risque d'inondation à Tours ?", MODEL_ID, CONFIG), "Crue de la Loire.")
+    loads = []
+    real_embeddings = cache.backend.embeddings
+    monkeypatch.setattr(cache.backend, "embeddings", lambda: loads.append(1) or real_embeddings())
+
+    for question in ("Inondation : quel risque à Tours ?", "Séisme à Nice ?"):
+        cache.get_or_call(question, MODEL_ID, CONFIG, lambda: "réponse")
+
+    assert cache.stats["semantic"] == 1 and loads == []
@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+
+from genia.vector_codecs import load_codec, make_codec, save_codec
+from genia.vector_store import VectorStore, VectorStoreRetriever, normalize_rows
+
+DIMENSION = 32
+
+def clustered_vectors(count, clusters=40, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, DIMENSION))
+    return (centers[rng.integers(0, clusters, count)] + 0.3 * rng.normal(size=(count, DIMENSION))).astype(np.float32)
+
+def chunk_metadata(doc_id, count):
+    return [{"chunk_id": f"{doc_id}-{i}", "page": i // 10 + 1, "start": 100 * i, "end": 100 * i + 90,
+             "section": "RISQUE INONDATION", "text": f"{doc_id} morceau {i}"} for i in range(count)]
+
+def add_documents(store, vectors, per_document=500):
+    for first in range(0, len(vectors), per_document):
+        doc_id = f"doc{first // per_document}.pdf"
+        block = vectors[first:first + per_document]
+        store.add(doc_id, block, chunk_metadata(doc_id, len(block)))
+
+def test_search_returns_metadata_and_matches_exact_search(tmp_path):
+    vectors = clustered_vectors(600)
+    store = VectorStore(str(tmp_path), nprobe=4)
+    add_documents(store, vectors, per_document=300)
+
+    result = store.search(vectors[42], k=3)
+
+    assert result[0]["doc_id"] == "doc0.pdf" and result[0]["chunk_id"] == "doc0.pdf-42"
+    assert result[0]["page"] == 5 and result[0]["start"] == 4200 and result[0]["text"] == "doc0.pdf morceau 42"
+    assert abs(result[0]["score"] - 1.0) < 1e-5
+    assert [r["score"] for r in result] == sorted((r["score"] for r in result), reverse=True)
+
+def test_ivf_recall_after_compaction(tmp_path):
+    vectors = clustered_vectors(8000)
+    store = VectorStore(str(tmp_path), nprobe=8)
+    add_documents(store, vectors, per_document=2000)
+    store.compact()
+
+    assert [s["ivf"] for s in store.manifest["segments"]] == [True]
+    assert len(store.segments[0].centroids) > 1
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = clustered_vectors(50, seed=1)
+    recall = []
+    for query in queries:
+        exact = set(np.argsort(-(normalized @ query))[:10])
+        found = {int(r["chunk_id"].split("-")[1]) + 2000 * int(r["doc_id"][3]) for r in store.search(query, k=10)}
+        recall.append(len(found & exact) / 10)
+    assert np.mean(recall) > 0.9
+
+def test_delete_and_replace_document(tmp_path):
+    vectors = clustered_vectors(900)
+    store = VectorStore(str(tmp_path))
+    add_documents(store, vectors, per_document=300)
+
+    assert store.delete("doc1.pdf") == 300
+    assert store.delete("doc1.pdf") == 0
+    assert len(store) == 600 and store.documents() == ["doc0.pdf", "doc2.pdf"]
+    assert all(r["doc_id"] != "doc1.pdf" for r in store.search(vectors[350], k=20))
+
+    store.replace("doc0.pdf", vectors[:10], chunk_metadata("doc0.pdf", 10))
+    assert len(store) == 310
+
+def test_compaction_drops_deleted_rows_and_old_segments(tmp_path):
+    vectors = clustered_vectors(5000)
+    store = VectorStore(str(tmp_path))
+    add_documents(store, vectors, per_document=1000)
+    store.compact()
+    base_files = sorted(p.name for p in tmp_path.iterdir())
+
+    store.delete("doc0.pdf")
+    assert len(store.tombstones) == 1000
+    # Plus de 20 % de lignes supprimées : compactage automatique
+    store.delete("doc1.pdf")
+    assert len(store.tombstones) == 0
+    assert len(store) == 3000 and store.manifest["segments"][0]["rows"] == 3000
+    assert set(base_files) != set(p.name for p in tmp_path.iterdir())
+    assert not any(name.startswith("delta-") for name in (p.name for p in tmp_path.iterdir()))
+
+def test_reopen_sees_other_writers(tmp_path):
+    vectors = clustered_vectors(200)
+    writer = VectorStore(str(tmp_path))
+    reader = VectorStore(str(tmp_path))
+    add_documents(writer, vectors, per_document=100)
+
+    assert len(reader.search(vectors[150], k=1)) == 1 and len(reader) == 200
+    assert isinstance(reader.segments[0].vectors, np.memmap)
+
+    retriever = VectorStoreRetriever(VectorStore(str(tmp_path)), embed=lambda query: vectors[150])
+    passage = retriever.retrieve("question", 1)[0]
+    assert passage.passage_id == "doc1.pdf#doc1.pdf-50" and passage.text == "doc1.pdf morceau 50"
+    assert passage.metadata["page"] == 6
+
+def test_codecs_estimate_inner_products(tmp_path):
+    vectors = normalize_rows(clustered_vectors(3000))
+    query = vectors[7]
+    exact = vectors @ query
+    for level, tolerance, size in [("float16", 1e-3, 64), ("int8", 0.05, 32), ("pq8", 0.3, 8)]:
+        codec = make_codec(level).train(vectors)
+        codes = codec.encode(vectors)
+        path = tmp_path / f"{level}.npz"
+        with open(path, "wb") as f:
+            save_codec(f, codec)
+
+        assert codes.nbytes == size * len(vectors)
+        assert np.abs(load_codec(str(path)).scores(codes, query) - exact).mean() < tolerance
+
+def test_compressed_store_reranks_with_full_precision_vectors(tmp_path):
+    vectors = clustered_vectors(5000)
+    store = VectorStore(str(tmp_path), compression="pq8", rerank=16)
+    add_documents(store, vectors, per_document=2500)
+    store.compact()
+
+    segment = VectorStore(str(tmp_path)).segments[0]
+    assert segment.codec.level == "pq" and segment.scan_bytes == 8 * 5000
+    result = store.search(vectors[4321], k=5)
+    assert result[0]["chunk_id"] == "doc1.pdf-1821"
+    # Scores recalculés sur les vecteurs float32 après présélection sur les codes
+    assert abs(result[0]["score"] - 1.0) < 1e-5
+    store.compact(compression="float32")
+    assert VectorStore(str(tmp_path)).segments[0].codec is None
+    assert not any(p.name.endswith(".codes.npy") for p in tmp_path.iterdir())
+
+def test_replace_is_published_in_one_step(tmp_path):
+    vectors = clustered_vectors(300)
+    store = VectorStore(str(tmp_path))
+    add_documents(store, vectors, per_document=100)
+    generation = store.manifest["generation"]
+
+    store.replace("doc1.pdf", vectors[100:150], chunk_metadata("doc1.pdf", 50))
+
+    assert store.manifest["generation"] == generation + 1
+    assert len(store) == 250 and store.documents() == ["doc0.pdf", "doc1.pdf", "doc2.pdf"]
+
+def test_failed_replace_keeps_previous_version(tmp_path):
+    vectors = clustered_vectors(200)
+    store = VectorStore(str(tmp_path))
+    add_documents(store, vectors, per_document=100)
+    files = sorted(p.name for p in tmp_path.iterdir())
+
+    with pytest.raises(ValueError):
+        store.replace("doc1.pdf", np.ones((10, DIMENSION + 1)), chunk_metadata("doc1.pdf", 10))
+
+    assert len(store) == 200 and store.search(vectors[150], k=1)[0]["doc_id"] == "doc1.pdf"
+    assert sorted(p.name for p in tmp_path.iterdir()) == files
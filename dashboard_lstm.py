@@ -1,195 +1,66 @@
 import os
-import logging
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-import json
-from typing import Set, List, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
 import streamlit as st
 import pandas as pd
 import altair as alt
 import numpy as np
 from datetime import datetime
 
-# Import pour le modèle LSTM en utilisant PyTorch
-import torch
-import torch.nn as nn
-from sklearn.preprocessing import MinMaxScaler
+# Prévision LSTM par lots en utilisant PyTorch (voir genia/forecast.py)
+from genia.forecast import DEFAULT_EPOCHS, forecast_table_path, read_forecast_table
+from genia.forecast_jobs import JOB_DONE, JOB_ERROR, ForecastJobQueue
 
-# ----------------------------------------------------------------
-# Configuration de la journalisation
-# Créé par CAFAM pour le Hackathon HGEN IA 2025
-# ----------------------------------------------------------------
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-console_handler = logging.StreamHandler()
-formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-console_handler.setFormatter(formatter)
-logger.addHandler(console_handler)
-
-# ----------------------------------------------------------------
-# Constantes pour le scraping depuis data.gouv.fr
-# ----------------------------------------------------------------
-BASE_URL = "https://www.data.gouv.fr/fr/datasets/"
-DOCUMENT_TYPES = [
-    "DICRIM", "PCS", "PLU", "PPRN", "PCAET", "SCoT", "PLUi", "PICS", "DDRM", "SRADDET"
-]
+# Fonctions de scraping depuis data.gouv.fr (voir genia/scraper.py)
+from genia.scraper import find_and_download_files
+from genia.async_crawler import crawl_communes
+from genia.metrics import CrawlMetrics
+# Cache colonnaire des fichiers du dashboard (voir genia/dataset_cache.py)
+from genia.dataset_cache import cache_upload, dataset_columns, dataset_length, load_columns, numeric_columns
+# Agrégation / sous-échantillonnage avant Altair (voir genia/chart_data.py)
+from genia.chart_data import DEFAULT_POINT_BUDGET, aggregate_by, histogram_bins, lttb_downsample, stratified_sample
 
 # ----------------------------------------------------------------
-# Fonctions de téléchargement et de scraping
+# Fonctions de chargement de données pour le dashboard
 # ----------------------------------------------------------------
-
-def download_file(url: str, output_folder: str, downloaded_files: Set[str], session: requests.Session) -> Optional[str]:
+def load_dashboard_data(uploaded_file):
     """
-    Télécharge un fichier à partir de l'URL et le sauvegarde dans output_folder.
-    Vérifie si le fichier a déjà été téléchargé.
+    Convertit une seule fois le fichier CSV ou JSON en cache Arrow (colonne 'date' en datetime,
+    'commune' et 'documents' en catégories) et retourne le chemin du cache, ou None en cas d'erreur.
+    Les graphiques chargent ensuite uniquement les colonnes dont ils ont besoin avec load_columns.
     """
-    local_filename = os.path.join(output_folder, os.path.basename(url))
-    if local_filename in downloaded_files:
-        logger.info(f"Fichier déjà téléchargé : {local_filename}")
+    if not uploaded_file.name.endswith(('.csv', '.json')):
+        st.error("Format non supporté. Veuillez fournir un fichier CSV ou JSON.")
         return None
-    try:
-        with session.get(url, stream=True, timeout=10) as response:
-            response.raise_for_status()
-            with open(local_filename, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-        downloaded_files.add(local_filename)
-        logger.info(f"Fichier téléchargé : {local_filename}")
-        return local_filename
-    except requests.RequestException as e:
-        logger.error(f"Erreur lors du téléchargement de {url} : {e}")
-        return None
-
-def google_dorks(commune_name: str, file_types: List[str]) -> None:
-    """
-    Génère et affiche (dans les logs) des requêtes Google Dorks pour une recherche manuelle.
-    """
-    dork_templates = [
-        "site:data.gouv.fr {commune} {doc_type} filetype:{filetype}",
-        "site:georisques.gouv.fr {commune} {doc_type} filetype:{filetype}",
-        "site:insee.fr {commune} {doc_type} filetype:{filetype}",
-        "site:urbanisme.gouv.fr {commune} {doc_type} filetype:{filetype}",
-        "site:geoportail-urbanisme.gouv.fr {commune} {doc_type} filetype:{filetype}"
-    ]
-    for file_type in file_types:
-        for doc_type in DOCUMENT_TYPES:
-            for template in dork_templates:
-                dork_query = template.format(commune=commune_name, doc_type=doc_type, filetype=file_type)
-                logger.info(f"Requête Google Dork : {dork_query}")
+    # Le chemin est mémorisé par fichier chargé : pas de recalcul de l'empreinte à chaque interaction
+    cache_key = f"dataset_cache_{getattr(uploaded_file, 'file_id', uploaded_file.name)}"
+    if cache_key not in st.session_state:
+        try:
+            st.session_state[cache_key] = cache_upload(uploaded_file, uploaded_file.name)
+        except Exception as e:
+            st.error(f"Erreur lors du chargement du fichier : {e}")
+            return None
+    return st.session_state[cache_key]
 
-def process_dataset_page(full_link: str, file_types: List[str], commune_folder: str, downloaded_files: Set[str], session: requests.Session) -> List[str]:
+@st.cache_resource
+def get_forecast_jobs():
     """
-    Pour une page donnée de dataset, recherche et télécharge les fichiers correspondant aux types spécifiés.
-    Retourne la liste des fichiers téléchargés pour cette page.
+    File des tâches de prévision (pool de processus), partagée par toutes les sessions.
     """
-    downloaded_summary = []
-    try:
-        dataset_page = session.get(full_link, timeout=10)
-        dataset_page.raise_for_status()
-        dataset_soup = BeautifulSoup(dataset_page.content, 'html.parser')
-        for file_type in file_types:
-            files = dataset_soup.find_all('a', href=True)
-            for file in files:
-                file_url = file['href']
-                if file_url.lower().endswith(f".{file_type.lower()}"):
-                    absolute_url = urljoin(BASE_URL, file_url)
-                    result = download_file(absolute_url, commune_folder, downloaded_files, session)
-                    if result:
-                        downloaded_summary.append(result)
-    except requests.RequestException as e:
-        logger.error(f"Erreur lors de l'accès à {full_link} : {e}")
-    return downloaded_summary
-
-def find_and_download_files(commune_name: str, output_dir: str, file_types: List[str], max_workers: int = 10) -> List[str]:
-    """
-    Recherche des datasets pour la commune donnée, télécharge les fichiers correspondants et retourne un résumé des téléchargements.
-    """
-    commune_safe = "".join(c for c in commune_name if c.isalnum() or c in " -_").strip()
-    commune_folder = os.path.join(output_dir, commune_safe)
-    os.makedirs(commune_folder, exist_ok=True)
-    downloaded_files: Set[str] = set(os.listdir(commune_folder))
-    downloaded_summary: List[str] = []
-    search_url = f"https://www.data.gouv.fr/fr/search/?q={commune_name}"
-    session = requests.Session()
-    try:
-        response = session.get(search_url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        links = [a['href'] for a in soup.find_all('a', href=True) if '/datasets/' in a['href']]
-        unique_links = list(set(links))
-        logger.info(f"Pour la commune '{commune_name}', trouvé {len(unique_links)} jeux de données.")
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [
-                executor.submit(
-                    process_dataset_page,
-                    urljoin(BASE_URL, link),
-                    file_types,
-                    commune_folder,
-                    downloaded_files,
-                    session
-                )
-                for link in unique_links
-            ]
-            for future in as_completed(futures):
-                downloaded_summary.extend(future.result())
-        # Affichage des requêtes Google Dorks dans les logs
-        google_dorks(commune_name, file_types)
-    except requests.RequestException as e:
-        logger.error(f"Erreur lors de la recherche pour {commune_name} : {e}")
-    summary_file = os.path.join(commune_folder, "download_summary.json")
-    try:
-        with open(summary_file, 'w', encoding='utf-8') as f:
-            json.dump(downloaded_summary, f, indent=4, ensure_ascii=False)
-        logger.info(f"Résumé des téléchargements généré : {summary_file}")
-    except IOError as e:
-        logger.error(f"Erreur lors de l'écriture du résumé {summary_file} : {e}")
-    return downloaded_summary
+    return ForecastJobQueue()
 
 # ----------------------------------------------------------------
-# Fonctions de chargement de données pour le dashboard
+# Affichage des métriques de collecte
 # ----------------------------------------------------------------
-@st.cache_data
-def load_dashboard_data(uploaded_file):
+def show_crawl_metrics(metrics, output_dir):
     """
-    Charge un fichier CSV ou JSON pour le dashboard, en convertissant la colonne 'date' en datetime.
+    Affiche le rapport de performances de la collecte et l'enregistre dans le dossier de sortie.
     """
-    try:
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file, parse_dates=['date'])
-        elif uploaded_file.name.endswith('.json'):
-            df = pd.read_json(uploaded_file)
-        else:
-            st.error("Format non supporté. Veuillez fournir un fichier CSV ou JSON.")
-            return pd.DataFrame()
-        return df
-    except Exception as e:
-        st.error(f"Erreur lors du chargement du fichier : {e}")
-        return pd.DataFrame()
-
-# ----------------------------------------------------------------
-# Modèle LSTM avec PyTorch pour la prévision
-# ----------------------------------------------------------------
-class LSTMModel(nn.Module):
-    def __init__(self, input_size=1, hidden_size=50, num_layers=1):
-        """
-        Modèle LSTM simple.
-        Créé par CAFAM pour le Hackathon HGEN IA 2025.
-        """
-        super(LSTMModel, self).__init__()
-        self.hidden_size = hidden_size
-        self.num_layers = num_layers
-        self.lstm = nn.LSTM(input_size, hidden_size, num_layers, batch_first=True)
-        self.fc = nn.Linear(hidden_size, 1)
-    
-    def forward(self, x):
-        h0 = torch.zeros(self.num_layers, x.size(0), self.hidden_size)
-        c0 = torch.zeros(self.num_layers, x.size(0), self.hidden_size)
-        out, _ = self.lstm(x, (h0, c0))
-        out = self.fc(out[:, -1, :])
-        return out
+    st.write("### Performances de la collecte")
+    st.text(metrics.report())
+    metrics_path = os.path.join(output_dir, "crawl_metrics.json")
+    metrics.dump(metrics_path)
+    st.write(f"Métriques détaillées enregistrées dans : {metrics_path}")
+    st.json(metrics.to_dict())
 
 # ----------------------------------------------------------------
 # Interface principale Streamlit
@@ -214,9 +85,42 @@ if mode == "Collecte de données":
     file_types_input = st.text_input("Extensions de fichiers à télécharger (séparées par des espaces) :", value="pdf json csv")
     file_types = [ft.strip() for ft in file_types_input.split()]
     max_workers = st.number_input("Nombre de threads (workers) :", min_value=1, max_value=50, value=10, step=1)
+    discovery_label = st.radio("Source de découverte des fichiers :", ("API JSON data.gouv.fr", "Pages HTML du site"))
+    backend = "api" if discovery_label == "API JSON data.gouv.fr" else "html"
+    use_async_engine = st.checkbox("Moteur asynchrone (toutes les communes via un pool de connexions partagé)", value=False)
+    if use_async_engine:
+        per_host_limit = st.number_input("Connexions simultanées par hôte :", min_value=1, max_value=50, value=8, step=1)
+        rate_limit = st.number_input("Débit maximal global (requêtes/seconde) :", min_value=1.0, max_value=200.0, value=20.0, step=1.0)
+    measure_performance = st.checkbox("Mesurer les performances de la collecte (latence par hôte, débit par commune)", value=False)
     if st.button("Lancer la collecte"):
+        metrics = CrawlMetrics() if measure_performance else None
         if not communes:
             st.error("Veuillez spécifier au moins une commune.")
+        elif use_async_engine:
+            progress_text = st.empty()
+            progress_bar = st.progress(0)
+            total_communes = len(communes)
+            done = []
+
+            def on_commune_done(commune, downloaded):
+                done.append(commune)
+                progress_text.text(f"Commune terminée : {commune} ({len(done)}/{total_communes})")
+                progress_bar.progress(int(len(done) / total_communes * 100))
+
+            all_downloaded_files = crawl_communes(
+                communes, output_dir, file_types,
+                on_commune_done=on_commune_done,
+                per_host_limit=int(per_host_limit),
+                rate=float(rate_limit),
+                backend=backend,
+                metrics=metrics
+            )
+            progress_text.text("Collecte terminée !")
+            st.success("La collecte est terminée.")
+            st.write("### Résumé global des fichiers téléchargés")
+            st.json(all_downloaded_files)
+            if metrics is not None:
+                show_crawl_metrics(metrics, output_dir)
         else:
             progress_text = st.empty()
             progress_bar = st.progress(0)
@@ -225,7 +129,8 @@ if mode == "Collecte de données":
             for idx, commune in enumerate(communes, start=1):
                 progress_text.text(f"Traitement de la commune : {commune} ({idx}/{total_communes})")
                 st.write(f"### Traitement de la commune : {commune}")
-                downloaded = find_and_download_files(commune, output_dir, file_types, max_workers)
+                downloaded = find_and_download_files(commune, output_dir, file_types, max_workers, backend=backend,
+                                                     metrics=metrics)
                 all_downloaded_files[commune] = downloaded
                 st.write(f"Fichiers téléchargés pour {commune} :")
                 st.json(downloaded)
@@ -234,6 +139,8 @@ if mode == "Collecte de données":
             st.success("La collecte est terminée.")
             st.write("### Résumé global des fichiers téléchargés")
             st.json(all_downloaded_files)
+            if metrics is not None:
+                show_crawl_metrics(metrics, output_dir)
             
 elif mode == "Dashboard & Prévision":
     st.title("Dashboard et Prévision des Données")
@@ -241,19 +148,23 @@ elif mode == "Dashboard & Prévision":
     Chargez un fichier CSV (contenant des données historiques, par exemple de 2000 à 2024) pour explorer diverses visualisations et effectuer une prévision sur 10 ans.
     """)
     uploaded_file = st.file_uploader("Choisissez un fichier CSV ou JSON", type=["csv", "json"])
+    point_budget = int(st.sidebar.number_input("Budget de points par graphique :", min_value=100, max_value=20000,
+                                               value=DEFAULT_POINT_BUDGET, step=100))
     if uploaded_file is not None:
-        df = load_dashboard_data(uploaded_file)
-        if df.empty:
+        dataset = load_dashboard_data(uploaded_file)
+        if dataset is None or dataset_length(dataset) == 0:
             st.warning("Le fichier est vide ou n'a pas pu être chargé.")
         else:
             st.subheader("Aperçu des données")
-            st.dataframe(df.head(10))
+            st.dataframe(load_columns(dataset, limit=10))
+            columns = set(dataset_columns(dataset))
             st.markdown("---")
             # Carte interactive
-            if {'lat', 'lon'}.issubset(df.columns):
+            if {'lat', 'lon'}.issubset(columns):
                 st.subheader("Carte des communes")
                 try:
-                    st.map(df[['lat', 'lon']])
+                    map_df = load_columns(dataset, ['commune', 'lat', 'lon']).dropna(subset=['lat', 'lon'])
+                    st.map(stratified_sample(map_df, 'commune', point_budget)[['lat', 'lon']])
                 except Exception as e:
                     st.error(f"Erreur lors de l'affichage de la carte : {e}")
             else:
@@ -261,12 +172,15 @@ elif mode == "Dashboard & Prévision":
             st.markdown("---")
             # Histogrammes interactifs
             st.subheader("Histogrammes")
-            numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+            numeric_cols = numeric_columns(dataset)
             if numeric_cols:
                 selected_hist = st.selectbox("Sélectionnez une variable numérique pour l'histogramme :", numeric_cols, key="hist_dashboard")
-                hist_chart = alt.Chart(df).mark_bar().encode(
-                    alt.X(f"{selected_hist}:Q", bin=alt.Bin(maxbins=30), title=selected_hist),
-                    alt.Y("count()", title="Nombre d'observations")
+                # Classes calculées côté serveur : le navigateur ne reçoit qu'une ligne par classe
+                hist_df = histogram_bins(load_columns(dataset, [selected_hist])[selected_hist], maxbins=30)
+                hist_chart = alt.Chart(hist_df).mark_bar().encode(
+                    alt.X("bin_start:Q", bin="binned", title=selected_hist),
+                    alt.X2("bin_end:Q"),
+                    alt.Y("count:Q", title="Nombre d'observations")
                 ).properties(
                     width=600,
                     height=400,
@@ -278,11 +192,14 @@ elif mode == "Dashboard & Prévision":
             st.markdown("---")
             # Diagramme en barres pour budgets
             st.subheader("Comparaison des Budgets")
-            if 'commune' in df.columns:
-                communes = df['commune'].tolist()
+            if 'commune' in columns:
+                budget_df = load_columns(dataset, ['commune', 'budget_collectivite', 'budget_climatique'])
+                communes = [str(c) for c in budget_df['commune'].dropna().unique()]
                 selected_communes = st.multiselect("Sélectionnez les communes à comparer :", options=sorted(communes), default=communes[:5])
                 if selected_communes:
-                    df_filtered = df[df['commune'].isin(selected_communes)]
+                    df_filtered = budget_df[budget_df['commune'].isin(selected_communes)]
+                    # Une barre par commune et par type de budget (somme des lignes de la commune)
+                    df_filtered = aggregate_by(df_filtered, 'commune', ['budget_collectivite', 'budget_climatique'])
                     bar_data = df_filtered[['commune', 'budget_collectivite', 'budget_climatique']].melt(
                         id_vars='commune',
                         var_name='Type de budget',
@@ -304,7 +221,9 @@ elif mode == "Dashboard & Prévision":
             st.subheader("Scatter Plot")
             scatter_cols = st.multiselect("Sélectionnez deux variables numériques pour le scatter plot :", numeric_cols, default=numeric_cols[:2])
             if len(scatter_cols) == 2:
-                scatter_chart = alt.Chart(df).mark_circle(size=60).encode(
+                scatter_df = lttb_downsample(load_columns(dataset, ['commune'] + scatter_cols),
+                                             scatter_cols[0], scatter_cols[1], point_budget)
+                scatter_chart = alt.Chart(scatter_df).mark_circle(size=60).encode(
                     x=alt.X(f"{scatter_cols[0]}:Q", title=scatter_cols[0]),
                     y=alt.Y(f"{scatter_cols[1]}:Q", title=scatter_cols[1]),
                     tooltip=['commune'] + scatter_cols
@@ -319,8 +238,11 @@ elif mode == "Dashboard & Prévision":
             st.markdown("---")
             # Nuage de points multidimensionnel
             st.subheader("Nuage de points multidimensionnel")
-            if set(['population', 'note_risques', 'taux_pollution_air']).issubset(df.columns):
-                multi_chart = alt.Chart(df).mark_circle(size=80).encode(
+            if set(['population', 'note_risques', 'taux_pollution_air']).issubset(columns):
+                multi_df = load_columns(dataset, ['commune', 'population', 'note_risques', 'taux_pollution_air'])
+                # Échantillon stratifié par commune : la répartition des couleurs est conservée
+                multi_df = stratified_sample(multi_df, 'commune', point_budget)
+                multi_chart = alt.Chart(multi_df).mark_circle(size=80).encode(
                     x=alt.X('population:Q', title="Population"),
                     y=alt.Y('note_risques:Q', title="Note des risques"),
                     color=alt.Color('taux_pollution_air:Q', scale=alt.Scale(scheme='redyellowgreen'), title="Pollution de l'air"),
@@ -336,11 +258,15 @@ elif mode == "Dashboard & Prévision":
             st.markdown("---")
             # Répartition des documents
             st.subheader("Répartition des documents disponibles")
-            if 'documents' in df.columns:
-                docs_series = df['documents'].dropna().apply(lambda x: [doc.strip() for doc in x.split(';')])
-                all_docs = [doc for sublist in docs_series for doc in sublist]
-                docs_count = pd.Series(all_docs).value_counts().reset_index()
-                docs_count.columns = ['Document', 'Fréquence']
+            if 'documents' in columns:
+                # Colonne catégorielle : chaque combinaison de documents n'est découpée qu'une fois
+                combos = load_columns(dataset, ['documents'])['documents'].value_counts()
+                combos = combos[combos > 0]
+                docs_count = pd.DataFrame({'Document': combos.index.astype(str).str.split(';'), 'Fréquence': combos.values})
+                docs_count = docs_count.explode('Document')
+                docs_count['Document'] = docs_count['Document'].str.strip()
+                docs_count = docs_count.groupby('Document', as_index=False)['Fréquence'].sum()
+                docs_count = docs_count.sort_values('Fréquence', ascending=False, kind='stable')
                 pie_chart = alt.Chart(docs_count).mark_arc().encode(
                     theta=alt.Theta(field="Fréquence", type="quantitative"),
                     color=alt.Color(field="Document", type="nominal"),
@@ -370,8 +296,10 @@ elif mode == "Dashboard & Prévision":
                 "Note des risques par commune": "note_risques"
             }
             selected_field = mapping.get(additional_option)
-            if additional_option and 'commune' in df.columns and selected_field in df.columns:
-                chart = alt.Chart(df).mark_bar().encode(
+            if additional_option and 'commune' in columns and selected_field in columns:
+                commune_totals = aggregate_by(load_columns(dataset, ['commune', selected_field]), 'commune',
+                                              [selected_field], limit=point_budget)
+                chart = alt.Chart(commune_totals).mark_bar().encode(
                     x=alt.X('commune:N', sort='-y', title="Commune"),
                     y=alt.Y(f"{selected_field}:Q", title=additional_option),
                     tooltip=['commune', f"{selected_field}"]
@@ -385,84 +313,55 @@ elif mode == "Dashboard & Prévision":
             # Prévision LSTM avec PyTorch
             st.subheader("Prévision LSTM sur 10 ans (PyTorch)")
             st.markdown("""
-            Cette section utilise un modèle LSTM implémenté avec **PyTorch** pour prévoir l’évolution d’une variable (par ex. budget collectif) sur les 10 prochaines années.
+            Cette section utilise un modèle LSTM implémenté avec **PyTorch** pour prévoir l’évolution d’une variable (par ex. budget collectif) sur les 10 prochaines années, pour chaque commune.
+            Un seul modèle global est entraîné sur toutes les communes ; les prévisions sont enregistrées dans une table réutilisée par les sessions suivantes
+            (elle peut aussi être calculée hors ligne avec `python -m genia.forecast`).
             Assurez-vous que le fichier contient une colonne **date** avec des enregistrements annuels.
             """)
             timeseries_var = st.selectbox("Sélectionnez la variable à prévoir :", numeric_cols, index=numeric_cols.index("budget_collectivite") if "budget_collectivite" in numeric_cols else 0)
-            if st.button("Lancer la prévision LSTM"):
-                if 'date' not in df.columns:
+            strategy_label = st.radio("Méthode de prévision :", ("Autorégressive (année par année)", "Directe (10 ans en une seule passe)"))
+            strategy = "direct" if strategy_label.startswith("Directe") else "autoregressive"
+            retrain = st.checkbox("Réentraîner le modèle (ignorer les modèles déjà enregistrés)", value=False)
+            # Une table par stratégie : un réentraînement remplace la table publiée
+            forecast_path = forecast_table_path(dataset, timeseries_var, strategy) if timeseries_var else None
+            forecast_table = read_forecast_table(forecast_path) if forecast_path else None
+            job_key = f"forecast_job_{forecast_path}"
+            if st.button("Lancer la prévision LSTM" if forecast_table is None else "Recalculer la prévision LSTM"):
+                if 'date' not in columns:
                     st.error("La colonne 'date' est nécessaire pour la prévision temporelle.")
                 else:
-                    # Prétraitement de la série temporelle
-                    ts = df[['date', timeseries_var]].copy()
-                    ts = ts.sort_values('date')
-                    ts = ts.set_index('date')
-                    ts = ts.resample('A').mean()  # On suppose des données annuelles
-                    st.write("Aperçu de la série temporelle utilisée pour la prévision :")
-                    st.dataframe(ts.tail(10))
-                    
-                    # Choix de la taille de la fenêtre (réduction si les données sont insuffisantes)
-                    default_window_size = 3
-                    if len(ts) < default_window_size + 1:
-                        window_size = 1
-                        st.warning(f"Pas assez de données pour une fenêtre de taille {default_window_size}. Utilisation d'une fenêtre de taille {window_size}.")
-                    else:
-                        window_size = default_window_size
-                    
-                    # Normalisation de la série temporelle
-                    scaler = MinMaxScaler()
-                    ts_scaled = scaler.fit_transform(ts)
-                    
-                    # Création des séquences pour l'entraînement (window_size = 3 par défaut)
-                    X, y = [], []
-                    for i in range(len(ts_scaled) - window_size):
-                        X.append(ts_scaled[i:i+window_size])
-                        y.append(ts_scaled[i+window_size])
-                    X, y = np.array(X), np.array(y)
-                    
-                    if len(X) == 0:
-                        st.error("Pas assez de données historiques pour la prévision.")
-                    else:
-                        # Conversion en tenseurs PyTorch
-                        X_tensor = torch.tensor(X, dtype=torch.float32)
-                        y_tensor = torch.tensor(y, dtype=torch.float32)
-                        
-                        # Définition et entraînement du modèle LSTM
-                        model = LSTMModel(input_size=1, hidden_size=50, num_layers=1)
-                        criterion = nn.MSELoss()
-                        optimizer = torch.optim.Adam(model.parameters(), lr=0.01)
-                        num_epochs = 200
-                        st.info("Entraînement du modèle LSTM en cours...")
-                        for epoch in range(num_epochs):
-                            model.train()
-                            optimizer.zero_grad()
-                            outputs = model(X_tensor)
-                            loss = criterion(outputs, y_tensor)
-                            loss.backward()
-                            optimizer.step()
-                            if (epoch + 1) % 50 == 0:
-                                st.write(f"Epoch [{epoch+1}/{num_epochs}], Loss: {loss.item():.4f}")
-                        st.success("Modèle entraîné avec succès!")
-                        
-                        # Prévision sur les 10 prochaines années
-                        predictions = []
-                        last_sequence = ts_scaled[-window_size:]
-                        current_seq = last_sequence.copy()
-                        model.eval()
-                        with torch.no_grad():
-                            for _ in range(10):
-                                seq_tensor = torch.tensor(current_seq.reshape(1, window_size, 1), dtype=torch.float32)
-                                pred = model(seq_tensor)
-                                pred_value = pred.item()
-                                predictions.append(pred_value)
-                                current_seq = np.append(current_seq[1:], [[pred_value]], axis=0)
-                        
-                        predictions = scaler.inverse_transform(np.array(predictions).reshape(-1,1))
-                        forecast_years = pd.date_range(start=ts.index[-1] + pd.offsets.DateOffset(years=1), periods=10, freq='A')
-                        forecast_df = pd.DataFrame({timeseries_var: predictions.flatten()}, index=forecast_years)
-                        
-                        st.subheader("Prévisions des Recettes sur 10 ans")
-                        st.line_chart(forecast_df)
-                        st.write(forecast_df)
+                    # Calcul en arrière-plan : une tâche identique déjà en cours (autre session) est réutilisée
+                    job = get_forecast_jobs().submit(dataset, timeseries_var, retrain=retrain, strategy=strategy)
+                    st.session_state[job_key] = job.job_id
+            job = get_forecast_jobs().get(st.session_state[job_key]) if job_key in st.session_state else None
+            if job is not None:
+                if job.status == JOB_ERROR:
+                    del st.session_state[job_key]
+                    st.error(f"Erreur lors de la prévision : {job.error}")
+                elif job.status == JOB_DONE:
+                    del st.session_state[job_key]
+                    forecast_table = read_forecast_table(forecast_path)
+                    st.success("Prévisions calculées avec succès!")
+                else:
+                    epochs_done = job.losses[-1][0] if job.losses else 0
+                    st.info("Prévision LSTM en cours en arrière-plan (un modèle déjà entraîné sur ces données est réutilisé)...")
+                    st.progress(min(100, int(epochs_done / DEFAULT_EPOCHS * 100)))
+                    if job.losses:
+                        st.write(f"Epoch [{epochs_done}/{DEFAULT_EPOCHS}], Loss: {job.losses[-1][1]:.4f}")
+                        st.line_chart(pd.DataFrame(job.losses, columns=['Epoch', 'Loss']).set_index('Epoch'))
+                    # Nouvelle exécution du script pour rafraîchir la progression
+                    time.sleep(1)
+                    (getattr(st, "rerun", None) or st.experimental_rerun)()
+            if forecast_table is not None:
+                forecast_communes = forecast_table['commune'].unique().tolist()
+                st.write(f"Prévisions disponibles pour {len(forecast_communes)} série(s).")
+                selected_forecast = st.selectbox("Commune :", forecast_communes, key="forecast_commune")
+                forecast_df = forecast_table[forecast_table['commune'] == selected_forecast].set_index('date')[['forecast']]
+                forecast_df.columns = [timeseries_var]
+                st.subheader("Prévisions des Recettes sur 10 ans")
+                st.line_chart(forecast_df)
+                st.write(forecast_df)
+                with st.expander("Table complète des prévisions (une colonne par année)"):
+                    st.dataframe(forecast_table.pivot(index='commune', columns='date', values='forecast'))
     else:
         st.info("Veuillez charger un fichier pour afficher le dashboard.")
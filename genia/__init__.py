@@ -0,0 +1,4 @@
+"""
+Modules réutilisables du portail GenIA (collecte de données, dashboard, prévision).
+Créé par CAFAM pour le Hackathon HGEN IA 2025.
+"""
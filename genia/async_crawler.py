@@ -0,0 +1,368 @@
+import os
+import time
+import asyncio
+import sqlite3
+from urllib.parse import urljoin, urlparse
+from typing import Callable, Dict, List, Mapping, Optional, Set
+
+import aiohttp
+
+from genia.download_store import DownloadStore, PART_SUFFIX, STATUS_DEDUPLICATED, STATUS_NOT_MODIFIED
+from genia.ranged_download import (
+    DEFAULT_RANGE_WORKERS,
+    LARGE_FILE_THRESHOLD,
+    download_ranges_async,
+    ranged_download_size,
+    remove_part,
+)
+from genia.metrics import CrawlMetrics, aiohttp_trace_config, start_trace
+from genia.datagouv_api import API_URL, DEFAULT_MAX_PAGES, FIELDS_MASK, JSONPageStream, resource_urls, search_url
+from genia.scraper import (
+    BASE_URL,
+    DISCOVERY_BACKENDS,
+    SEARCH_URL,
+    commune_folder_path,
+    extract_dataset_links,
+    file_link_extractor,
+    google_dorks,
+    logger,
+    write_download_summary,
+)
+
+# ----------------------------------------------------------------
+# Moteur de collecte asynchrone (toutes les communes, un seul pool de connexions)
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+
+class TokenBucket:
+    """
+    Limiteur de débit global : `rate` requêtes par seconde, avec une rafale maximale `capacity`.
+    """
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncCrawler:
+    """
+    Collecte les pages de recherche, les pages de datasets et les fichiers de plusieurs communes
+    via une seule session aiohttp, avec une limite de concurrence par hôte et un token bucket global.
+    Produit le même download_summary.json par commune que find_and_download_files.
+    """
+    def __init__(self, output_dir: str, file_types: List[str], per_host_limit: int = 8,
+                 rate: float = 20.0, burst: Optional[float] = None, max_connections: int = 100,
+                 max_communes_in_flight: int = 50, timeout: float = 10,
+                 chunk_size: int = 65536, backend: str = "html", api_url: str = API_URL,
+                 max_pages: Optional[int] = DEFAULT_MAX_PAGES,
+                 large_file_threshold: Optional[int] = LARGE_FILE_THRESHOLD,
+                 range_workers: int = DEFAULT_RANGE_WORKERS,
+                 metrics: Optional[CrawlMetrics] = None):
+        if backend not in DISCOVERY_BACKENDS:
+            raise ValueError(f"Backend de découverte inconnu : {backend}")
+        self.output_dir = output_dir
+        self.file_types = file_types
+        self.per_host_limit = per_host_limit
+        self.rate = rate
+        self.burst = burst
+        self.max_connections = max_connections
+        self.max_communes_in_flight = max_communes_in_flight
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        self.chunk_size = chunk_size
+        self.backend = backend
+        self.api_url = api_url
+        self.max_pages = max_pages
+        self.large_file_threshold = large_file_threshold
+        self.range_workers = range_workers
+        self.metrics = metrics
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._bucket: Optional[TokenBucket] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._store: Optional[DownloadStore] = None
+
+    async def _blocking(self, fn: Callable, *args):
+        """
+        Exécute hors de la boucle d'événements (pool de threads) un appel bloquant : écriture et hachage
+        des fichiers, liens physiques, requêtes SQLite de l'index. Un gros fichier ne bloque ainsi pas
+        les autres téléchargements.
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_semaphores[host]
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None, kind: str = "page",
+                    commune: Optional[str] = None) -> bytes:
+        """
+        Récupère le contenu complet d'une page en respectant les limites de débit.
+        """
+        with start_trace(self.metrics, url, kind, commune) as trace:
+            await self._bucket.acquire()
+            async with self._host_semaphore(url):
+                async with self._session.get(url, headers=headers, trace_request_ctx=trace) as response:
+                    trace.status = response.status
+                    response.raise_for_status()
+                    content = await response.read()
+                    trace.mark("transfer")
+                    trace.bytes = len(content)
+                    return content
+
+    async def download_file(self, url: str, output_folder: str, downloaded_files: Set[str]) -> Optional[str]:
+        """
+        Équivalent asynchrone de download_file : téléchargement conditionnel / repris via l'index
+        persistant, écrit en flux dans output_folder.
+        """
+        if url in downloaded_files:
+            logger.info(f"Fichier déjà traité : {url}")
+            return None
+        downloaded_files.add(url)
+        target = await self._blocking(self._store.target_path, url, output_folder)
+        headers, resume_from = await self._blocking(self._store.request_headers, url, target)
+        total = None
+        try:
+            with start_trace(self.metrics, url, "download", os.path.basename(os.path.normpath(output_folder))) as trace:
+                await self._bucket.acquire()
+                async with self._host_semaphore(url):
+                    async with self._session.get(url, headers=headers, trace_request_ctx=trace) as response:
+                        trace.status = response.status
+                        status = await self._store_response(url, target, response, resume_from, trace)
+                        if status is None:
+                            # Gros fichier : la réponse est abandonnée au profit de requêtes Range parallèles
+                            total = ranged_download_size(response.status, response.headers, self.large_file_threshold)
+                            response_headers = response.headers.copy()
+                if total is not None:
+                    status = await self._download_large_file(url, target, response_headers, total, trace)
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError, sqlite3.Error) as e:
+            logger.error(f"Erreur lors du téléchargement de {url} : {e}")
+            return None
+        if status == STATUS_NOT_MODIFIED:
+            logger.info(f"Fichier inchangé : {target}")
+            return None
+        if status == STATUS_DEDUPLICATED:
+            logger.info(f"Fichier dédupliqué (lien vers un contenu existant) : {target}")
+        else:
+            logger.info(f"Fichier téléchargé : {target}")
+        return target
+
+    async def _store_response(self, url: str, target: str, response, resume_from: int, trace) -> Optional[str]:
+        """
+        Enregistre une réponse en flux dans l'index ; retourne None si le fichier doit passer
+        par le téléchargement par plages.
+        """
+        if response.status == 304:
+            return await self._blocking(self._store.not_modified, url, target)
+        if response.status == 416 and resume_from:
+            await self._blocking(os.remove, target + PART_SUFFIX)
+        response.raise_for_status()
+        if ranged_download_size(response.status, response.headers, self.large_file_threshold) is not None:
+            return None
+        partial = await self._blocking(self._store.begin, url, target, response.status, response.headers,
+                                       resume_from)
+        try:
+            async for chunk in response.content.iter_chunked(self.chunk_size):
+                trace.mark("transfer")
+                await self._blocking(partial.write, chunk)
+                trace.bytes += len(chunk)
+                trace.mark("disk")
+        finally:
+            partial.close()
+        status = await self._blocking(self._store.finalize, partial)
+        trace.mark("disk")
+        return status
+
+    async def _download_large_file(self, url: str, target: str, response_headers: Mapping[str, str], total: int,
+                                   trace) -> str:
+        part_path = target + PART_SUFFIX
+        validator = response_headers.get("ETag") or response_headers.get("Last-Modified")
+        try:
+            trace.bytes += await download_ranges_async(self._session, url, part_path, total, validator,
+                                                       self.range_workers, self._host_semaphore(url), self._bucket)
+        except Exception:
+            await self._blocking(remove_part, part_path)
+            raise
+        trace.mark("transfer")
+        # adopt_part relit tout le fichier pour le sha256 : hors de la boucle d'événements
+        partial = await self._blocking(self._store.adopt_part, url, target, response_headers, total)
+        status = await self._blocking(self._store.finalize, partial)
+        trace.mark("disk")
+        return status
+
+    async def process_dataset_page(self, full_link: str, commune_folder: str, downloaded_files: Set[str]) -> List[str]:
+        """
+        Équivalent asynchrone de process_dataset_page : la page est analysée en flux et chaque
+        téléchargement est lancé dès que son lien est lu.
+        """
+        parser = file_link_extractor(self.file_types)
+        downloads = []
+
+        def schedule(links: List[str]) -> None:
+            for link in links:
+                downloads.append(asyncio.ensure_future(
+                    self.download_file(urljoin(BASE_URL, link), commune_folder, downloaded_files)
+                ))
+
+        try:
+            with start_trace(self.metrics, full_link, "dataset_page", os.path.basename(commune_folder)) as trace:
+                await self._bucket.acquire()
+                async with self._host_semaphore(full_link):
+                    async with self._session.get(full_link, trace_request_ctx=trace) as response:
+                        trace.status = response.status
+                        response.raise_for_status()
+                        async for chunk in response.content.iter_chunked(16384):
+                            trace.mark("transfer")
+                            trace.bytes += len(chunk)
+                            schedule(parser.feed_bytes(chunk))
+                            trace.mark("parse")
+                schedule(parser.feed_bytes(b"", final=True))
+                trace.mark("parse")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Erreur lors de l'accès à {full_link} : {e}")
+        results = await asyncio.gather(*downloads)
+        return [result for result in results if result]
+
+    async def api_resource_urls(self, commune_name: str, commune_label: Optional[str] = None,
+                                on_urls: Optional[Callable[[List[str]], None]] = None) -> List[str]:
+        """
+        Découverte via l'API JSON : suit le curseur next_page et retourne les URLs des ressources.
+        Chaque page est analysée en flux ; `on_urls(urls)` reçoit les nouvelles URLs dès que les jeux
+        de données qui les contiennent sont lus, pour lancer les téléchargements avant la fin de la page.
+        """
+        found: List[str] = []
+        seen: Set[str] = set()
+
+        def collect(datasets: List[Dict]) -> None:
+            urls = [url for url in resource_urls(datasets, self.file_types) if url not in seen]
+            seen.update(urls)
+            found.extend(urls)
+            if urls and on_urls:
+                on_urls(urls)
+
+        url = search_url(commune_name, api_url=self.api_url)
+        pages = 0
+        while url and (self.max_pages is None or pages < self.max_pages):
+            page = JSONPageStream()
+            with start_trace(self.metrics, url, "api_page", commune_label or commune_name) as trace:
+                await self._bucket.acquire()
+                async with self._host_semaphore(url):
+                    async with self._session.get(url, headers={"X-Fields": FIELDS_MASK},
+                                                 trace_request_ctx=trace) as response:
+                        trace.status = response.status
+                        response.raise_for_status()
+                        async for chunk in response.content.iter_chunked(16384):
+                            trace.mark("transfer")
+                            trace.bytes += len(chunk)
+                            collect(page.feed_bytes(chunk))
+                            trace.mark("parse")
+                collect(page.feed_bytes(b"", final=True))
+                trace.mark("parse")
+            url = page.meta.get("next_page")
+            pages += 1
+        return found
+
+    async def crawl_commune(self, commune_name: str) -> List[str]:
+        """
+        Équivalent asynchrone de find_and_download_files pour une commune.
+        """
+        started = time.monotonic()
+        commune_folder = commune_folder_path(commune_name, self.output_dir)
+        commune_label = os.path.basename(commune_folder)
+        downloaded_files: Set[str] = set()
+        downloaded_summary: List[str] = []
+        try:
+            if self.backend == "api":
+                downloads = []
+
+                def schedule(urls: List[str]) -> None:
+                    for url in urls:
+                        downloads.append(asyncio.ensure_future(
+                            self.download_file(url, commune_folder, downloaded_files)
+                        ))
+
+                try:
+                    file_urls = await self.api_resource_urls(commune_name, commune_label, schedule)
+                    logger.info(f"Pour la commune '{commune_name}', trouvé {len(file_urls)} fichiers via l'API.")
+                finally:
+                    # Les téléchargements déjà lancés se terminent même si une page suivante échoue
+                    results = await asyncio.gather(*downloads)
+                    downloaded_summary.extend(result for result in results if result)
+            else:
+                content = await self.fetch(SEARCH_URL.format(commune=commune_name), kind="search", commune=commune_label)
+                unique_links = extract_dataset_links(content)
+                logger.info(f"Pour la commune '{commune_name}', trouvé {len(unique_links)} jeux de données.")
+                pages = await asyncio.gather(*[
+                    self.process_dataset_page(urljoin(BASE_URL, link), commune_folder, downloaded_files)
+                    for link in unique_links
+                ])
+                for page_summary in pages:
+                    downloaded_summary.extend(page_summary)
+            google_dorks(commune_name, self.file_types)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.error(f"Erreur lors de la recherche pour {commune_name} : {e}")
+        except (OSError, sqlite3.Error) as e:
+            # Disque ou index en erreur : la commune est abandonnée, la collecte des autres continue
+            logger.error(f"Erreur d'écriture pour {commune_name} : {e}")
+        try:
+            write_download_summary(commune_folder, downloaded_summary)
+        except OSError as e:
+            logger.error(f"Impossible d'écrire le résumé de {commune_name} : {e}")
+        if self.metrics is not None:
+            self.metrics.record_commune(commune_label, time.monotonic() - started)
+        return downloaded_summary
+
+    async def crawl(self, communes: List[str],
+                    on_commune_done: Optional[Callable[[str, List[str]], None]] = None) -> Dict[str, List[str]]:
+        """
+        Collecte toutes les communes à travers un pool de connexions partagé.
+        `on_commune_done(commune, fichiers)` est appelé dès qu'une commune est terminée.
+        """
+        self._bucket = TokenBucket(self.rate, self.burst)
+        self._host_semaphores = {}
+        communes_semaphore = asyncio.Semaphore(self.max_communes_in_flight)
+        connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.per_host_limit)
+        results: Dict[str, List[str]] = {}
+
+        async def run_one(commune_name: str) -> None:
+            async with communes_semaphore:
+                downloaded = await self.crawl_commune(commune_name)
+            results[commune_name] = downloaded
+            if on_commune_done:
+                on_commune_done(commune_name, downloaded)
+
+        self._store = DownloadStore(self.output_dir)
+        trace_configs = [aiohttp_trace_config()] if self.metrics is not None else None
+        async with aiohttp.ClientSession(connector=connector, timeout=self.timeout, trace_configs=trace_configs) as session:
+            self._session = session
+            try:
+                await asyncio.gather(*[run_one(commune) for commune in communes])
+            finally:
+                self._session = None
+                self._store.close()
+                self._store = None
+        return {commune: results.get(commune, []) for commune in communes}
+
+
+def crawl_communes(communes: List[str], output_dir: str, file_types: List[str],
+                   on_commune_done: Optional[Callable[[str, List[str]], None]] = None,
+                   **crawler_options) -> Dict[str, List[str]]:
+    """
+    Point d'entrée synchrone : lance le moteur asynchrone sur la liste de communes
+    et retourne {commune: [fichiers téléchargés]}.
+    """
+    crawler = AsyncCrawler(output_dir, file_types, **crawler_options)
+    return asyncio.run(crawler.crawl(communes, on_commune_done))
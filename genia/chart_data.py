@@ -0,0 +1,104 @@
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------------------
+# Agrégation et sous-échantillonnage des données avant les graphiques Altair
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+# Altair sérialise chaque ligne dans la spécification Vega envoyée au navigateur :
+# les graphiques ne reçoivent que des données déjà agrégées ou limitées à un budget de points.
+DEFAULT_POINT_BUDGET = 2000
+DEFAULT_MAXBINS = 30
+
+
+def histogram_bins(values: pd.Series, maxbins: int = DEFAULT_MAXBINS) -> pd.DataFrame:
+    """
+    Histogramme précalculé avec np.histogram : une ligne par classe (bin_start, bin_end, count).
+    """
+    data = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+    data = data[np.isfinite(data)]
+    if data.size == 0:
+        return pd.DataFrame({"bin_start": [], "bin_end": [], "count": []})
+    counts, edges = np.histogram(data, bins=maxbins)
+    return pd.DataFrame({"bin_start": edges[:-1], "bin_end": edges[1:], "count": counts})
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets : indices des `threshold` points qui conservent le mieux
+    la forme de la courbe (x doit être trié). Le premier et le dernier point sont toujours gardés.
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:max(threshold, 0)], dtype=int)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            avg_x = x[end:edges[i + 2]].mean()
+            avg_y = y[end:edges[i + 2]].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        # Aire du triangle (point retenu précédent, candidat, moyenne du seau suivant)
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def lttb_downsample(df: pd.DataFrame, x: str, y: str, budget: int = DEFAULT_POINT_BUDGET) -> pd.DataFrame:
+    """
+    Trie df selon x et n'en garde que `budget` lignes choisies par LTTB (valeurs manquantes ignorées).
+    """
+    data = df.dropna(subset=[x, y])
+    if len(data) <= budget:
+        return data
+    data = data.sort_values(x, kind="stable")
+    indices = lttb_indices(data[x].to_numpy(dtype=float), data[y].to_numpy(dtype=float), budget)
+    return data.iloc[indices]
+
+
+def stratified_sample(df: pd.DataFrame, by: Optional[str], budget: int = DEFAULT_POINT_BUDGET,
+                      seed: int = 0) -> pd.DataFrame:
+    """
+    Échantillon aléatoire d'au plus `budget` lignes, réparti entre les groupes de la colonne `by`
+    au prorata de leur taille (au moins une ligne par groupe). S'il y a plus de groupes que de lignes
+    permises, `budget` groupes sont tirés au hasard (pondérés par leur taille), une ligne chacun.
+    """
+    if len(df) <= budget:
+        return df
+    if not by or by not in df.columns:
+        return df.sample(budget, random_state=seed)
+    rng = np.random.default_rng(seed)
+    sizes = df.groupby(by, observed=True, sort=False).size()
+    if len(sizes) > budget:
+        chosen = rng.choice(len(sizes), budget, replace=False, p=(sizes / len(df)).to_numpy())
+        quotas = pd.Series(0, index=sizes.index)
+        quotas.iloc[chosen] = 1
+    else:
+        # Une ligne par groupe, puis le reste du budget au prorata (arrondi inférieur : total <= budget)
+        quotas = 1 + np.floor((sizes - 1) * (budget - len(sizes)) / (len(df) - len(sizes))).astype(int)
+    keys = pd.Series(rng.random(len(df)), index=df.index)
+    ranks = keys.groupby(df[by], observed=True, sort=False).rank(method="first")
+    limits = quotas.reindex(df[by].astype(object)).to_numpy()
+    return df[ranks.to_numpy() <= limits]
+
+
+def aggregate_by(df: pd.DataFrame, by: str, columns: List[str], agg: str = "sum",
+                 limit: Optional[int] = None) -> pd.DataFrame:
+    """
+    Agrégation groupée (une ligne par valeur de `by`) ; avec `limit`, seuls les groupes ayant
+    les plus grandes valeurs de la première colonne sont conservés.
+    """
+    aggregated = df.groupby(by, observed=True)[columns].agg(agg).reset_index()
+    if limit is not None and len(aggregated) > limit:
+        aggregated = aggregated.nlargest(limit, columns[0])
+    return aggregated
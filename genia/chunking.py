@@ -0,0 +1,302 @@
+import re
+import hashlib
+from collections import defaultdict
+from typing import Dict, Generator, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from genia.rag_pipeline import estimate_tokens
+
+# ----------------------------------------------------------------
+# Découpage des documents par page, titre et phrase (avec recouvrement)
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+# Un morceau ne traverse ni une page ni un titre ; il regroupe des phrases entières jusqu'au budget de tokens
+# et reprend les dernières phrases du précédent (recouvrement). Les en-têtes et pieds de page répétés, ainsi
+# que les morceaux quasi identiques, sont écartés par MinHash.
+DEFAULT_MAX_TOKENS = 300
+DEFAULT_OVERLAP_TOKENS = 50
+DEFAULT_MIN_TOKENS = 30
+# Un morceau de moins de MIN_TOKENS est fusionné avec le précédent tant que l'ensemble reste sous ce facteur
+MERGE_SLACK = 1.25
+MAX_HEADING_CHARS = 80
+EDGE_LINE_CHARS = 100
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16
+DEFAULT_SHINGLE_SIZE = 5
+DEFAULT_DUPLICATE_THRESHOLD = 0.8
+
+_NUMBERED_HEADING = re.compile(r"^(?:\d+(?:\.\d+)*[.)]?|[IVXLC]+[.)]|article\s+\d+)\s+\S", re.IGNORECASE)
+# Un point entre deux chiffres (« 2.5 m », « 3.2 ») ne termine pas la phrase
+_SENTENCE = re.compile(r"\S(?:[^.!?]|(?<=\d)\.(?=\d))*(?:[.!?]+|$)")
+_DIGITS = re.compile(r"\d+")
+_LINE = re.compile(r"[^\n]*\S[^\n]*")
+_WORD = re.compile(r"\S+")
+
+
+class Chunk:
+    """
+    Morceau de texte avec sa provenance : page (à partir de 1), positions [start, end) dans le texte
+    de la page et titre de la section en cours.
+    """
+    def __init__(self, text: str, page: int, start: int, end: int, section: Optional[str] = None):
+        self.text = text
+        self.page = page
+        self.start = start
+        self.end = end
+        self.section = section
+
+    @property
+    def chunk_id(self) -> str:
+        return hashlib.sha256(f"{self.page}:{self.start}:{self.text}".encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+    def to_dict(self) -> Dict:
+        return {"chunk_id": self.chunk_id, "text": self.text, "page": self.page, "start": self.start,
+                "end": self.end, "section": self.section}
+
+
+# Détection des quasi-doublons (MinHash + LSH)
+class MinHasher:
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, shingle_size: int = DEFAULT_SHINGLE_SIZE, seed: int = 1,
+                 mask_digits: bool = False):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.mask_digits = mask_digits
+        # Hachage universel multiply-shift (débordement modulo 2**64 voulu)
+        self._a = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> Set[str]:
+        text = " ".join(text.casefold().split())
+        if self.mask_digits:
+            # Nombres neutralisés (en-têtes et pieds de page seulement) : « Page 3 / 40 » ≈ « Page 4 / 40 »
+            text = _DIGITS.sub("0", text)
+        if len(text) <= self.shingle_size:
+            return {text}
+        return {text[i:i + self.shingle_size] for i in range(len(text) - self.shingle_size + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter((int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+                              for s in self.shingles(text)), dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            permuted = np.outer(hashes, self._a) + self._b
+        return (permuted >> np.uint64(32)).min(axis=0)
+
+
+class NearDuplicateFilter:
+    """
+    Mémorise les textes déjà vus ; `seen(text)` est vrai si un texte de similarité de Jaccard estimée
+    >= threshold a déjà été ajouté (recherche des candidats par bandes LSH).
+    """
+    def __init__(self, threshold: float = DEFAULT_DUPLICATE_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM,
+                 bands: int = DEFAULT_BANDS, hasher: Optional[MinHasher] = None):
+        self.threshold = threshold
+        self.hasher = hasher if hasher is not None else MinHasher(num_perm)
+        self.bands = bands
+        self.rows = self.hasher.num_perm // bands
+        self._signatures: List[np.ndarray] = []
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def seen(self, text: str, add: bool = True) -> bool:
+        signature = self.hasher.signature(text)
+        keys = self._band_keys(signature)
+        candidates = {i for key in keys for i in self._buckets.get(key, ())}
+        if any(np.mean(self._signatures[i] == signature) >= self.threshold for i in candidates):
+            return True
+        if add:
+            for key in keys:
+                self._buckets[key].append(len(self._signatures))
+            self._signatures.append(signature)
+        return False
+
+
+# Découpage
+def is_heading(line: str) -> bool:
+    line = line.strip()
+    if not line or len(line) > MAX_HEADING_CHARS or line.endswith((".", ",", ";")):
+        return False
+    if _NUMBERED_HEADING.match(line):
+        return True
+    letters = [c for c in line if c.isalpha()]
+    return len(letters) >= 3 and sum(c.isupper() for c in letters) / len(letters) > 0.7
+
+
+def _lines(text: str) -> List[Tuple[int, int]]:
+    spans, start = [], 0
+    for line in text.split("\n"):
+        spans.append((start, start + len(line)))
+        start += len(line) + 1
+    return [(s, e) for s, e in spans if text[s:e].strip()]
+
+
+def _sentence_pieces(text: str, start: int, end: int, max_tokens: int) -> Iterator[Tuple[int, int]]:
+    """
+    Découpe une phrase plus longue que le budget (tableau, liste, ponctuation perdue à l'extraction) :
+    aux retours à la ligne, puis entre les mots, en regroupant les morceaux tant qu'ils tiennent dans le budget.
+    """
+    if estimate_tokens(text[start:end]) <= max_tokens:
+        yield start, end
+        return
+    for pattern in (_LINE, _WORD):
+        spans = [(match.start(), match.end()) for match in pattern.finditer(text, start, end)]
+        if len(spans) > 1:
+            break
+    else:
+        # Un seul « mot » plus long que le budget (URL, suite de caractères) : coupé à taille fixe
+        step = 4 * max_tokens
+        for position in range(start, end, step):
+            yield position, min(position + step, end)
+        return
+    piece_start, piece_end = spans[0]
+    for span_start, span_end in spans[1:]:
+        if estimate_tokens(text[piece_start:span_end]) > max_tokens:
+            yield from _sentence_pieces(text, piece_start, piece_end, max_tokens)
+            piece_start = span_start
+        piece_end = span_end
+    yield from _sentence_pieces(text, piece_start, piece_end, max_tokens)
+
+
+class _Builder:
+    """
+    Accumule les phrases d'une page et produit les morceaux (recouvrement, fusion des petits morceaux).
+    """
+    def __init__(self, page: int, text: str, max_tokens: int, overlap_tokens: int, min_tokens: int):
+        self.page = page
+        self.text = text
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_tokens = min_tokens
+        self.section: Optional[str] = None
+        self.sentences: List[Tuple[int, int, int]] = []
+        self.has_new = False
+        self.has_body = False
+        self.pending: Optional[Chunk] = None
+
+    def _chunk(self) -> Chunk:
+        start, end = self.sentences[0][0], self.sentences[-1][1]
+        body = " ".join(" ".join(self.text[s:e].split()) for s, e, _ in self.sentences)
+        return Chunk(body, self.page, start, end, self.section)
+
+    def _emit(self, chunk: Chunk) -> Iterator[Chunk]:
+        pending = self.pending
+        if (pending is not None and chunk.tokens < self.min_tokens and pending.section == chunk.section
+                and pending.tokens + chunk.tokens <= self.max_tokens * MERGE_SLACK):
+            # Petit reste : rattaché au morceau précédent (sans répéter le recouvrement)
+            tail = self.text[max(pending.end, chunk.start):chunk.end]
+            if tail.strip():
+                pending.text = f"{pending.text} {' '.join(tail.split())}"
+            pending.end = chunk.end
+            return
+        if pending is not None:
+            yield pending
+        self.pending = chunk
+
+    def flush(self, keep_overlap: bool) -> Iterator[Chunk]:
+        # Un titre seul (section vide) ne fait pas un morceau
+        if self.sentences and self.has_new and self.has_body:
+            yield from self._emit(self._chunk())
+        kept: List[Tuple[int, int, int]] = []
+        if keep_overlap:
+            budget = self.overlap_tokens
+            for sentence in reversed(self.sentences):
+                if sentence[2] > budget:
+                    break
+                kept.insert(0, sentence)
+                budget -= sentence[2]
+        self.sentences = kept
+        self.has_new = False
+        self.has_body = False
+
+    def add(self, start: int, end: int, body: bool = True) -> Iterator[Chunk]:
+        tokens = estimate_tokens(self.text[start:end])
+        if self.has_new and sum(t for *_, t in self.sentences) + tokens > self.max_tokens:
+            yield from self.flush(keep_overlap=True)
+            # Le recouvrement ne doit pas à lui seul dépasser le budget
+            while self.sentences and sum(t for *_, t in self.sentences) + tokens > self.max_tokens:
+                self.sentences.pop(0)
+        self.sentences.append((start, end, tokens))
+        self.has_new = True
+        self.has_body = self.has_body or body
+
+    def heading(self, start: int, end: int) -> Iterator[Chunk]:
+        yield from self.flush(keep_overlap=False)
+        self.section = " ".join(self.text[start:end].split())
+        yield from self.add(start, end, body=False)
+
+    def close(self) -> Iterator[Chunk]:
+        yield from self.flush(keep_overlap=False)
+        if self.pending is not None:
+            yield self.pending
+            self.pending = None
+
+
+def chunk_page(page: int, text: str, max_tokens: int = DEFAULT_MAX_TOKENS,
+               overlap_tokens: int = DEFAULT_OVERLAP_TOKENS, min_tokens: int = DEFAULT_MIN_TOKENS,
+               section: Optional[str] = None,
+               skip_lines: Iterable[Tuple[int, int]] = ()) -> Generator[Chunk, None, Optional[str]]:
+    """
+    Découpe une page ; retourne (valeur de fin du générateur) la section en cours en fin de page,
+    y compris un titre placé en dernière ligne, pour la page suivante.
+    """
+    builder = _Builder(page, text, max_tokens, overlap_tokens, min_tokens)
+    builder.section = section
+    skipped = set(skip_lines)
+    paragraph: Optional[List[int]] = None
+    for start, end in _lines(text) + [(len(text), len(text))]:
+        heading = start < len(text) and is_heading(text[start:end])
+        # Un paragraphe se termine sur un titre, une ligne ignorée ou à la fin de la page
+        if paragraph is not None and (heading or (start, end) in skipped or start == len(text)):
+            for match in _SENTENCE.finditer(text, paragraph[0], paragraph[1]):
+                for piece_start, piece_end in _sentence_pieces(text, match.start(), match.end(), max_tokens):
+                    yield from builder.add(piece_start, piece_end)
+            paragraph = None
+        if start == len(text) or (start, end) in skipped:
+            continue
+        if heading:
+            yield from builder.heading(start, end)
+        elif paragraph is None:
+            paragraph = [start, end]
+        else:
+            paragraph[1] = end
+    yield from builder.close()
+    return builder.section
+
+
+def chunk_pages(pages: Iterable[Tuple[int, str]], max_tokens: int = DEFAULT_MAX_TOKENS,
+                overlap_tokens: int = DEFAULT_OVERLAP_TOKENS, min_tokens: int = DEFAULT_MIN_TOKENS,
+                dedupe: bool = True, duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD) -> Iterator[Chunk]:
+    """
+    Découpe les pages (numéro, texte) au fil de l'eau. Avec `dedupe`, la première et la dernière ligne de chaque
+    page qui reproduisent celles d'une page précédente (en-têtes, pieds de page) sont ignorées, ainsi que tout
+    morceau quasi identique à un morceau déjà produit.
+    """
+    # Les lignes de bord ne diffèrent souvent que par le numéro de page ; les morceaux, eux, sont comparés
+    # chiffres compris (deux zones aux populations ou hauteurs de crue différentes ne sont pas des doublons)
+    edges = NearDuplicateFilter(duplicate_threshold, hasher=MinHasher(mask_digits=True))
+    chunks = NearDuplicateFilter(duplicate_threshold)
+    section = None
+    for page, text in pages:
+        skip = []
+        if dedupe:
+            lines = _lines(text)
+            for start, end in {lines[0], lines[-1]} if lines else ():
+                if end - start <= EDGE_LINE_CHARS and edges.seen(text[start:end]):
+                    skip.append((start, end))
+        page_chunks = chunk_page(page, text, max_tokens, overlap_tokens, min_tokens, section, skip)
+        while True:
+            try:
+                chunk = next(page_chunks)
+            except StopIteration as done:
+                section = done.value
+                break
+            if dedupe and chunks.seen(chunk.text):
+                continue
+            yield chunk
@@ -0,0 +1,153 @@
+"""
+Collecte en ligne de commande, sans Streamlit ni dépendances ML :
+
+    python -m genia.crawl communes.txt --output-dir data --file-types pdf json csv --processes 4
+
+Le fichier contient une commune par ligne (lignes vides et commentaires « # » ignorés, « - » pour stdin).
+La progression est écrite sur stdout en JSON lines ; les logs restent sur stderr.
+"""
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from queue import Empty
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from genia.scraper import DISCOVERY_BACKENDS
+from genia.datagouv_api import API_URL
+from genia.metrics import CrawlMetrics
+
+
+def read_communes(path: str) -> List[str]:
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        communes = [line.strip() for line in stream]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return [commune for commune in communes if commune and not commune.startswith("#")]
+
+
+def split_communes(communes: List[str], parts: int) -> List[List[str]]:
+    """
+    Répartit les communes en `parts` lots (tourniquet, pour équilibrer les lots).
+    """
+    return [shard for shard in (communes[i::parts] for i in range(parts)) if shard]
+
+
+def emit(event: Dict) -> None:
+    sys.stdout.write(json.dumps(event, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def crawl_shard(communes: List[str], options: Dict, report: Callable[[Dict], None]) -> Tuple[int, Optional[CrawlMetrics]]:
+    """
+    Collecte un lot de communes dans le processus courant et signale chaque commune terminée.
+    Retourne le nombre total de fichiers téléchargés et les métriques du lot (si demandées).
+    """
+    metrics = CrawlMetrics() if options.get("metrics") else None
+    worker = multiprocessing.current_process().name
+    total_files = 0
+    started = time.monotonic()
+
+    def commune_done(commune: str, downloaded: List[str]) -> None:
+        nonlocal total_files
+        total_files += len(downloaded)
+        report({"event": "commune_done", "commune": commune, "files": downloaded, "count": len(downloaded),
+                "elapsed": round(time.monotonic() - started, 3), "worker": worker})
+
+    if options["engine"] == "async":
+        # Import local : aiohttp n'est nécessaire que pour le moteur asynchrone
+        from genia.async_crawler import crawl_communes
+        crawl_communes(communes, options["output_dir"], options["file_types"], on_commune_done=commune_done,
+                       backend=options["backend"], api_url=options["api_url"], per_host_limit=options["per_host_limit"], rate=options["rate"],
+                       metrics=metrics)
+    else:
+        from genia.scraper import find_and_download_files
+        for commune in communes:
+            commune_done(commune, find_and_download_files(commune, options["output_dir"], options["file_types"],
+                                                          options["max_workers"], backend=options["backend"],
+                                                          api_url=options["api_url"], metrics=metrics))
+    return total_files, metrics
+
+
+def _crawl_shard_in_process(communes: List[str], options: Dict, queue) -> Tuple[int, Optional[CrawlMetrics]]:
+    return crawl_shard(communes, options, queue.put)
+
+
+def run(communes: List[str], options: Dict, processes: int = 1) -> int:
+    """
+    Lance la collecte, éventuellement répartie sur plusieurs processus, et écrit la progression en JSON lines.
+    Le débit maximal (--rate) est partagé entre les processus. Si options["metrics"] indique un chemin,
+    les métriques de tous les processus y sont fusionnées et un rapport est écrit sur stderr.
+    """
+    started = time.monotonic()
+    emit({"event": "start", "communes": len(communes), "processes": processes})
+    if processes <= 1:
+        total_files, metrics = crawl_shard(communes, options, emit)
+    else:
+        shards = split_communes(communes, processes)
+        shard_options = dict(options, rate=options["rate"] / len(shards))
+        with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=len(shards)) as executor:
+            queue = manager.Queue()
+            futures = [executor.submit(_crawl_shard_in_process, shard, shard_options, queue) for shard in shards]
+            while True:
+                try:
+                    emit(queue.get(timeout=1))
+                except Empty:
+                    if all(future.done() for future in futures):
+                        break
+            results = [future.result() for future in futures]
+        total_files = sum(files for files, _ in results)
+        metrics = None
+        for _, shard_metrics in results:
+            if shard_metrics is not None:
+                metrics = metrics or CrawlMetrics()
+                metrics.merge(shard_metrics)
+    emit({"event": "done", "communes": len(communes), "files": total_files,
+          "elapsed": round(time.monotonic() - started, 3)})
+    if metrics is not None:
+        metrics.dump(options["metrics"])
+        sys.stderr.write(metrics.report() + "\n")
+    return total_files
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m genia.crawl",
+                                     description="Collecte de datasets data.gouv.fr pour une liste de communes.")
+    parser.add_argument("communes_file", help="Fichier texte, une commune par ligne (« - » pour stdin)")
+    parser.add_argument("--output-dir", default="HGENIA", help="Dossier de sortie")
+    parser.add_argument("--file-types", nargs="+", default=["pdf", "json", "csv"], help="Extensions à télécharger")
+    parser.add_argument("--backend", choices=DISCOVERY_BACKENDS, default="api", help="Source de découverte des fichiers")
+    parser.add_argument("--api-url", default=API_URL, help="Racine de l'API data.gouv.fr (backend api)")
+    parser.add_argument("--engine", choices=("threads", "async"), default="threads", help="Moteur de collecte")
+    parser.add_argument("--max-workers", type=int, default=10, help="Threads par commune (moteur threads)")
+    parser.add_argument("--per-host-limit", type=int, default=8, help="Connexions simultanées par hôte (moteur async)")
+    parser.add_argument("--rate", type=float, default=20.0, help="Requêtes par seconde, tous processus confondus (moteur async)")
+    parser.add_argument("--metrics", metavar="CHEMIN",
+                        help="Enregistre les métriques de la collecte (.prom : format Prometheus, sinon JSON)")
+    parser.add_argument("--processes", type=int, default=1, help="Nombre de processus entre lesquels répartir les communes")
+    args = parser.parse_args(argv)
+
+    communes = read_communes(args.communes_file)
+    if not communes:
+        parser.error("aucune commune dans le fichier")
+    options = {
+        "output_dir": args.output_dir,
+        "file_types": args.file_types,
+        "backend": args.backend,
+        "api_url": args.api_url,
+        "engine": args.engine,
+        "max_workers": args.max_workers,
+        "per_host_limit": args.per_host_limit,
+        "rate": args.rate,
+        "metrics": args.metrics,
+    }
+    run(communes, options, max(1, args.processes))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
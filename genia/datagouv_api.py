@@ -0,0 +1,198 @@
+import json
+import codecs
+from urllib.parse import quote_plus
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from genia.metrics import start_trace
+
+# ----------------------------------------------------------------
+# Découverte des ressources via l'API JSON de data.gouv.fr
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+API_URL = "https://www.data.gouv.fr/api/1/"
+DEFAULT_PAGE_SIZE = 50
+DEFAULT_MAX_PAGES = 4
+# Masque de champs (X-Fields) : l'API ne renvoie que ce qui sert à la collecte
+FIELDS_MASK = "data{id,slug,resources{url,format}},next_page,total"
+
+_WHITESPACE = " \t\n\r"
+_INCOMPLETE = object()
+
+
+class JSONPageStream:
+    """
+    Analyse incrémentale d'une page de l'API ({"data": [...], "next_page": ..., ...}).
+    Les éléments de `data` sont produits au fur et à mesure de la réception des octets, soit en itérant
+    sur `chunks`, soit en poussant les morceaux avec feed_bytes (client asynchrone) ; les autres champs
+    de la page sont disponibles dans `meta` une fois la page terminée.
+    """
+    def __init__(self, chunks: Iterable[bytes] = (), items_key: str = "data"):
+        self._chunks = chunks
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        # Position dans la page : l'analyse reprend là où le morceau précédent s'est arrêté
+        self._state = "open"
+        self._key = None
+        self.items_key = items_key
+        self.meta: Dict = {}
+
+    def _peek(self) -> Optional[str]:
+        while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+            self._pos += 1
+        return self._buffer[self._pos] if self._pos < len(self._buffer) else None
+
+    def _expect(self, char: str) -> None:
+        if self._buffer[self._pos] != char:
+            raise ValueError(f"JSON invalide : '{char}' attendu, '{self._buffer[self._pos]}' trouvé")
+        self._pos += 1
+
+    def _value(self):
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if self._eof:
+                raise
+            return _INCOMPLETE
+        # Un nombre en fin de tampon peut être tronqué : on attend le caractère suivant
+        if end == len(self._buffer) and not self._eof:
+            return _INCOMPLETE
+        self._pos = end
+        return value
+
+    def _step(self, items: List[Dict]) -> bool:
+        """
+        Avance d'un élément syntaxique ; retourne False s'il faut attendre la suite du flux.
+        """
+        char = self._peek()
+        if char is None or self._state == "done":
+            return False
+        if self._state == "open":
+            self._expect("{")
+            self._state = "first_key"
+        elif self._state == "first_key":
+            if char == "}":
+                self._pos += 1
+                self._state = "done"
+            else:
+                self._state = "key"
+        elif self._state == "key":
+            key = self._value()
+            if key is _INCOMPLETE:
+                return False
+            self._key = key
+            self._state = "colon"
+        elif self._state == "colon":
+            self._expect(":")
+            self._state = "value"
+        elif self._state == "value":
+            if self._key == self.items_key and char == "[":
+                self._pos += 1
+                self._state = "first_item"
+            else:
+                value = self._value()
+                if value is _INCOMPLETE:
+                    return False
+                self.meta[self._key] = value
+                self._state = "separator"
+        elif self._state == "first_item":
+            if char == "]":
+                self._pos += 1
+                self._state = "separator"
+            else:
+                self._state = "item"
+        elif self._state == "item":
+            item = self._value()
+            if item is _INCOMPLETE:
+                return False
+            items.append(item)
+            self._state = "item_separator"
+        elif self._state == "item_separator":
+            if char == ",":
+                self._pos += 1
+                self._state = "item"
+            else:
+                self._expect("]")
+                self._state = "separator"
+        elif self._state == "separator":
+            if char == ",":
+                self._pos += 1
+                self._state = "key"
+            else:
+                self._expect("}")
+                self._state = "done"
+        return True
+
+    def feed_bytes(self, chunk: bytes, final: bool = False) -> List[Dict]:
+        """
+        Analyse un morceau de page et retourne les éléments de `data` complétés depuis le dernier appel.
+        """
+        self._buffer = self._buffer[self._pos:] + self._utf8.decode(chunk, final=final)
+        self._pos = 0
+        self._eof = final
+        items: List[Dict] = []
+        while self._step(items):
+            pass
+        if final and self._state != "done":
+            raise ValueError("Fin de flux JSON inattendue")
+        return items
+
+    def __iter__(self) -> Iterator[Dict]:
+        for chunk in self._chunks:
+            yield from self.feed_bytes(chunk)
+        yield from self.feed_bytes(b"", final=True)
+
+
+def search_url(commune_name: str, page_size: int = DEFAULT_PAGE_SIZE, api_url: str = API_URL) -> str:
+    return f"{api_url.rstrip('/')}/datasets/?q={quote_plus(commune_name)}&page_size={page_size}"
+
+
+def _counted(chunks: Iterable[bytes], trace) -> Iterator[bytes]:
+    for chunk in chunks:
+        trace.bytes += len(chunk)
+        yield chunk
+
+
+def iter_datasets(session, commune_name: str, page_size: int = DEFAULT_PAGE_SIZE,
+                  max_pages: Optional[int] = DEFAULT_MAX_PAGES, api_url: str = API_URL,
+                  timeout: float = 10, metrics=None, commune_label: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Parcourt les jeux de données d'une recherche en suivant le curseur `next_page` de l'API.
+    Chaque page est lue en flux : les jeux de données sont produits avant la fin du transfert.
+    """
+    url = search_url(commune_name, page_size, api_url)
+    pages = 0
+    while url and (max_pages is None or pages < max_pages):
+        with start_trace(metrics, url, "api_page", commune_label or commune_name) as trace:
+            with session.get(url, stream=True, timeout=timeout, headers={"X-Fields": FIELDS_MASK}) as response:
+                trace.mark("ttfb")
+                trace.status = response.status_code
+                response.raise_for_status()
+                page = JSONPageStream(_counted(response.iter_content(chunk_size=16384), trace))
+                for dataset in page:
+                    trace.mark("transfer")
+                    yield dataset
+                    trace.exclude()
+                trace.mark("transfer")
+        url = page.meta.get("next_page")
+        pages += 1
+
+
+def resource_urls(datasets: Iterable[Dict], file_types: List[str]) -> Iterator[str]:
+    """
+    Filtre les ressources des jeux de données par extension d'URL ou par format déclaré.
+    Chaque URL n'est produite qu'une seule fois.
+    """
+    extensions = tuple(f".{file_type.lower()}" for file_type in file_types)
+    formats = {file_type.lower() for file_type in file_types}
+    seen = set()
+    for dataset in datasets:
+        for resource in dataset.get("resources") or []:
+            url = resource.get("url")
+            if not url or url in seen:
+                continue
+            if url.lower().endswith(extensions) or (resource.get("format") or "").lower() in formats:
+                seen.add(url)
+                yield url
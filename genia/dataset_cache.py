@@ -0,0 +1,116 @@
+import os
+import hashlib
+import tempfile
+from functools import lru_cache
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+# ----------------------------------------------------------------
+# Cache colonnaire (Arrow IPC) des fichiers chargés dans le dashboard
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+# Chaque fichier est converti une seule fois, sous le nom <sha256 du contenu>.arrow.
+# Le format IPC non compressé est projeté en mémoire (mmap) : les sessions Streamlit partagent
+# les mêmes pages et seules les colonnes lues par un graphique sont effectivement chargées.
+DATA_CACHE_DIR = os.environ.get("GENIA_DATA_CACHE", os.path.join(tempfile.gettempdir(), "genia_dashboard_cache"))
+CACHE_SUFFIX = ".arrow"
+CATEGORICAL_COLUMNS = ("commune", "documents")
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_hash(fileobj) -> str:
+    """
+    Empreinte SHA-256 du contenu d'un fichier ouvert (lu par blocs, position remise à zéro).
+    """
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def _read_table(fileobj, name: str) -> pa.Table:
+    if name.endswith(".csv"):
+        # Lecteur CSV multithread d'Arrow, sans passer par un DataFrame intermédiaire
+        table = pa_csv.read_csv(fileobj)
+    elif name.endswith(".json"):
+        table = pa.Table.from_pandas(pd.read_json(fileobj), preserve_index=False)
+    else:
+        raise ValueError(f"Format non supporté : {name}")
+    if "date" in table.column_names and not pa.types.is_timestamp(table.schema.field("date").type):
+        dates = pd.to_datetime(table.column("date").to_pandas())
+        table = table.set_column(table.schema.get_field_index("date"), "date", pa.array(dates))
+    for column in CATEGORICAL_COLUMNS:
+        if column in table.column_names and (pa.types.is_string(table.schema.field(column).type)
+                                             or pa.types.is_large_string(table.schema.field(column).type)):
+            # Colonnes dictionnaire : converties en dtype category par to_pandas()
+            table = table.set_column(table.schema.get_field_index(column), column,
+                                     table.column(column).dictionary_encode())
+    return table
+
+
+def cache_upload(fileobj, name: str, cache_dir: str = DATA_CACHE_DIR) -> str:
+    """
+    Retourne le chemin du cache Arrow d'un fichier CSV/JSON, en le créant au premier chargement.
+    """
+    path = os.path.join(cache_dir, content_hash(fileobj) + CACHE_SUFFIX)
+    if os.path.exists(path):
+        return path
+    os.makedirs(cache_dir, exist_ok=True)
+    table = _read_table(fileobj, name)
+    fileobj.seek(0)
+    # Écriture dans un fichier temporaire puis renommage : un cache visible est toujours complet
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=CACHE_SUFFIX + ".tmp")
+    try:
+        with os.fdopen(fd, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return path
+
+
+def dataset_hash(path: str) -> str:
+    """
+    Empreinte du contenu d'origine d'un cache (son nom de fichier).
+    """
+    return os.path.basename(path)[:-len(CACHE_SUFFIX)]
+
+
+@lru_cache(maxsize=8)
+def open_dataset(path: str) -> pa.Table:
+    """
+    Table Arrow projetée en mémoire (sans copie), partagée par toutes les sessions du processus.
+    """
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+
+def dataset_columns(path: str) -> List[str]:
+    return open_dataset(path).column_names
+
+
+def numeric_columns(path: str) -> List[str]:
+    schema = open_dataset(path).schema
+    return [field.name for field in schema if pa.types.is_integer(field.type) or pa.types.is_floating(field.type)]
+
+
+def dataset_length(path: str) -> int:
+    return open_dataset(path).num_rows
+
+
+def load_columns(path: str, columns: Optional[List[str]] = None, limit: Optional[int] = None) -> pd.DataFrame:
+    """
+    Charge uniquement les colonnes demandées (celles absentes du fichier sont ignorées),
+    éventuellement limitées aux `limit` premières lignes.
+    """
+    table = open_dataset(path)
+    if columns is not None:
+        table = table.select([column for column in dict.fromkeys(columns) if column in table.column_names])
+    if limit is not None:
+        table = table.slice(0, limit)
+    return table.to_pandas()
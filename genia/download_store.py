@@ -0,0 +1,333 @@
+import os
+import re
+import shutil
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, Mapping, Optional, Tuple
+
+from genia.metrics import NullTrace
+from genia.ranged_download import (
+    DEFAULT_RANGE_WORKERS,
+    LARGE_FILE_THRESHOLD,
+    download_ranges,
+    ranged_download_size,
+    remove_part,
+)
+
+# ----------------------------------------------------------------
+# Index persistant des téléchargements (adressage par contenu)
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+INDEX_FILENAME = ".download_index.sqlite3"
+OBJECTS_DIRNAME = ".objects"
+PART_SUFFIX = ".part"
+
+# Statuts retournés par DownloadStore.finalize / fetch
+STATUS_DOWNLOADED = "downloaded"
+STATUS_DEDUPLICATED = "deduplicated"
+STATUS_NOT_MODIFIED = "not_modified"
+
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+class PartialDownload:
+    """
+    Écriture en cours d'un fichier dans <cible>.part, avec calcul incrémental du sha256.
+    En cas d'interruption, le fichier .part est conservé pour une reprise par requête Range.
+    """
+    def __init__(self, url: str, target: str, resume_from: int, expected_size: Optional[int],
+                 etag: Optional[str] = None, last_modified: Optional[str] = None,
+                 previous_sha256: Optional[str] = None):
+        self.url = url
+        self.target = target
+        self.part_path = target + PART_SUFFIX
+        self.expected_size = expected_size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.previous_sha256 = previous_sha256
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        if resume_from:
+            with open(self.part_path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    self.hasher.update(block)
+            self.size = resume_from
+            self._file = open(self.part_path, 'ab')
+        else:
+            self._file = open(self.part_path, 'wb')
+
+    def write(self, chunk: bytes) -> None:
+        if chunk:
+            self._file.write(chunk)
+            self.hasher.update(chunk)
+            self.size += len(chunk)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+_FIELDS = ("url", "path", "etag", "last_modified", "size", "sha256")
+
+
+class DownloadStore:
+    """
+    Index des téléchargements par (URL, dossier de commune) : chemin, ETag, Last-Modified, taille, sha256,
+    stocké en SQLite à la racine du dossier de sortie. Les contenus sont rangés une seule fois dans
+    .objects/<sha256> et liés physiquement (hardlink) dans le dossier de chaque commune ; une ressource
+    partagée par plusieurs communes a une ligne par dossier.
+    """
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        self.objects_dir = os.path.join(root_dir, OBJECTS_DIRNAME)
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        # Chemins attribués par target_path (chemin -> URL), avant même l'écriture de la ligne dans l'index
+        self._claimed: Dict[str, str] = {}
+        # timeout : plusieurs processus de collecte peuvent partager le même index
+        self._conn = sqlite3.connect(os.path.join(root_dir, INDEX_FILENAME), check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " url TEXT NOT NULL, folder TEXT NOT NULL, path TEXT NOT NULL, etag TEXT, last_modified TEXT,"
+                " size INTEGER, sha256 TEXT, updated_at TEXT, PRIMARY KEY (url, folder))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS files_path ON files(path)")
+            self._migrate()
+
+    def _migrate(self) -> None:
+        # Ancien index (une ligne par URL) : chaque ligne est reprise pour le dossier de son chemin
+        if self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'downloads'").fetchone():
+            rows = self._conn.execute(
+                "SELECT url, path, etag, last_modified, size, sha256, updated_at FROM downloads").fetchall()
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO files (url, folder, path, etag, last_modified, size, sha256, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(url, os.path.dirname(path), path, *rest) for url, path, *rest in rows])
+            self._conn.execute("DROP TABLE downloads")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get(self, url: str, folder: str) -> Optional[Dict]:
+        """
+        Entrée de l'URL pour un dossier de commune.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, path, etag, last_modified, size, sha256 FROM files WHERE url = ? AND folder = ?",
+                (url, os.path.normpath(folder))
+            ).fetchone()
+        return None if row is None else dict(zip(_FIELDS, row))
+
+    def latest(self, url: str) -> Optional[Dict]:
+        """
+        Dernier contenu complet connu de l'URL, tous dossiers confondus.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, path, etag, last_modified, size, sha256 FROM files"
+                " WHERE url = ? AND sha256 IS NOT NULL ORDER BY updated_at DESC LIMIT 1", (url,)
+            ).fetchone()
+        return None if row is None else dict(zip(_FIELDS, row))
+
+    def _upsert(self, url: str, path: str, etag: Optional[str], last_modified: Optional[str],
+                size: Optional[int], sha256: Optional[str]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (url, folder, path, etag, last_modified, size, sha256, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, os.path.dirname(path), path, etag, last_modified, size, sha256, datetime.now().isoformat())
+            )
+            self._conn.commit()
+
+    def target_path(self, url: str, output_folder: str) -> str:
+        """
+        Chemin local d'une URL : le nom de base de l'URL, suffixé d'un hash de l'URL
+        si ce nom est déjà utilisé par une autre URL dans le même dossier.
+        Le chemin est réservé dès ce choix : deux téléchargements concurrents d'URL différentes
+        de même nom n'écrivent jamais dans le même fichier .part.
+        """
+        entry = self.get(url, output_folder)
+        if entry:
+            with self._lock:
+                self._claimed.setdefault(entry["path"], url)
+            return entry["path"]
+        candidate = os.path.normpath(os.path.join(output_folder, os.path.basename(url)))
+        with self._lock:
+            owner = self._claimed.get(candidate)
+            if owner is None:
+                row = self._conn.execute("SELECT url FROM files WHERE path = ?", (candidate,)).fetchone()
+                owner = row[0] if row else None
+            if owner is not None and owner != url:
+                stem, ext = os.path.splitext(candidate)
+                candidate = f"{stem}-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}{ext}"
+            self._claimed[candidate] = url
+        return candidate
+
+    def object_path(self, sha256: str) -> str:
+        return os.path.join(self.objects_dir, sha256[:2], sha256)
+
+    def _link_object(self, object_path: str, target: str) -> None:
+        if os.path.lexists(target):
+            os.remove(target)
+        try:
+            os.link(object_path, target)
+        except OSError:
+            shutil.copyfile(object_path, target)
+
+    def request_headers(self, url: str, target: str) -> Tuple[Dict[str, str], int]:
+        """
+        En-têtes à envoyer pour l'URL : requête conditionnelle si son contenu est déjà dans le store
+        (téléchargé pour ce dossier ou pour une autre commune), requête Range (avec If-Range) si un fichier
+        .part peut être repris. Retourne (en-têtes, position de reprise).
+        """
+        entry = self.get(url, os.path.dirname(target))
+        known = entry if entry and entry["sha256"] else self.latest(url)
+        headers: Dict[str, str] = {}
+        if known and os.path.exists(self.object_path(known["sha256"])):
+            if known["etag"]:
+                headers["If-None-Match"] = known["etag"]
+            if known["last_modified"]:
+                headers["If-Modified-Since"] = known["last_modified"]
+            return headers, 0
+        if entry is None:
+            return {}, 0
+        part_path = target + PART_SUFFIX
+        validator = entry["etag"] or entry["last_modified"]
+        if entry["path"] == target and not entry["sha256"] and validator and os.path.exists(part_path):
+            resume_from = os.path.getsize(part_path)
+            if resume_from:
+                headers["Range"] = f"bytes={resume_from}-"
+                headers["If-Range"] = validator
+                return headers, resume_from
+        return headers, 0
+
+    def not_modified(self, url: str, target: str) -> str:
+        """
+        Traite une réponse 304 : le contenu connu est relié dans le dossier cible s'il n'y est pas encore.
+        Un fichier déjà en place (lien ou copie) avec le contenu enregistré pour ce dossier n'est pas recopié.
+        """
+        entry = self.get(url, os.path.dirname(target))
+        if (entry and entry["sha256"] and entry["path"] == target and os.path.exists(target)
+                and os.path.getsize(target) == entry["size"]):
+            return STATUS_NOT_MODIFIED
+        known = entry if entry and entry["sha256"] else self.latest(url)
+        self._link_object(self.object_path(known["sha256"]), target)
+        self._upsert(url, target, known["etag"], known["last_modified"], known["size"], known["sha256"])
+        return STATUS_DEDUPLICATED
+
+    def begin(self, url: str, target: str, status_code: int, response_headers: Mapping[str, str],
+              resume_from: int) -> PartialDownload:
+        """
+        Démarre l'écriture d'une réponse 200 ou 206. Une réponse 200 à une requête Range
+        (ressource modifiée) repart de zéro.
+        """
+        expected_size = None
+        if status_code == 206 and resume_from:
+            match = _CONTENT_RANGE_RE.match(response_headers.get("Content-Range", ""))
+            if match is None or int(match.group(1)) != resume_from:
+                raise IOError(f"Content-Range inattendu pour {url} : {response_headers.get('Content-Range')}")
+            if match.group(3) != "*":
+                expected_size = int(match.group(3))
+        else:
+            resume_from = 0
+            if response_headers.get("Content-Length") and not response_headers.get("Content-Encoding"):
+                expected_size = int(response_headers["Content-Length"])
+        previous = self.get(url, os.path.dirname(target))
+        etag = response_headers.get("ETag")
+        last_modified = response_headers.get("Last-Modified")
+        # Les validateurs sont enregistrés dès le début pour permettre la reprise du .part
+        self._upsert(url, target, etag, last_modified, None, None)
+        return PartialDownload(url, target, resume_from, expected_size, etag, last_modified,
+                               previous["sha256"] if previous and previous["path"] == target else None)
+
+    def adopt_part(self, url: str, target: str, response_headers: Mapping[str, str], size: int) -> PartialDownload:
+        """
+        Prend en charge un fichier .part déjà complet (téléchargement par plages) : son sha256
+        est calculé en une lecture avant finalize.
+        """
+        previous = self.get(url, os.path.dirname(target))
+        etag = response_headers.get("ETag")
+        last_modified = response_headers.get("Last-Modified")
+        self._upsert(url, target, etag, last_modified, None, None)
+        return PartialDownload(url, target, size, size, etag, last_modified,
+                               previous["sha256"] if previous and previous["path"] == target else None)
+
+    def finalize(self, partial: PartialDownload) -> str:
+        """
+        Termine un téléchargement : vérifie la taille, range le contenu dans .objects/<sha256>
+        (ou réutilise l'objet existant) et crée le lien dans le dossier de la commune.
+        """
+        partial.close()
+        if partial.expected_size is not None and partial.size != partial.expected_size:
+            if partial.size > partial.expected_size:
+                os.remove(partial.part_path)
+            raise IOError(f"Téléchargement incomplet pour {partial.url} : {partial.size}/{partial.expected_size} octets")
+        sha256 = partial.hasher.hexdigest()
+        object_path = self.object_path(sha256)
+        if os.path.exists(object_path):
+            os.remove(partial.part_path)
+            status = STATUS_DEDUPLICATED
+        else:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.replace(partial.part_path, object_path)
+            status = STATUS_DOWNLOADED
+        self._link_object(object_path, partial.target)
+        self._upsert(partial.url, partial.target, partial.etag, partial.last_modified, partial.size, sha256)
+        if partial.previous_sha256 == sha256:
+            return STATUS_NOT_MODIFIED
+        return status
+
+    def fetch(self, url: str, output_folder: str, session, timeout: float = 10,
+              chunk_size: int = 8192, large_file_threshold: Optional[int] = LARGE_FILE_THRESHOLD,
+              range_workers: int = DEFAULT_RANGE_WORKERS, trace=None) -> Tuple[str, str]:
+        """
+        Télécharge l'URL avec une session requests en utilisant l'index.
+        Les fichiers plus gros que large_file_threshold sont récupérés par plages parallèles
+        si le serveur accepte les requêtes Range ; les autres gardent le flux unique.
+        trace (genia.metrics.RequestTrace) reçoit les phases ttfb / transfer / disk.
+        Retourne (chemin local, statut).
+        """
+        trace = trace or NullTrace()
+        target = self.target_path(url, output_folder)
+        headers, resume_from = self.request_headers(url, target)
+        with session.get(url, stream=True, timeout=timeout, headers=headers) as response:
+            trace.mark("ttfb")
+            trace.status = response.status_code
+            if response.status_code == 304:
+                return target, self.not_modified(url, target)
+            if response.status_code == 416 and resume_from:
+                # Fichier .part incohérent avec la ressource distante : reprise depuis zéro au prochain passage
+                os.remove(target + PART_SUFFIX)
+            response.raise_for_status()
+            total = ranged_download_size(response.status_code, response.headers, large_file_threshold)
+            if total is None:
+                partial = self.begin(url, target, response.status_code, response.headers, resume_from)
+                try:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        trace.mark("transfer")
+                        partial.write(chunk)
+                        trace.bytes += len(chunk)
+                        trace.mark("disk")
+                finally:
+                    partial.close()
+                status = self.finalize(partial)
+                trace.mark("disk")
+                return target, status
+            # Gros fichier : la réponse est abandonnée au profit de requêtes Range parallèles
+            response_headers = response.headers
+        part_path = target + PART_SUFFIX
+        validator = response_headers.get("ETag") or response_headers.get("Last-Modified")
+        try:
+            trace.bytes += download_ranges(session, url, part_path, total, validator, range_workers, timeout)
+        except Exception:
+            remove_part(part_path)
+            raise
+        trace.mark("transfer")
+        status = self.finalize(self.adopt_part(url, target, response_headers, total))
+        trace.mark("disk")
+        return target, status
@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+from genia.response_cache import EMBEDDING_MODEL_ID
+
+# ----------------------------------------------------------------
+# Calcul des embeddings par lots, en parallèle, avec reprise et cache
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+# Les textes déjà vus (même modèle, même texte) sont lus dans le cache ; les autres sont regroupés en
+# requêtes (plusieurs textes par requête quand le modèle l'accepte, un seul pour Titan) exécutées dans
+# un pool de threads borné, avec reprise et délai exponentiel en cas de limitation de débit.
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_PATH = os.environ.get("GENIA_EMBEDDING_CACHE",
+                                      os.path.join(tempfile.gettempdir(), "genia_embeddings.sqlite3"))
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_BASE_DELAY = 0.5
+MAX_DELAY = 20.0
+DEFAULT_WINDOW = 256
+# Nombre maximal de textes par requête selon le préfixe de l'identifiant du modèle
+BATCH_LIMITS = {"cohere.embed": 96}
+RETRYABLE_ERRORS = {"ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException",
+                    "ModelNotReadyException", "InternalServerException"}
+
+T = TypeVar("T")
+
+
+def text_hash(model_id: str, text: str) -> str:
+    return hashlib.sha256(f"{model_id}\n{text}".encode("utf-8")).hexdigest()
+
+
+def batch_limit(model_id: str) -> int:
+    name = model_id.rsplit("/", 1)[-1]
+    return next((limit for prefix, limit in BATCH_LIMITS.items() if name.startswith(prefix)), 1)
+
+
+def request_body(model_id: str, texts: Sequence[str]) -> str:
+    if batch_limit(model_id) > 1:
+        return json.dumps({"texts": list(texts), "input_type": "search_document"})
+    return json.dumps({"inputText": texts[0]})
+
+
+def parse_embeddings(model_id: str, payload: Dict) -> List[List[float]]:
+    if "embeddings" in payload:
+        return payload["embeddings"]
+    return [payload["embedding"]]
+
+
+@lru_cache(maxsize=None)
+def bedrock_runtime_client(region_name: str = "us-west-2", max_pool_connections: int = DEFAULT_MAX_WORKERS):
+    """
+    Client bedrock-runtime partagé (un seul pool de connexions par processus). Les reprises sont
+    gérées par EmbeddingExecutor, celles de botocore sont désactivées pour ne pas les cumuler.
+    """
+    import boto3
+    from botocore.config import Config
+    return boto3.client("bedrock-runtime", region_name=region_name,
+                        config=Config(max_pool_connections=max_pool_connections, retries={"max_attempts": 0}))
+
+
+def _error_code(error: Exception) -> Optional[str]:
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code")
+    return None
+
+
+class EmbeddingCache:
+    """
+    Embeddings indexés par empreinte (modèle + texte), dans une base SQLite locale (":memory:" possible).
+    """
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        directory = os.path.dirname(path)
+        if directory and path != ":memory:":
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vector BLOB)")
+        self._lock = threading.Lock()
+
+    def get_many(self, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                part = hashes[start:start + 500]
+                rows = self._db.execute(f"SELECT hash, vector FROM embeddings WHERE hash IN "
+                                        f"({','.join('?' * len(part))})", part)
+                found.update((h, np.frombuffer(vector, dtype=np.float32)) for h, vector in rows)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?)",
+                                 [(h, np.asarray(v, dtype=np.float32).tobytes()) for h, v in items.items()])
+
+
+class EmbeddingExecutor:
+    def __init__(self, client, model_id: str = EMBEDDING_MODEL_ID, max_workers: int = DEFAULT_MAX_WORKERS,
+                 cache: Optional[EmbeddingCache] = None, max_retries: int = DEFAULT_MAX_RETRIES,
+                 base_delay: float = DEFAULT_BASE_DELAY):
+        self.client = client
+        self.model_id = model_id
+        self.batch_size = batch_limit(model_id)
+        self.cache = cache
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.stats = {"texts": 0, "cached": 0, "requests": 0, "retries": 0}
+        self._stats_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embeddings")
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[name] += value
+
+    def _request(self, texts: Sequence[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._count("requests")
+                response = self.client.invoke_model(body=request_body(self.model_id, texts), modelId=self.model_id,
+                                                    accept="application/json", contentType="application/json")
+                return parse_embeddings(self.model_id, json.loads(response["body"].read()))
+            except Exception as e:
+                if _error_code(e) not in RETRYABLE_ERRORS or attempt == self.max_retries:
+                    raise
+                # Délai exponentiel avec gigue, pour que les threads limités ne reviennent pas ensemble
+                delay = min(MAX_DELAY, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+                logger.warning(f"Embeddings limités ({_error_code(e)}), nouvel essai dans {delay:.1f} s")
+                self._count("retries")
+                time.sleep(delay)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embeddings (len(texts), dimension) en float32, dans l'ordre des textes.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        hashes = [text_hash(self.model_id, text) for text in texts]
+        vectors = self.cache.get_many(list(set(hashes))) if self.cache is not None else {}
+        self._count("texts", len(texts))
+        self._count("cached", sum(1 for h in hashes if h in vectors))
+        # Textes manquants, sans doublons
+        missing = {}
+        for h, text in zip(hashes, texts):
+            if h not in vectors:
+                missing.setdefault(h, text)
+        pending = list(missing.items())
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        futures = [self._executor.submit(self._request, [text for _, text in batch]) for batch in batches]
+        computed = {}
+        for batch, future in zip(batches, futures):
+            for (h, _), embedding in zip(batch, future.result()):
+                computed[h] = np.asarray(embedding, dtype=np.float32)
+        if computed and self.cache is not None:
+            self.cache.put_many(computed)
+        vectors.update(computed)
+        return np.vstack([vectors[h] for h in hashes])
+
+    def embed_stream(self, items: Iterable[Tuple[T, str]],
+                     window: int = DEFAULT_WINDOW) -> Iterator[Tuple[List[T], np.ndarray]]:
+        """
+        Consomme (élément, texte) par fenêtres de `window` et produit (éléments, embeddings) pour chacune :
+        les documents longs sont traités au fil de l'extraction sans tout garder en mémoire.
+        """
+        keys, texts = [], []
+        for key, text in items:
+            keys.append(key)
+            texts.append(text)
+            if len(texts) >= window:
+                yield keys, self.embed(texts)
+                keys, texts = [], []
+        if texts:
+            yield keys, self.embed(texts)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
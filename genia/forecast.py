@@ -0,0 +1,337 @@
+"""
+Prévision LSTM par lots : un modèle global entraîné sur toutes les séries (une par commune),
+puis une table de prévisions lue par le dashboard.
+
+    python -m genia.forecast donnees.csv --variable budget_collectivite
+
+La table est enregistrée à côté du cache Arrow du fichier (voir genia/dataset_cache.py) :
+le dashboard la retrouve à partir du même fichier chargé.
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+from numpy.lib.stride_tricks import sliding_window_view
+
+from genia.model_registry import model_key
+
+# ----------------------------------------------------------------
+# Modèle LSTM avec PyTorch pour la prévision
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+logger = logging.getLogger(__name__)
+
+FORECAST_HORIZON = 10
+DEFAULT_WINDOW_SIZE = 3
+DEFAULT_EPOCHS = 200
+DEFAULT_BATCH_SIZE = 1024
+# Nom de la série quand le fichier n'a pas de colonne commune : tout le fichier forme une seule série
+ALL_SERIES_LABEL = "Ensemble"
+FORECAST_COLUMNS = ["commune", "date", "variable", "forecast"]
+# "direct" : une tête de sortie prévoit tout l'horizon en une passe ; "autoregressive" : un pas à la fois
+FORECAST_STRATEGIES = ("direct", "autoregressive")
+# Stratégie historique, qui accepte les séries plus courtes que l'horizon ; "direct" reste une option
+DEFAULT_STRATEGY = "autoregressive"
+
+
+class LSTMModel(nn.Module):
+    def __init__(self, input_size=1, hidden_size=50, num_layers=1, num_series=0, embedding_dim=8, output_size=1):
+        """
+        Modèle LSTM simple. Avec num_series > 0, un embedding par série est concaténé à chaque pas
+        de temps : un seul modèle global apprend toutes les communes à la fois.
+        Avec output_size > 1, la tête de sortie prévoit directement output_size pas de temps.
+        Créé par CAFAM pour le Hackathon HGEN IA 2025.
+        """
+        super(LSTMModel, self).__init__()
+        self.hidden_size = hidden_size
+        self.num_layers = num_layers
+        self.output_size = output_size
+        self.embedding = nn.Embedding(num_series, embedding_dim) if num_series > 0 else None
+        lstm_input_size = input_size + (embedding_dim if self.embedding is not None else 0)
+        self.lstm = nn.LSTM(lstm_input_size, hidden_size, num_layers, batch_first=True)
+        self.fc = nn.Linear(hidden_size, output_size)
+
+    def forward(self, x, series_ids=None):
+        if self.embedding is not None:
+            embedded = self.embedding(series_ids).unsqueeze(1).expand(-1, x.size(1), -1)
+            x = torch.cat([x, embedded], dim=-1)
+        # États initiaux nuls créés par nn.LSTM lui-même (pas d'allocation supplémentaire, export ONNX/TorchScript simple)
+        out, _ = self.lstm(x)
+        out = self.fc(out[:, -1, :])
+        return out
+
+
+def build_panel(df: pd.DataFrame, variable: str, series_col: Optional[str] = "commune",
+                date_col: str = "date") -> pd.DataFrame:
+    """
+    Tableau annuel (une ligne par année, une colonne par série) des moyennes de `variable`.
+    Les années manquantes d'une série restent à NaN.
+    """
+    years = pd.to_datetime(df[date_col]).dt.year.rename("year")
+    if series_col and series_col in df.columns:
+        series = df[series_col].astype(str).rename("series")
+    else:
+        series = pd.Series(ALL_SERIES_LABEL, index=df.index, name="series")
+    values = pd.to_numeric(df[variable], errors="coerce")
+    panel = values.groupby([years, series]).mean().unstack("series")
+    return panel.reindex(range(panel.index.min(), panel.index.max() + 1))
+
+
+def scale_panel(panel: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Normalisation min-max indépendante pour chaque série (colonne) ; retourne (valeurs, min, étendue).
+    """
+    with np.errstate(all="ignore"):
+        mins = np.nanmin(panel, axis=0)
+        spans = np.nanmax(panel, axis=0) - mins
+    spans = np.where(np.isfinite(spans) & (spans > 0), spans, 1.0)
+    mins = np.where(np.isfinite(mins), mins, 0.0)
+    return (panel - mins) / spans, mins, spans
+
+
+def make_windows(scaled: np.ndarray, window_size: int,
+                 horizon: int = 1) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """
+    Fenêtres d'entraînement de toutes les séries : retourne X (N, window_size, 1), y (N, horizon)
+    et l'indice de série de chaque fenêtre. Les fenêtres contenant une valeur manquante sont écartées.
+    Les fenêtres sont une vue (sliding_window_view, sans copie) ; seules les fenêtres valides sont copiées.
+    """
+    values = np.ascontiguousarray(scaled.T, dtype=np.float32)      # (séries, années)
+    length = window_size + horizon
+    if values.shape[1] < length:
+        empty = torch.empty(0, dtype=torch.float32)
+        return empty.reshape(0, window_size, 1), empty.reshape(0, horizon), torch.empty(0, dtype=torch.long)
+    windows = sliding_window_view(values, length, axis=1)          # (séries, fenêtres, length)
+    # Nombre de valeurs manquantes par fenêtre via une somme cumulée (sans parcourir les fenêtres)
+    missing = np.concatenate([np.zeros((values.shape[0], 1), dtype=np.int64),
+                              np.cumsum(np.isnan(values), axis=1)], axis=1)
+    series_idx, window_idx = np.nonzero(missing[:, length:] - missing[:, :-length] == 0)
+    selected = windows[series_idx, window_idx]                      # (N, length), une seule copie
+    return (torch.from_numpy(selected[:, :window_size]).unsqueeze(-1), torch.from_numpy(selected[:, window_size:]),
+            torch.from_numpy(series_idx))
+
+
+def last_windows(scaled: np.ndarray, window_size: int) -> Tuple[torch.Tensor, np.ndarray]:
+    """
+    Dernière fenêtre connue de chaque série (valeurs manquantes propagées depuis la dernière valeur connue)
+    et masque des séries ayant assez d'historique pour être prévues.
+    """
+    filled = pd.DataFrame(scaled).ffill().to_numpy()[-window_size:]
+    usable = ~np.isnan(filled).any(axis=0)
+    return torch.tensor(filled.T[usable], dtype=torch.float32).unsqueeze(-1), usable
+
+
+def train_global_model(X: torch.Tensor, y: torch.Tensor, series_ids: torch.Tensor, num_series: int,
+                       hidden_size: int = 50, num_layers: int = 1, epochs: int = DEFAULT_EPOCHS,
+                       batch_size: int = DEFAULT_BATCH_SIZE, lr: float = 0.01, seed: int = 0,
+                       on_epoch: Optional[Callable[[int, float], None]] = None) -> LSTMModel:
+    """
+    Entraîne un LSTM global (embedding par série) sur les fenêtres de toutes les séries, par mini-lots.
+    La taille de la tête de sortie suit le nombre de cibles de y (1 : autorégressif, horizon : direct).
+    """
+    torch.manual_seed(seed)
+    model = LSTMModel(input_size=1, hidden_size=hidden_size, num_layers=num_layers, num_series=num_series,
+                      output_size=y.shape[1])
+    criterion = nn.MSELoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    model.train()
+    for epoch in range(epochs):
+        permutation = torch.randperm(len(X))
+        epoch_loss = 0.0
+        for start in range(0, len(X), batch_size):
+            batch = permutation[start:start + batch_size]
+            optimizer.zero_grad()
+            loss = criterion(model(X[batch], series_ids[batch]), y[batch])
+            loss.backward()
+            optimizer.step()
+            epoch_loss += loss.item() * len(batch)
+        if on_epoch is not None:
+            on_epoch(epoch + 1, epoch_loss / len(X))
+    return model
+
+
+def rollout(model: LSTMModel, windows: torch.Tensor, series_ids: torch.Tensor,
+            horizon: int = FORECAST_HORIZON) -> np.ndarray:
+    """
+    Prévision autorégressive de toutes les séries à la fois : un seul appel au modèle par pas de temps.
+    Retourne un tableau (séries, horizon) de valeurs normalisées.
+    """
+    model.eval()
+    window_size = windows.size(1)
+    # Tampon unique : la fenêtre du pas suivant est une vue décalée, sans concaténation à chaque pas
+    buffer = torch.empty(windows.size(0), window_size + horizon, 1)
+    buffer[:, :window_size] = windows
+    with torch.no_grad():
+        for step in range(horizon):
+            buffer[:, window_size + step] = model(buffer[:, step:step + window_size], series_ids)[:, :1]
+    return buffer[:, window_size:, 0].numpy()
+
+
+def direct_forecast(model: LSTMModel, windows: torch.Tensor, series_ids: torch.Tensor,
+                    horizon: int = FORECAST_HORIZON) -> np.ndarray:
+    """
+    Prévision de tout l'horizon en une seule passe (tête de sortie multi-horizon).
+    """
+    if model.output_size < horizon:
+        raise ValueError(f"Le modèle prévoit {model.output_size} pas de temps, {horizon} demandés.")
+    model.eval()
+    with torch.no_grad():
+        return model(windows, series_ids)[:, :horizon].numpy()
+
+
+def model_entry(model: LSTMModel, window_size: int, mins: np.ndarray, spans: np.ndarray, series: List[str]) -> Dict:
+    """
+    Entrée de registre (voir genia/model_registry.py) : poids, configuration et normalisation du modèle.
+    """
+    return {
+        "state_dict": model.state_dict(),
+        "config": {"hidden_size": model.hidden_size, "num_layers": model.num_layers,
+                   "num_series": model.embedding.num_embeddings, "embedding_dim": model.embedding.embedding_dim,
+                   "output_size": model.output_size},
+        "window_size": window_size,
+        "mins": torch.tensor(mins),
+        "spans": torch.tensor(spans),
+        "series": list(series),
+    }
+
+
+def model_from_entry(entry: Dict) -> LSTMModel:
+    model = LSTMModel(input_size=1, **entry["config"])
+    model.load_state_dict(entry["state_dict"])
+    model.eval()
+    return model
+
+
+def forecast_all_series(df: pd.DataFrame, variable: str, series_col: Optional[str] = "commune",
+                        date_col: str = "date", window_size: int = DEFAULT_WINDOW_SIZE,
+                        horizon: int = FORECAST_HORIZON, epochs: int = DEFAULT_EPOCHS,
+                        batch_size: int = DEFAULT_BATCH_SIZE, hidden_size: int = 50, num_layers: int = 1,
+                        lr: float = 0.01, on_epoch: Optional[Callable[[int, float], None]] = None,
+                        registry=None, dataset_hash: Optional[str] = None, retrain: bool = False,
+                        strategy: str = DEFAULT_STRATEGY) -> pd.DataFrame:
+    """
+    Prévoit `variable` sur `horizon` années pour chaque série (commune) du fichier, soit en une passe
+    (strategy="direct"), soit pas à pas (strategy="autoregressive").
+    Retourne la table de prévisions au format long : commune, date, variable, forecast.
+    Avec un registre (ModelRegistry) et l'empreinte du fichier, un modèle déjà entraîné avec les mêmes
+    paramètres est rechargé et seule l'inférence est exécutée (sauf retrain=True : le modèle est réentraîné
+    puis remplacé dans le registre). Une série trop courte pour la tête directe (pas plus d'années que
+    l'horizon) est prévue pas à pas.
+    """
+    panel = build_panel(df, variable, series_col, date_col)
+    if len(panel) < 2:
+        raise ValueError("Pas assez de données historiques pour la prévision.")
+    if strategy not in FORECAST_STRATEGIES:
+        raise ValueError(f"Stratégie de prévision inconnue : {strategy} (attendu : {', '.join(FORECAST_STRATEGIES)})")
+    if strategy == "direct" and len(panel) <= horizon:
+        logger.warning(f"{len(panel)} années d'historique pour un horizon de {horizon} ans : "
+                       f"prévision autorégressive au lieu de la tête directe")
+        strategy = "autoregressive"
+    targets = horizon if strategy == "direct" else 1
+    # Fenêtre réduite si l'historique est trop court
+    if len(panel) < window_size + targets:
+        window_size = len(panel) - targets if strategy == "direct" else 1
+    series = panel.columns.astype(str).tolist()
+    key = None
+    entry = None
+    if registry is not None and dataset_hash:
+        key = model_key(dataset_hash, variable, window_size, {
+            "series_col": series_col, "date_col": date_col, "epochs": epochs, "batch_size": batch_size,
+            "hidden_size": hidden_size, "num_layers": num_layers, "lr": lr, "strategy": strategy,
+            "targets": targets,
+        })
+        entry = None if retrain else registry.get(key)
+        if entry is not None and entry["series"] != series:
+            entry = None
+    started = time.monotonic()
+    if entry is not None:
+        model = model_from_entry(entry)
+        mins, spans = entry["mins"].numpy(), entry["spans"].numpy()
+        scaled = (panel.to_numpy(dtype=float) - mins) / spans
+        logger.info(f"Modèle rechargé depuis le registre ({key})")
+    else:
+        scaled, mins, spans = scale_panel(panel.to_numpy(dtype=float))
+        X, y, series_ids = make_windows(scaled, window_size, targets)
+        if len(X) == 0:
+            raise ValueError("Pas assez de données historiques pour la prévision.")
+        model = train_global_model(X, y, series_ids, num_series=panel.shape[1], hidden_size=hidden_size,
+                                   num_layers=num_layers, epochs=epochs, batch_size=batch_size, lr=lr,
+                                   on_epoch=on_epoch)
+        if key is not None:
+            registry.put(key, model_entry(model, window_size, mins, spans, series))
+    windows, usable = last_windows(scaled, window_size)
+    usable_ids = torch.tensor(np.flatnonzero(usable))
+    predict = direct_forecast if strategy == "direct" else rollout
+    predictions = predict(model, windows, usable_ids, horizon) * spans[usable, None] + mins[usable, None]
+    logger.info(f"Prévisions calculées pour {int(usable.sum())} séries en {time.monotonic() - started:.2f} s")
+    last_year = int(panel.index.max())
+    dates = pd.to_datetime([f"{year}-12-31" for year in range(last_year + 1, last_year + horizon + 1)])
+    communes = panel.columns[usable].astype(str)
+    return pd.DataFrame({
+        "commune": np.repeat(communes.to_numpy(), horizon),
+        "date": np.tile(dates.to_numpy(), len(communes)),
+        "variable": variable,
+        "forecast": predictions.reshape(-1),
+    }, columns=FORECAST_COLUMNS)
+
+
+def forecast_table_path(dataset_path: str, variable: str, strategy: str = DEFAULT_STRATEGY) -> str:
+    """
+    Chemin de la table de prévisions associée à un cache Arrow de genia.dataset_cache, une par stratégie.
+    Un réentraînement remplace la table publiée.
+    """
+    safe_variable = "".join(c if c.isalnum() or c in "-_" else "_" for c in variable)
+    return f"{os.path.splitext(dataset_path)[0]}.forecast-{safe_variable}-{strategy}.arrow"
+
+
+def write_forecast_table(table: pd.DataFrame, path: str) -> None:
+    tmp_path = path + ".tmp"
+    table.reset_index(drop=True).to_feather(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_forecast_table(path: str) -> Optional[pd.DataFrame]:
+    if not os.path.exists(path):
+        return None
+    return pd.read_feather(path)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m genia.forecast",
+                                     description="Prévisions LSTM par commune, écrites dans une table lue par le dashboard.")
+    parser.add_argument("data_file", help="Fichier CSV ou JSON (colonnes date, commune et la variable à prévoir)")
+    parser.add_argument("--variable", required=True, nargs="+", help="Variable(s) à prévoir")
+    parser.add_argument("--window-size", type=int, default=DEFAULT_WINDOW_SIZE, help="Taille de la fenêtre (années)")
+    parser.add_argument("--horizon", type=int, default=FORECAST_HORIZON, help="Nombre d'années prévues")
+    parser.add_argument("--epochs", type=int, default=DEFAULT_EPOCHS, help="Nombre d'époques d'entraînement")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Taille des mini-lots")
+    parser.add_argument("--strategy", choices=FORECAST_STRATEGIES, default=DEFAULT_STRATEGY,
+                        help="Tête multi-horizon (une passe) ou prévision autorégressive (un pas à la fois)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    from genia.dataset_cache import cache_upload, dataset_hash, load_columns
+    from genia.model_registry import ModelRegistry
+    with open(args.data_file, "rb") as f:
+        dataset = cache_upload(f, args.data_file)
+    registry = ModelRegistry()
+    for variable in args.variable:
+        df = load_columns(dataset, ["commune", "date", variable])
+        table = forecast_all_series(df, variable, window_size=args.window_size, horizon=args.horizon,
+                                    epochs=args.epochs, batch_size=args.batch_size, strategy=args.strategy,
+                                    registry=registry, dataset_hash=dataset_hash(dataset))
+        path = forecast_table_path(dataset, variable, args.strategy)
+        write_forecast_table(table, path)
+        print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""
+Banc d'essai des prévisions : précision et temps de calcul selon la configuration et le moteur d'inférence.
+
+    python -m genia.forecast_benchmark --output benchmark.json
+    python -m genia.forecast_benchmark --data donnees.csv --variable budget_collectivite --window-sizes 3 5
+
+Pour chaque configuration (taille de fenêtre, stratégie, taille cachée), le modèle global est entraîné
+sur l'historique privé de ses `holdout` dernières années, puis chaque moteur prévoit ces années :
+  eager_sequential    PyTorch, une série à la fois (comportement de la première version du dashboard)
+  eager_batched       PyTorch, toutes les séries en un lot
+  torchscript_batched modèle tracé (TorchScript), toutes les séries en un lot
+  onnx_batched        ONNX Runtime (si installé), toutes les séries en un lot
+  exp_smoothing       référence NumPy sans apprentissage (lissage exponentiel de Holt)
+Le rapport JSON contient, par configuration et moteur : durée d'entraînement, latence d'inférence,
+pic de mémoire (RSS) pendant les appels du moteur (remis à zéro avant chaque moteur sous Linux) et hausse
+par rapport à la mémoire de départ, MAE et MAPE sur les années réservées.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+
+from genia.forecast import (DEFAULT_BATCH_SIZE, DEFAULT_EPOCHS, build_panel, last_windows, make_windows,
+                            scale_panel, train_global_model)
+
+# ----------------------------------------------------------------
+# Banc d'essai des prévisions LSTM
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+DEFAULT_HOLDOUT = 5
+DEFAULT_REPEATS = 5
+
+
+def synthetic_series(n_series: int = 500, n_years: int = 25, start_year: int = 2000, seed: int = 0) -> pd.DataFrame:
+    """
+    Séries annuelles synthétiques (niveau, tendance, cycle et bruit propres à chaque commune).
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_years)
+    level = rng.uniform(1e5, 1e7, n_series)[:, None]
+    trend = rng.normal(0.02, 0.01, n_series)[:, None]
+    cycle = rng.uniform(0.0, 0.05, n_series)[:, None] * np.sin(2 * np.pi * t / rng.integers(4, 9, n_series)[:, None])
+    noise = rng.normal(0.0, 0.01, (n_series, n_years))
+    values = level * (1 + trend * t + cycle + noise)
+    return pd.DataFrame({
+        "commune": np.repeat([f"commune_{i}" for i in range(n_series)], n_years),
+        "date": np.tile(pd.to_datetime([f"{start_year + year}-12-31" for year in t]).to_numpy(), n_series),
+        "value": values.reshape(-1),
+    })
+
+
+def _proc_status_mb(field: str) -> Optional[float]:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> bool:
+    """
+    Remet à zéro le pic de mémoire du processus (Linux : /proc/self/clear_refs), pour mesurer
+    chaque moteur séparément. Retourne False si le système ne le permet pas.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def current_rss_mb() -> Optional[float]:
+    return _proc_status_mb("VmRSS")
+
+
+def peak_rss_mb() -> Optional[float]:
+    peak = _proc_status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Octets sous macOS, kilo-octets sous Linux
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def measure_backend(fn: Callable[[], np.ndarray], repeats: int) -> Tuple[float, np.ndarray, Dict]:
+    """
+    time_call, avec la mémoire propre au moteur : pic pendant ses appels (pic du processus remis à zéro
+    avant, quand le système le permet) et hausse par rapport à la mémoire résidente de départ.
+    """
+    scoped = reset_peak_rss()
+    before = current_rss_mb() if scoped else peak_rss_mb()
+    latency, result = time_call(fn, repeats)
+    peak = peak_rss_mb()
+    memory = {"peak_rss_mb": peak, "peak_rss_scope": "backend" if scoped else "process",
+              "rss_delta_mb": round(peak - before, 1) if peak is not None and before is not None else None}
+    return latency, result, memory
+
+
+def holt_forecast(history: np.ndarray, horizon: int, alpha: float = 0.5, beta: float = 0.3) -> np.ndarray:
+    """
+    Lissage exponentiel de Holt (niveau + tendance), vectorisé sur les séries : history (années, séries).
+    """
+    filled = pd.DataFrame(history).ffill().bfill().to_numpy()
+    level = filled[0]
+    trend = filled[1] - filled[0] if len(filled) > 1 else np.zeros_like(level)
+    for value in filled[1:]:
+        previous = level
+        level = alpha * value + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous) + (1 - beta) * trend
+    return (level[:, None] + trend[:, None] * np.arange(1, horizon + 1)).T
+
+
+def errors(predicted: np.ndarray, actual: np.ndarray) -> Dict[str, float]:
+    """
+    MAE et MAPE (%) sur les valeurs connues ; predicted et actual : (années, séries).
+    """
+    mask = np.isfinite(actual) & np.isfinite(predicted)
+    diff = np.abs(predicted[mask] - actual[mask])
+    nonzero = np.abs(actual[mask]) > 0
+    return {
+        "mae": float(diff.mean()) if diff.size else None,
+        "mape": float((diff[nonzero] / np.abs(actual[mask][nonzero])).mean() * 100) if nonzero.any() else None,
+    }
+
+
+def time_call(fn: Callable[[], np.ndarray], repeats: int) -> Tuple[float, np.ndarray]:
+    """
+    Latence médiane (ms) de fn sur `repeats` appels, après un appel de chauffe.
+    """
+    result = fn()
+    durations = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - started) * 1000)
+    return float(np.median(durations)), result
+
+
+def _predictor(module, output_size: int, window_size: int, horizon: int):
+    """
+    Prévision (séries, horizon) avec n'importe quel module appelable (eager ou TorchScript).
+    """
+    def predict(windows: torch.Tensor, series_ids: torch.Tensor) -> np.ndarray:
+        with torch.no_grad():
+            if output_size > 1:
+                return module(windows, series_ids)[:, :horizon].numpy()
+            buffer = torch.empty(windows.size(0), window_size + horizon, 1)
+            buffer[:, :window_size] = windows
+            for step in range(horizon):
+                buffer[:, window_size + step] = module(buffer[:, step:step + window_size], series_ids)[:, :1]
+            return buffer[:, window_size:, 0].numpy()
+    return predict
+
+
+def _onnx_predictor(model, window_size: int, horizon: int, entry: Dict):
+    """
+    Prévision par ONNX Runtime, ou None si l'export ou onnxruntime ne sont pas disponibles.
+    """
+    try:
+        import onnxruntime  # noqa: F401 (importé par OnnxForecaster, vérifié ici)
+        from genia.forecast_export import export_onnx
+        from genia.onnx_forecast import OnnxForecaster
+        path = os.path.join(tempfile.mkdtemp(), "benchmark.onnx")
+        export_onnx(model, path, window_size)
+        forecaster = OnnxForecaster(path, metadata=entry)
+    except ImportError as e:
+        sys.stderr.write(f"Moteur onnx_batched ignoré : {e}\n")
+        return None
+    return lambda windows, series_ids: forecaster.predict_scaled(windows[:, :, 0].numpy(), series_ids.numpy(), horizon)
+
+
+def run_config(panel: pd.DataFrame, window_size: int, strategy: str, hidden_size: int, epochs: int,
+               batch_size: int, holdout: int, repeats: int, backends: List[str]) -> List[Dict]:
+    train, actual = panel.iloc[:-holdout], panel.iloc[-holdout:].to_numpy(dtype=float)
+    scaled, mins, spans = scale_panel(train.to_numpy(dtype=float))
+    targets = holdout if strategy == "direct" else 1
+    X, y, series_ids = make_windows(scaled, window_size, targets)
+    if len(X) == 0:
+        raise ValueError(f"Historique insuffisant pour window_size={window_size} ({strategy})")
+    started = time.perf_counter()
+    model = train_global_model(X, y, series_ids, num_series=panel.shape[1], hidden_size=hidden_size,
+                               epochs=epochs, batch_size=batch_size)
+    train_seconds = time.perf_counter() - started
+    model.eval()
+    windows, usable = last_windows(scaled, window_size)
+    ids = torch.tensor(np.flatnonzero(usable))
+    config = {"window_size": window_size, "strategy": strategy, "hidden_size": hidden_size, "epochs": epochs,
+              "series": int(usable.sum()), "training_windows": len(X), "train_seconds": round(train_seconds, 3)}
+
+    predictors = {}
+    if "eager_batched" in backends or "eager_sequential" in backends:
+        eager = _predictor(model, model.output_size, window_size, holdout)
+        predictors["eager_batched"] = lambda: eager(windows, ids)
+        # Une série par appel : mesure le gain apporté par le traitement par lots
+        predictors["eager_sequential"] = lambda: np.concatenate(
+            [eager(windows[i:i + 1], ids[i:i + 1]) for i in range(len(ids))])
+    if "torchscript_batched" in backends:
+        with torch.no_grad():
+            traced = torch.jit.trace(model, (windows[:2], ids[:2]))
+        scripted = _predictor(traced, model.output_size, window_size, holdout)
+        predictors["torchscript_batched"] = lambda: scripted(windows, ids)
+    if "onnx_batched" in backends:
+        entry = {"window_size": window_size, "output_size": model.output_size, "series": list(map(str, train.columns)),
+                 "mins": mins.tolist(), "spans": spans.tolist()}
+        onnx = _onnx_predictor(model, window_size, holdout, entry)
+        if onnx is not None:
+            predictors["onnx_batched"] = lambda: onnx(windows, ids)
+
+    results = []
+    for backend in backends:
+        if backend == "exp_smoothing":
+            latency, predicted, memory = measure_backend(
+                lambda: holt_forecast(train.to_numpy(dtype=float), holdout), repeats)
+            results.append(dict(config, backend=backend, train_seconds=0.0, inference_ms=round(latency, 3),
+                                **memory, **errors(predicted, actual)))
+            continue
+        if backend not in predictors:
+            continue
+        latency, scaled_predictions, memory = measure_backend(predictors[backend], repeats)
+        predicted = np.full_like(actual, np.nan)
+        predicted[:, usable] = (scaled_predictions * spans[usable, None] + mins[usable, None]).T
+        results.append(dict(config, backend=backend, inference_ms=round(latency, 3), **memory,
+                            **errors(predicted, actual)))
+    return results
+
+
+def run_benchmark(df: pd.DataFrame, variable: str, window_sizes: List[int], strategies: List[str],
+                  hidden_sizes: List[int], epochs: int = DEFAULT_EPOCHS, batch_size: int = DEFAULT_BATCH_SIZE,
+                  holdout: int = DEFAULT_HOLDOUT, repeats: int = DEFAULT_REPEATS,
+                  backends: Optional[List[str]] = None, source: str = "synthetic") -> Dict:
+    backends = backends or ["eager_sequential", "eager_batched", "torchscript_batched", "onnx_batched", "exp_smoothing"]
+    panel = build_panel(df, variable)
+    report = {
+        "environment": {"python": platform.python_version(), "torch": torch.__version__, "numpy": np.__version__,
+                        "cpu_count": os.cpu_count(), "torch_threads": torch.get_num_threads(),
+                        "platform": platform.platform()},
+        "dataset": {"source": source, "variable": variable, "series": panel.shape[1], "years": len(panel),
+                    "holdout": holdout},
+        "results": [],
+    }
+    for window_size in window_sizes:
+        for strategy in strategies:
+            for hidden_size in hidden_sizes:
+                report["results"].extend(run_config(panel, window_size, strategy, hidden_size, epochs, batch_size,
+                                                    holdout, repeats, backends))
+    return report
+
+
+def format_report(report: Dict) -> str:
+    lines = [f"{'fenêtre':>7} {'stratégie':<15} {'cachée':>6} {'moteur':<20} {'entr. (s)':>9} "
+             f"{'inf. (ms)':>10} {'RSS (Mo)':>9} {'+RSS (Mo)':>9} {'MAE':>12} {'MAPE %':>8}"]
+    for r in report["results"]:
+        lines.append(f"{r['window_size']:>7} {r['strategy']:<15} {r['hidden_size']:>6} {r['backend']:<20} "
+                     f"{r['train_seconds']:>9.2f} {r['inference_ms']:>10.2f} {r['peak_rss_mb'] or 0:>9.1f} "
+                     f"{r['rss_delta_mb'] or 0:>9.1f} "
+                     f"{r['mae'] if r['mae'] is not None else float('nan'):>12.2f} "
+                     f"{r['mape'] if r['mape'] is not None else float('nan'):>8.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m genia.forecast_benchmark",
+                                     description="Banc d'essai des prévisions LSTM (précision et temps de calcul).")
+    parser.add_argument("--data", help="Fichier CSV ou JSON enregistré (sinon séries synthétiques)")
+    parser.add_argument("--variable", default="value", help="Variable à prévoir")
+    parser.add_argument("--series", type=int, default=500, help="Nombre de séries synthétiques")
+    parser.add_argument("--years", type=int, default=25, help="Nombre d'années des séries synthétiques")
+    parser.add_argument("--window-sizes", type=int, nargs="+", default=[3, 5])
+    parser.add_argument("--strategies", nargs="+", choices=("direct", "autoregressive"),
+                        default=["direct", "autoregressive"])
+    parser.add_argument("--hidden-sizes", type=int, nargs="+", default=[50])
+    parser.add_argument("--epochs", type=int, default=DEFAULT_EPOCHS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--holdout", type=int, default=DEFAULT_HOLDOUT, help="Années réservées à l'évaluation")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Répétitions des mesures de latence")
+    parser.add_argument("--backends", nargs="+",
+                        choices=("eager_sequential", "eager_batched", "torchscript_batched", "onnx_batched",
+                                 "exp_smoothing"))
+    parser.add_argument("--output", default="forecast_benchmark.json", help="Rapport JSON")
+    args = parser.parse_args(argv)
+
+    if args.data:
+        df = pd.read_json(args.data) if args.data.endswith(".json") else pd.read_csv(args.data)
+        source = os.path.basename(args.data)
+    else:
+        df = synthetic_series(args.series, args.years)
+        source = f"synthetic({args.series}x{args.years})"
+    report = run_benchmark(df, args.variable, args.window_sizes, args.strategies, args.hidden_sizes,
+                           epochs=args.epochs, batch_size=args.batch_size, holdout=args.holdout,
+                           repeats=args.repeats, backends=args.backends, source=source)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    sys.stderr.write(format_report(report) + "\n")
+    print(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Export des modèles du registre pour l'inférence sur CPU :
+
+    python -m genia.forecast_export <registre>/<clé>.pt --output-dir export --quantize
+
+Produit <clé>.ts.pt (TorchScript), <clé>.onnx et les métadonnées <clé>.json (normalisation, séries)
+lues par genia.onnx_forecast ; avec --quantize, les variantes int8 <clé>.int8.ts.pt et <clé>.int8.onnx.
+"""
+import os
+import sys
+import json
+import inspect
+import argparse
+from typing import Dict, Tuple
+
+import torch
+import torch.nn as nn
+
+from genia.forecast import LSTMModel, model_from_entry
+from genia.onnx_forecast import metadata_path
+
+# ----------------------------------------------------------------
+# Export TorchScript / ONNX et quantification int8 des modèles de prévision
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+ONNX_OPSET = 17
+
+
+def example_inputs(model: LSTMModel, window_size: int, batch: int = 2) -> Tuple[torch.Tensor, ...]:
+    x = torch.zeros(batch, window_size, 1)
+    if model.embedding is None:
+        return (x,)
+    return x, torch.zeros(batch, dtype=torch.long)
+
+
+def quantize_model(model: LSTMModel) -> nn.Module:
+    """
+    Quantification dynamique int8 des couches LSTM et Linear (l'embedding reste en float).
+    """
+    return torch.ao.quantization.quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+
+
+def export_torchscript(model: LSTMModel, path: str, window_size: int, quantize: bool = False) -> str:
+    model.eval()
+    module = quantize_model(model) if quantize else model
+    with torch.no_grad():
+        traced = torch.jit.trace(module, example_inputs(model, window_size))
+    traced.save(path)
+    return path
+
+
+def export_onnx(model: LSTMModel, path: str, window_size: int, quantize: bool = False) -> str:
+    """
+    Export ONNX (taille de lot dynamique). La quantification int8 est faite par ONNX Runtime
+    sur le graphe exporté (les modules quantifiés de PyTorch ne sont pas exportables en ONNX).
+    """
+    model.eval()
+    inputs = example_inputs(model, window_size)
+    input_names = ["x", "series_ids"][:len(inputs)]
+    options = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # Exporteur TorchScript : pas de dépendance à onnxscript
+        options["dynamo"] = False
+    with torch.no_grad():
+        torch.onnx.export(model, inputs, path, input_names=input_names, output_names=["y"],
+                          dynamic_axes={name: {0: "batch"} for name in input_names + ["y"]},
+                          opset_version=ONNX_OPSET, **options)
+    if not quantize:
+        return path
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantized_path = path[:-len(".onnx")] + ".int8.onnx"
+    quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+def export_metadata(entry: Dict, path: str) -> str:
+    metadata = {
+        "window_size": entry["window_size"],
+        "output_size": entry["config"].get("output_size", 1),
+        "series": entry["series"],
+        "mins": entry["mins"].tolist(),
+        "spans": entry["spans"].tolist(),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False)
+    return path
+
+
+def export_entry(entry: Dict, output_dir: str, name: str, quantize: bool = False) -> Dict[str, str]:
+    """
+    Exporte une entrée du registre (voir genia/model_registry.py) ; retourne les chemins produits.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    model = model_from_entry(entry)
+    window_size = entry["window_size"]
+    base = os.path.join(output_dir, name)
+    paths = {
+        "torchscript": export_torchscript(model, base + ".ts.pt", window_size),
+        "onnx": export_onnx(model, base + ".onnx", window_size),
+    }
+    if quantize:
+        paths["torchscript_int8"] = export_torchscript(model, base + ".int8.ts.pt", window_size, quantize=True)
+        paths["onnx_int8"] = export_onnx(model, base + ".onnx", window_size, quantize=True)
+        # Métadonnées également disponibles sous le nom du modèle quantifié
+        export_metadata(entry, metadata_path(paths["onnx_int8"]))
+    paths["metadata"] = export_metadata(entry, metadata_path(paths["onnx"]))
+    return paths
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m genia.forecast_export",
+                                     description="Export TorchScript / ONNX des modèles de prévision enregistrés.")
+    parser.add_argument("models", nargs="+", help="Fichiers .pt du registre de modèles")
+    parser.add_argument("--output-dir", default="export", help="Dossier de sortie")
+    parser.add_argument("--quantize", action="store_true", help="Produit aussi les variantes quantifiées int8")
+    args = parser.parse_args(argv)
+
+    for model_file in args.models:
+        entry = torch.load(model_file, map_location="cpu")
+        name = os.path.splitext(os.path.basename(model_file))[0]
+        for kind, path in export_entry(entry, args.output_dir, name, quantize=args.quantize).items():
+            print(f"{kind}\t{path}\t{os.path.getsize(path)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
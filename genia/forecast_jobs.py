@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import multiprocessing
+from queue import Empty
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# ----------------------------------------------------------------
+# File de tâches d'entraînement des prévisions (pool de processus)
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+# Le dashboard soumet une tâche et lit sa progression (pertes par époque) sans bloquer le script Streamlit.
+# Une tâche identique déjà en cours est réutilisée ; le nombre de tâches simultanées et de threads PyTorch
+# par tâche est plafonné pour ne pas dépasser les cœurs disponibles.
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_ERROR = "error"
+DEFAULT_THREADS_PER_JOB = 2
+DEFAULT_MAX_CONCURRENT_JOBS = max(1, (os.cpu_count() or 1) // DEFAULT_THREADS_PER_JOB)
+
+
+class ForecastJob:
+    """
+    État d'une tâche de prévision, mis à jour par la file à partir des messages du processus de calcul.
+    """
+    def __init__(self, job_id: str, dataset_path: str, variable: str, options: Dict):
+        self.job_id = job_id
+        self.dataset_path = dataset_path
+        self.variable = variable
+        self.options = options
+        self.status = JOB_PENDING
+        self.losses: List[Tuple[int, float]] = []
+        self.result_path: Optional[str] = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JOB_DONE, JOB_ERROR)
+
+
+def job_id_for(dataset_path: str, variable: str, options: Dict) -> str:
+    payload = json.dumps({"dataset": os.path.abspath(dataset_path), "variable": variable, "options": options},
+                         sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _init_worker(threads: int) -> None:
+    import torch
+    torch.set_num_threads(threads)
+
+
+def _run_forecast_job(job_id: str, dataset_path: str, variable: str, options: Dict, progress) -> str:
+    """
+    Exécutée dans un processus du pool : calcule la table de prévisions et retourne son chemin.
+    """
+    from genia.dataset_cache import dataset_hash, load_columns
+    from genia.forecast import forecast_all_series, forecast_table_path, write_forecast_table
+    from genia.model_registry import ModelRegistry
+
+    progress.put((job_id, JOB_RUNNING, None))
+    df = load_columns(dataset_path, ["commune", "date", variable])
+    table = forecast_all_series(df, variable, registry=ModelRegistry(), dataset_hash=dataset_hash(dataset_path),
+                                on_epoch=lambda epoch, loss: progress.put((job_id, "epoch", (epoch, loss))),
+                                **options)
+    path = forecast_table_path(dataset_path, variable, options["strategy"])
+    write_forecast_table(table, path)
+    return path
+
+
+class ForecastJobQueue:
+    """
+    File de tâches de prévision partagée par les sessions du dashboard.
+    """
+    def __init__(self, max_workers: int = DEFAULT_MAX_CONCURRENT_JOBS,
+                 threads_per_job: int = DEFAULT_THREADS_PER_JOB):
+        # spawn : un fork depuis le serveur Streamlit (multithreadé) n'est pas sûr
+        context = multiprocessing.get_context("spawn")
+        self._manager = context.Manager()
+        self._progress = self._manager.Queue()
+        self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                             initializer=_init_worker, initargs=(threads_per_job,))
+        self._jobs: Dict[str, ForecastJob] = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._listener = threading.Thread(target=self._listen, name="forecast-progress", daemon=True)
+        self._listener.start()
+
+    def _listen(self) -> None:
+        while not self._closed.is_set():
+            try:
+                job_id, kind, payload = self._progress.get(timeout=0.5)
+            except Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job.finished:
+                    continue
+                if kind == JOB_RUNNING:
+                    job.status = JOB_RUNNING
+                elif kind == "epoch":
+                    job.losses.append(payload)
+
+    def submit(self, dataset_path: str, variable: str, strategy: str = "autoregressive", retrain: bool = False,
+               **options) -> ForecastJob:
+        """
+        Soumet une tâche (options transmises à forecast_all_series) ; une tâche identique
+        (mêmes données, variable, stratégie, réentraînement et options) en attente ou en cours
+        est retournée au lieu d'en lancer une nouvelle.
+        """
+        options = dict(options, strategy=strategy, retrain=bool(retrain))
+        job_id = job_id_for(dataset_path, variable, options)
+        with self._lock:
+            existing = self._jobs.get(job_id)
+            if existing is not None and not existing.finished:
+                return existing
+            job = ForecastJob(job_id, dataset_path, variable, options)
+            self._jobs[job_id] = job
+        future = self._executor.submit(_run_forecast_job, job_id, dataset_path, variable, options, self._progress)
+        future.add_done_callback(lambda done: self._finish(job, done))
+        logger.info(f"Tâche de prévision soumise : {job_id} ({variable})")
+        return job
+
+    def _finish(self, job: ForecastJob, future) -> None:
+        with self._lock:
+            try:
+                job.result_path = future.result()
+                job.status = JOB_DONE
+            except Exception as e:
+                job.error = str(e)
+                job.status = JOB_ERROR
+                logger.error(f"Échec de la tâche de prévision {job.job_id} : {e}")
+            job.finished_at = time.time()
+
+    def get(self, job_id: str) -> Optional[ForecastJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_jobs(self) -> List[ForecastJob]:
+        with self._lock:
+            return [job for job in self._jobs.values() if not job.finished]
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._closed.set()
+        self._listener.join()
+        self._manager.shutdown()
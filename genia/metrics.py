@@ -0,0 +1,294 @@
+import json
+import time
+import threading
+from collections import defaultdict
+from urllib.parse import urlparse
+from typing import Dict, List, Optional
+
+# ----------------------------------------------------------------
+# Métriques et traces de la collecte (temps par phase, octets, codes HTTP)
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+# Phases mesurées :
+#   queue    attente du limiteur de débit / sémaphore d'hôte (moteur async)
+#   pool     attente d'une connexion libre dans le pool (moteur async)
+#   dns      résolution DNS (moteur async)
+#   connect  connexion TCP + TLS (moteur async)
+#   ttfb     envoi de la requête jusqu'aux en-têtes de réponse ; inclut DNS/TCP/TLS avec requests
+#   transfer réception du corps
+#   parse    extraction des liens
+#   disk     écriture (et hachage) des fichiers
+PHASES = ("queue", "pool", "dns", "connect", "ttfb", "transfer", "parse", "disk")
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class RequestTrace:
+    """
+    Trace d'une requête : chaque appel à mark(phase) attribue à cette phase le temps écoulé depuis le précédent.
+    """
+    def __init__(self, metrics: "CrawlMetrics", url: str, kind: str, commune: Optional[str] = None):
+        self.metrics = metrics
+        self.url = url
+        self.host = urlparse(url).netloc
+        self.kind = kind
+        self.commune = commune
+        self.status: Optional[int] = None
+        self.bytes = 0
+        self.phases: Dict[str, float] = defaultdict(float)
+        self._started = time.perf_counter()
+        self._last = self._started
+        self._excluded = 0.0
+        self.duration = 0.0
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.phases[phase] += now - self._last
+        self._last = now
+
+    def exclude(self) -> None:
+        """
+        Retire de la trace le temps écoulé depuis la dernière marque (travail de l'appelant,
+        par exemple les téléchargements lancés pendant la lecture d'une page).
+        """
+        now = time.perf_counter()
+        self._excluded += now - self._last
+        self._last = now
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self._started - self._excluded
+        self.metrics.record(self)
+
+    def __enter__(self) -> "RequestTrace":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.finish()
+
+
+class NullTrace:
+    """
+    Trace sans effet, utilisée quand aucune collecte de métriques n'est demandée.
+    """
+    status = None
+    bytes = 0
+
+    def mark(self, phase: str) -> None:
+        pass
+
+    def exclude(self) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+    def __enter__(self) -> "NullTrace":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+def start_trace(metrics: Optional["CrawlMetrics"], url: str, kind: str, commune: Optional[str] = None):
+    """
+    Démarre une trace si metrics est fourni, sinon retourne une trace sans effet.
+    """
+    if metrics is None:
+        return NullTrace()
+    return RequestTrace(metrics, url, kind, commune)
+
+
+class CrawlMetrics:
+    """
+    Agrège les traces d'une collecte : latence p50/p95 par hôte, octets et codes HTTP,
+    temps passé par phase et débit par commune. Exportable en JSON ou au format texte Prometheus.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.host_bytes: Dict[str, int] = defaultdict(int)
+        self.phases: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.kinds: Dict[str, int] = defaultdict(int)
+        self.commune_bytes: Dict[str, int] = defaultdict(int)
+        self.commune_requests: Dict[str, int] = defaultdict(int)
+        self.commune_seconds: Dict[str, float] = {}
+
+    def __getstate__(self):
+        # Transmis entre processus par la CLI : le verrou et les defaultdict imbriqués ne sont pas sérialisables
+        return self.to_dict(raw=True)
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.merge_dict(state)
+
+    def record(self, trace: RequestTrace) -> None:
+        status = str(trace.status) if trace.status is not None else "error"
+        with self._lock:
+            self.durations[trace.host].append(trace.duration)
+            self.statuses[trace.host][status] += 1
+            self.host_bytes[trace.host] += trace.bytes
+            self.kinds[trace.kind] += 1
+            for phase, seconds in trace.phases.items():
+                self.phases[trace.host][phase] += seconds
+            if trace.commune:
+                self.commune_bytes[trace.commune] += trace.bytes
+                self.commune_requests[trace.commune] += 1
+
+    def record_commune(self, commune: str, seconds: float) -> None:
+        with self._lock:
+            self.commune_seconds[commune] = seconds
+
+    def merge_dict(self, state: Dict) -> None:
+        with self._lock:
+            for host, values in state["durations"].items():
+                self.durations[host].extend(values)
+            for host, counts in state["statuses"].items():
+                for status, count in counts.items():
+                    self.statuses[host][status] += count
+            for host, value in state["host_bytes"].items():
+                self.host_bytes[host] += value
+            for host, phases in state["phases"].items():
+                for phase, seconds in phases.items():
+                    self.phases[host][phase] += seconds
+            for kind, count in state["kinds"].items():
+                self.kinds[kind] += count
+            for commune, value in state["commune_bytes"].items():
+                self.commune_bytes[commune] += value
+            for commune, value in state["commune_requests"].items():
+                self.commune_requests[commune] += value
+            self.commune_seconds.update(state["commune_seconds"])
+
+    def merge(self, other: "CrawlMetrics") -> None:
+        self.merge_dict(other.to_dict(raw=True))
+
+    def to_dict(self, raw: bool = False) -> Dict:
+        """
+        raw=True : données brutes (fusionnables) ; sinon résumé par hôte et par commune.
+        """
+        with self._lock:
+            if raw:
+                return {
+                    "durations": {host: list(values) for host, values in self.durations.items()},
+                    "statuses": {host: dict(counts) for host, counts in self.statuses.items()},
+                    "host_bytes": dict(self.host_bytes),
+                    "phases": {host: dict(phases) for host, phases in self.phases.items()},
+                    "kinds": dict(self.kinds),
+                    "commune_bytes": dict(self.commune_bytes),
+                    "commune_requests": dict(self.commune_requests),
+                    "commune_seconds": dict(self.commune_seconds),
+                }
+            hosts = {
+                host: {
+                    "requests": len(values),
+                    "p50_seconds": round(_percentile(values, 0.50), 4),
+                    "p95_seconds": round(_percentile(values, 0.95), 4),
+                    "bytes": self.host_bytes[host],
+                    "status_codes": dict(self.statuses[host]),
+                    "phase_seconds": {phase: round(seconds, 4) for phase, seconds in self.phases[host].items()},
+                }
+                for host, values in self.durations.items()
+            }
+            communes = {}
+            for commune in set(self.commune_bytes) | set(self.commune_seconds):
+                seconds = self.commune_seconds.get(commune)
+                communes[commune] = {
+                    "requests": self.commune_requests.get(commune, 0),
+                    "bytes": self.commune_bytes.get(commune, 0),
+                    "seconds": round(seconds, 3) if seconds is not None else None,
+                    "throughput_bytes_per_second": round(self.commune_bytes.get(commune, 0) / seconds, 1) if seconds else None,
+                }
+            return {"hosts": hosts, "communes": communes, "requests_by_kind": dict(self.kinds)}
+
+    def to_prometheus(self) -> str:
+        """
+        Export au format texte Prometheus (exposition 0.0.4).
+        """
+        summary = self.to_dict()
+        lines = [
+            "# HELP genia_crawl_requests_total Requêtes HTTP de la collecte par hôte et code de statut.",
+            "# TYPE genia_crawl_requests_total counter",
+        ]
+        for host, stats in summary["hosts"].items():
+            for status, count in stats["status_codes"].items():
+                lines.append(f'genia_crawl_requests_total{{host="{host}",status="{status}"}} {count}')
+        lines += ["# HELP genia_crawl_bytes_total Octets reçus par hôte.", "# TYPE genia_crawl_bytes_total counter"]
+        for host, stats in summary["hosts"].items():
+            lines.append(f'genia_crawl_bytes_total{{host="{host}"}} {stats["bytes"]}')
+        lines += ["# HELP genia_crawl_request_duration_seconds Latence des requêtes par hôte.",
+                  "# TYPE genia_crawl_request_duration_seconds summary"]
+        for host, stats in summary["hosts"].items():
+            lines.append(f'genia_crawl_request_duration_seconds{{host="{host}",quantile="0.5"}} {stats["p50_seconds"]}')
+            lines.append(f'genia_crawl_request_duration_seconds{{host="{host}",quantile="0.95"}} {stats["p95_seconds"]}')
+            lines.append(f'genia_crawl_request_duration_seconds_count{{host="{host}"}} {stats["requests"]}')
+        lines += ["# HELP genia_crawl_phase_seconds_total Temps cumulé par phase et par hôte.",
+                  "# TYPE genia_crawl_phase_seconds_total counter"]
+        for host, stats in summary["hosts"].items():
+            for phase, seconds in stats["phase_seconds"].items():
+                lines.append(f'genia_crawl_phase_seconds_total{{host="{host}",phase="{phase}"}} {seconds}')
+        lines += ["# HELP genia_crawl_commune_throughput_bytes_per_second Débit moyen par commune.",
+                  "# TYPE genia_crawl_commune_throughput_bytes_per_second gauge"]
+        for commune, stats in summary["communes"].items():
+            if stats["throughput_bytes_per_second"] is not None:
+                label = commune.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'genia_crawl_commune_throughput_bytes_per_second{{commune="{label}"}} {stats["throughput_bytes_per_second"]}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        """
+        Écrit les métriques dans path : format Prometheus si l'extension est .prom, JSON sinon.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".prom"):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), f, indent=4, ensure_ascii=False)
+
+    def report(self) -> str:
+        """
+        Rapport texte : latence p50/p95 par hôte et débit par commune.
+        """
+        summary = self.to_dict()
+        lines = [f"{'Hôte':<40} {'Requêtes':>9} {'p50 (s)':>9} {'p95 (s)':>9} {'Mo':>9}"]
+        for host, stats in sorted(summary["hosts"].items()):
+            lines.append(f"{host:<40} {stats['requests']:>9} {stats['p50_seconds']:>9.3f} "
+                         f"{stats['p95_seconds']:>9.3f} {stats['bytes'] / 1e6:>9.2f}")
+        lines.append("")
+        lines.append(f"{'Commune':<40} {'Requêtes':>9} {'Durée (s)':>10} {'Débit (Mo/s)':>13}")
+        for commune, stats in sorted(summary["communes"].items()):
+            throughput = stats["throughput_bytes_per_second"]
+            lines.append(f"{commune:<40} {stats['requests']:>9} {stats['seconds'] or 0:>10.2f} "
+                         f"{(throughput or 0) / 1e6:>13.3f}")
+        return "\n".join(lines)
+
+
+def aiohttp_trace_config():
+    """
+    TraceConfig aiohttp qui alimente la RequestTrace passée en trace_request_ctx
+    (phases pool, dns, connect et ttfb).
+    """
+    import aiohttp
+
+    def _marker(phase):
+        async def callback(session, trace_config_ctx, params):
+            trace = trace_config_ctx.trace_request_ctx
+            if trace is not None:
+                trace.mark(phase)
+        return callback
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_marker("queue"))
+    trace_config.on_connection_queued_start.append(_marker("pool"))
+    trace_config.on_connection_queued_end.append(_marker("pool"))
+    trace_config.on_dns_resolvehost_start.append(_marker("pool"))
+    trace_config.on_dns_resolvehost_end.append(_marker("dns"))
+    trace_config.on_connection_create_start.append(_marker("pool"))
+    trace_config.on_connection_create_end.append(_marker("connect"))
+    trace_config.on_request_end.append(_marker("ttfb"))
+    return trace_config
@@ -0,0 +1,106 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import torch
+
+from genia.dataset_cache import DATA_CACHE_DIR
+
+# ----------------------------------------------------------------
+# Registre des modèles LSTM entraînés (state_dict + paramètres de normalisation)
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+# Un modèle est identifié par (empreinte du fichier, variable, taille de fenêtre, hyperparamètres).
+# Les entrées sont enregistrées sur disque (<clé>.pt) et les moins récemment utilisées sont supprimées
+# au-delà de max_models ; les dernières entrées lues restent en mémoire.
+MODEL_REGISTRY_DIR = os.environ.get("GENIA_MODEL_REGISTRY", os.path.join(DATA_CACHE_DIR, "models"))
+DEFAULT_MAX_MODELS = 32
+DEFAULT_MEMORY_MODELS = 4
+MODEL_SUFFIX = ".pt"
+
+
+def model_key(dataset_hash: str, variable: str, window_size: int, hyperparameters: Dict) -> str:
+    payload = json.dumps({"dataset": dataset_hash, "variable": variable, "window_size": window_size,
+                          "hyperparameters": hyperparameters}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class ModelRegistry:
+    """
+    Cache LRU des modèles entraînés, sur disque et en mémoire. Une entrée est un dict contenant
+    au minimum "state_dict" ; le reste (configuration, min/étendue de normalisation, séries) est libre.
+    """
+    def __init__(self, root: str = MODEL_REGISTRY_DIR, max_models: int = DEFAULT_MAX_MODELS,
+                 memory_models: int = DEFAULT_MEMORY_MODELS):
+        self.root = root
+        self.max_models = max_models
+        self.memory_models = memory_models
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key + MODEL_SUFFIX)
+
+    def _remember(self, key: str, entry: Dict) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_models:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict]:
+        path = self.path(key)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                if not os.path.exists(path):
+                    return None
+                entry = torch.load(path, map_location="cpu")
+            self._remember(key, entry)
+        # La date de modification sert d'horodatage d'utilisation pour l'éviction LRU
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return entry
+
+    def put(self, key: str, entry: Dict) -> str:
+        path = self.path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=MODEL_SUFFIX + ".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                torch.save(entry, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        with self._lock:
+            self._remember(key, entry)
+        self.evict()
+        return path
+
+    def evict(self) -> None:
+        """
+        Supprime du disque (et de la mémoire) les modèles les moins récemment utilisés au-delà de max_models.
+        """
+        entries = []
+        for name in os.listdir(self.root):
+            if name.endswith(MODEL_SUFFIX):
+                path = os.path.join(self.root, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except FileNotFoundError:
+                    continue
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_models)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            # Un modèle évincé du disque ne doit plus être servi depuis la mémoire
+            with self._lock:
+                self._memory.pop(os.path.basename(path)[:-len(MODEL_SUFFIX)], None)
@@ -0,0 +1,73 @@
+import json
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# ----------------------------------------------------------------
+# Inférence des prévisions avec ONNX Runtime, sans PyTorch
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+# Ce module n'importe ni torch ni pandas : il suffit de numpy et onnxruntime pour servir
+# un modèle exporté par genia.forecast_export (fichier .onnx + métadonnées .json).
+DEFAULT_INTRA_OP_THREADS = 1
+
+
+def metadata_path(model_path: str) -> str:
+    return model_path.rsplit(".", 1)[0] + ".json"
+
+
+class OnnxForecaster:
+    """
+    Prévisions à partir des dernières valeurs (non normalisées) de chaque série.
+    """
+    def __init__(self, model_path: str, metadata: Optional[Dict] = None,
+                 intra_op_threads: int = DEFAULT_INTRA_OP_THREADS):
+        import onnxruntime as ort
+        if metadata is None:
+            with open(metadata_path(model_path), encoding="utf-8") as f:
+                metadata = json.load(f)
+        self.metadata = metadata
+        self.window_size = metadata["window_size"]
+        self.output_size = metadata["output_size"]
+        self.series: List[str] = metadata["series"]
+        self._series_index = {name: i for i, name in enumerate(self.series)}
+        self._mins = np.asarray(metadata["mins"], dtype=np.float64)
+        self._spans = np.asarray(metadata["spans"], dtype=np.float64)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        self._session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = [i.name for i in self._session.get_inputs()]
+
+    def series_ids(self, names: List[str]) -> np.ndarray:
+        return np.array([self._series_index[name] for name in names], dtype=np.int64)
+
+    def _run(self, windows: np.ndarray, series_ids: np.ndarray) -> np.ndarray:
+        feeds = {"x": windows.astype(np.float32, copy=False)[:, :, None]}
+        if "series_ids" in self._input_names:
+            feeds["series_ids"] = series_ids
+        return self._session.run(None, feeds)[0]
+
+    def predict_scaled(self, windows: np.ndarray, series_ids: np.ndarray, horizon: int) -> np.ndarray:
+        """
+        windows : (séries, window_size) normalisées ; retourne (séries, horizon) normalisées.
+        Tête multi-horizon : une seule exécution ; sinon prévision autorégressive pas à pas.
+        """
+        if self.output_size > 1:
+            if self.output_size < horizon:
+                raise ValueError(f"Le modèle prévoit {self.output_size} pas de temps, {horizon} demandés.")
+            return self._run(windows, series_ids)[:, :horizon]
+        buffer = np.empty((windows.shape[0], self.window_size + horizon), dtype=np.float32)
+        buffer[:, :self.window_size] = windows
+        for step in range(horizon):
+            buffer[:, self.window_size + step] = self._run(buffer[:, step:step + self.window_size], series_ids)[:, 0]
+        return buffer[:, self.window_size:]
+
+    def forecast(self, last_values: np.ndarray, series: List[str], horizon: int = 10) -> np.ndarray:
+        """
+        last_values : (séries, window_size) dernières valeurs connues de chaque série nommée dans `series`.
+        Retourne les prévisions (séries, horizon) dans l'unité d'origine.
+        """
+        ids = self.series_ids(series)
+        mins, spans = self._mins[ids, None], self._spans[ids, None]
+        scaled = (np.asarray(last_values, dtype=np.float64) - mins) / spans
+        return self.predict_scaled(scaled, ids, horizon) * spans + mins
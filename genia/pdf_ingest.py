@@ -0,0 +1,132 @@
+import io
+import os
+import base64
+import binascii
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Tuple, Union
+
+# ----------------------------------------------------------------
+# Ingestion de PDF en flux : extraction page par page pendant l'envoi vers S3
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+# Le PDF n'est jamais réécrit dans /tmp ni converti en un seul texte : les pages sont produites une à une
+# par un générateur et passent directement au découpage et à l'indexation, pendant que l'envoi vers S3
+# s'exécute dans un thread à partir d'un second flux sur les mêmes octets.
+logger = logging.getLogger(__name__)
+
+SUMMARY_MAX_CHARS = 20000
+# Au-delà, un PDF lu depuis un flux non rembobinable est mis en mémoire tampon sur disque
+SPOOL_MAX_BYTES = 32 * 1024 * 1024
+COPY_BUFFER_SIZE = 1024 * 1024
+
+PdfSource = Union[str, bytes, BinaryIO]
+Page = Tuple[int, str]
+
+
+def decode_base64_pdf(content: str) -> bytes:
+    """
+    Décode le PDF reçu en base64 (une seule copie binaire, partagée ensuite par les flux de lecture).
+    """
+    try:
+        return base64.b64decode(content, validate=True)
+    except binascii.Error as e:
+        raise ValueError(f"Contenu base64 invalide : {e}") from e
+
+
+def spool_stream(stream: BinaryIO, max_memory: int = SPOOL_MAX_BYTES) -> BinaryIO:
+    """
+    Copie un flux non rembobinable (corps d'une réponse S3, requête HTTP) dans un fichier tampon
+    qui reste en mémoire jusqu'à `max_memory` octets.
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    while True:
+        block = stream.read(COPY_BUFFER_SIZE)
+        if not block:
+            break
+        spooled.write(block)
+    spooled.seek(0)
+    return spooled
+
+
+def stream_opener(source: PdfSource) -> Callable[[], BinaryIO]:
+    """
+    Retourne une fonction qui ouvre un nouveau flux indépendant sur le PDF à chaque appel :
+    l'extraction et l'envoi vers S3 lisent ainsi en parallèle sans se disputer la position de lecture.
+    """
+    if isinstance(source, str):
+        return lambda: open(source, "rb")
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+        # io.BytesIO partage le buffer d'un objet bytes tant qu'il n'est pas modifié
+        return lambda: io.BytesIO(data)
+    if hasattr(source, "name") and isinstance(source.name, str) and os.path.exists(source.name):
+        return lambda: open(source.name, "rb")
+    # Flux anonyme : lu une fois, les deux lecteurs partagent ensuite les mêmes octets
+    data = source.read()
+    return lambda: io.BytesIO(data)
+
+
+def iter_pdf_pages(stream: BinaryIO) -> Iterator[Page]:
+    """
+    Produit (numéro de page à partir de 1, texte) ; les pages sans texte sont ignorées.
+    """
+    from PyPDF2 import PdfReader
+    reader = PdfReader(stream)
+    for number, page in enumerate(reader.pages, start=1):
+        text = page.extract_text()
+        if text:
+            yield number, text
+
+
+class TextPrefix:
+    """
+    Conserve le début du document (au plus `max_chars` caractères) pendant que les pages défilent,
+    pour le résumé, qui n'a pas besoin du texte complet.
+    """
+    def __init__(self, max_chars: int = SUMMARY_MAX_CHARS):
+        self.max_chars = max_chars
+        self._parts: List[str] = []
+        self._length = 0
+
+    def collect(self, pages: Iterable[Page]) -> Iterator[Page]:
+        for number, text in pages:
+            if self._length < self.max_chars:
+                part = text[:self.max_chars - self._length]
+                self._parts.append(part)
+                self._length += len(part) + 1
+            yield number, text
+
+    @property
+    def text(self) -> str:
+        return " ".join(self._parts)
+
+
+def _upload(s3_client, open_stream: Callable[[], BinaryIO], bucket: str, key: str) -> None:
+    with open_stream() as stream:
+        s3_client.upload_fileobj(stream, bucket, key)
+
+
+def ingest_pdf(source: PdfSource, s3_client, bucket: str, key: str,
+               consume: Callable[[Iterator[Page]], object], upload: bool = True):
+    """
+    Envoie le PDF vers s3://bucket/key dans un thread pendant que `consume` reçoit le générateur
+    des pages ; retourne le résultat de `consume` une fois l'envoi terminé.
+    """
+    if not upload and hasattr(source, "read"):
+        # Document déjà dans S3 : le flux est lu directement, sans copie
+        open_stream = lambda: source
+    else:
+        open_stream = stream_opener(source)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="s3-upload") as executor:
+        uploading = executor.submit(_upload, s3_client, open_stream, bucket, key) if upload else None
+        stream = open_stream()
+        try:
+            result = consume(iter_pdf_pages(stream))
+        finally:
+            stream.close()
+        if uploading is not None:
+            uploading.result()
+    logger.info(f"PDF traité : s3://{bucket}/{key}")
+    return result
@@ -0,0 +1,375 @@
+import re
+import json
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from genia.response_cache import normalize_prompt
+
+# ----------------------------------------------------------------
+# Pipeline RAG par étapes : recherche, reclassement, compression du contexte, génération
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+# Chaque étape est chronométrée et mise en cache séparément ; seule la génération appelle le modèle.
+# La recherche, le reclassement (BM25 + score vectoriel, sur CPU) et la compression fonctionnent hors ligne
+# avec HashingEmbedder et un PassageIndex local.
+logger = logging.getLogger(__name__)
+
+GENERATION_MODEL_ID = "anthropic.claude-instant-v1"
+DEFAULT_TOP_K = 20
+DEFAULT_TOP_N = 5
+DEFAULT_CONTEXT_TOKENS = 1500
+DEFAULT_STAGE_CACHE_SIZE = 256
+# Une base de connaissances Bedrock est synchronisée hors de ce processus et n'expose pas de version :
+# ses résultats en cache expirent après ce délai (secondes)
+DEFAULT_KNOWLEDGE_BASE_CACHE_TTL = 15 * 60
+DEFAULT_SESSION_PASSAGES = 40
+DEFAULT_HASH_DIMENSION = 512
+# Poids du score vectoriel dans le score de reclassement (le reste vient de BM25)
+VECTOR_WEIGHT = 0.5
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = frozenset(
+    "a au aux avec ce ces dans de des du elle en est et il ils la le les leur lui ma mais me même mes moi mon "
+    "ne nos notre nous on ou par pas pour qu que qui sa se ses son sont sur ta te tes toi ton tu un une vos votre "
+    "vous y d l j m n s t c quel quels quelle quelles the of and to in is are for on".split()
+)
+_WORD = re.compile(r"\w+", re.UNICODE)
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+|\n{2,}")
+
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in _WORD.findall(text.casefold()) if word not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, (len(text) + 3) // 4)
+
+
+class Passage:
+    """
+    Extrait de document retourné par la recherche ; `metadata` décrit sa provenance (document, page, position).
+    """
+    def __init__(self, passage_id: str, text: str, score: float = 0.0, metadata: Optional[Dict] = None):
+        self.passage_id = passage_id
+        self.text = text
+        self.score = score
+        self.metadata = metadata or {}
+
+    def with_score(self, score: float) -> "Passage":
+        return Passage(self.passage_id, self.text, score, self.metadata)
+
+
+class HashingEmbedder:
+    """
+    Embedding déterministe sans modèle (hachage des mots et des bigrammes), pour les tests hors ligne.
+    """
+    def __init__(self, dimension: int = DEFAULT_HASH_DIMENSION):
+        self.dimension = dimension
+
+    def __call__(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        words = tokenize(text)
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class PassageIndex:
+    """
+    Index vectoriel local (similarité cosinus exacte) ; sauvegardé en .npz (vecteurs) + .json (passages).
+    """
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        self.passages: List[Passage] = []
+        self._vectors = np.empty((0, dimension), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    def add(self, passages: Sequence[Passage], vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(passages), self.dimension)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        self._vectors = np.vstack([self._vectors, vectors / np.where(norms == 0, 1, norms)])
+        self.passages.extend(passages)
+
+    def search(self, vector: np.ndarray, k: int) -> List[Passage]:
+        if not self.passages:
+            return []
+        scores = self._vectors @ np.asarray(vector, dtype=np.float32)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self.passages[i].with_score(float(scores[i])) for i in top]
+
+    def save(self, path: str) -> None:
+        np.savez(path + ".npz", vectors=self._vectors)
+        with open(path + ".json", "w", encoding="utf-8") as f:
+            json.dump([{"id": p.passage_id, "text": p.text, "metadata": p.metadata} for p in self.passages],
+                      f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "PassageIndex":
+        vectors = np.load(path + ".npz")["vectors"]
+        with open(path + ".json", encoding="utf-8") as f:
+            passages = [Passage(p["id"], p["text"], metadata=p["metadata"]) for p in json.load(f)]
+        index = cls(vectors.shape[1])
+        index.passages, index._vectors = passages, vectors
+        return index
+
+
+# Recherche
+class LocalRetriever:
+    def __init__(self, index: PassageIndex, embed: Callable[[str], Sequence[float]]):
+        self.index = index
+        self.embed = embed
+
+    def retrieve(self, query: str, k: int) -> List[Passage]:
+        return self.index.search(np.asarray(self.embed(query), dtype=np.float32), k)
+
+
+class KnowledgeBaseRetriever:
+    """
+    Recherche seule (API retrieve) dans une base de connaissances Bedrock, sans génération.
+    cache_ttl : durée de vie des recherches et reclassements mis en cache par RagPipeline (None : sans limite).
+    """
+    def __init__(self, client, knowledge_base_id: str,
+                 cache_ttl: Optional[float] = DEFAULT_KNOWLEDGE_BASE_CACHE_TTL):
+        self.client = client
+        self.knowledge_base_id = knowledge_base_id
+        self.cache_ttl = cache_ttl
+
+    def retrieve(self, query: str, k: int) -> List[Passage]:
+        response = self.client.retrieve(
+            knowledgeBaseId=self.knowledge_base_id,
+            retrievalQuery={"text": query},
+            retrievalConfiguration={"vectorSearchConfiguration": {"numberOfResults": k}})
+        passages = []
+        for result in response["retrievalResults"]:
+            location = result.get("location", {})
+            uri = location.get("s3Location", {}).get("uri", "")
+            text = result["content"]["text"]
+            passage_id = hashlib.sha256(f"{uri}\n{text}".encode("utf-8")).hexdigest()[:16]
+            passages.append(Passage(passage_id, text, result.get("score", 0.0), {"uri": uri}))
+        return passages
+
+
+# Reclassement et compression (CPU)
+def bm25_scores(query_terms: List[str], documents: List[List[str]]) -> np.ndarray:
+    """
+    Scores BM25 de la requête pour chaque document (statistiques calculées sur les seuls candidats).
+    """
+    if not documents:
+        return np.zeros(0)
+    average_length = sum(len(d) for d in documents) / len(documents) or 1.0
+    frequencies = Counter(term for d in documents for term in set(d))
+    scores = np.zeros(len(documents))
+    for i, document in enumerate(documents):
+        counts = Counter(document)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * len(document) / average_length)
+        for term in set(query_terms):
+            tf = counts.get(term, 0)
+            if tf:
+                idf = math.log(1 + (len(documents) - frequencies[term] + 0.5) / (frequencies[term] + 0.5))
+                scores[i] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+    return scores
+
+
+def _unit_scale(values: np.ndarray) -> np.ndarray:
+    span = values.max() - values.min() if len(values) else 0
+    return (values - values.min()) / span if span else np.zeros_like(values, dtype=float)
+
+
+class Bm25Reranker:
+    """
+    Reclassement hybride : score vectoriel de la recherche et BM25 sur le texte des candidats, normalisés.
+    """
+    def __init__(self, vector_weight: float = VECTOR_WEIGHT):
+        self.vector_weight = vector_weight
+
+    def rerank(self, query: str, passages: List[Passage], top_n: int) -> List[Passage]:
+        if not passages:
+            return []
+        lexical = bm25_scores(tokenize(query), [tokenize(p.text) for p in passages])
+        vector = np.array([p.score for p in passages], dtype=float)
+        scores = self.vector_weight * _unit_scale(vector) + (1 - self.vector_weight) * _unit_scale(lexical)
+        order = np.argsort(-scores, kind="stable")[:top_n]
+        return [passages[i].with_score(float(scores[i])) for i in order]
+
+
+def compress_context(query: str, passages: List[Passage], max_tokens: int = DEFAULT_CONTEXT_TOKENS) -> str:
+    """
+    Garde les phrases les plus pertinentes (termes de la requête, pondérés par leur rareté) dans la limite
+    de `max_tokens`, dans l'ordre des passages ; les phrases répétées d'un passage à l'autre sont ignorées.
+    """
+    query_terms = set(tokenize(query))
+    sentences = []
+    seen = set()
+    for rank, passage in enumerate(passages):
+        for sentence in _SENTENCE_END.split(passage.text):
+            sentence = " ".join(sentence.split())
+            key = sentence.casefold()
+            if not sentence or key in seen:
+                continue
+            seen.add(key)
+            sentences.append((rank, len(sentences), sentence, tokenize(sentence)))
+    if not sentences:
+        return ""
+    frequencies = Counter(term for *_, terms in sentences for term in set(terms))
+    scored = []
+    for rank, position, sentence, terms in sentences:
+        overlap = sum(math.log(1 + len(sentences) / frequencies[t]) for t in query_terms.intersection(terms))
+        # À pertinence égale, les phrases des passages les mieux classés passent en premier
+        scored.append((overlap / (1 + rank * 0.1), -position, sentence))
+    kept, budget = [], max_tokens
+    for score, negative_position, sentence in sorted(scored, reverse=True):
+        tokens = estimate_tokens(sentence)
+        if tokens <= budget:
+            kept.append((-negative_position, sentence))
+            budget -= tokens
+    return "\n".join(sentence for _, sentence in sorted(kept))
+
+
+# Génération
+def build_prompt(question: str, context: str) -> str:
+    return ("Réponds à la question en t'appuyant uniquement sur les extraits suivants. "
+            "Si la réponse n'y figure pas, dis-le.\n\n"
+            f"Extraits :\n{context}\n\nQuestion : {question}")
+
+
+def bedrock_generator(client, model_id: str = GENERATION_MODEL_ID, max_tokens: int = 1000) -> Callable[[str], str]:
+    def generate(prompt: str) -> str:
+        response = client.converse(
+            modelId=model_id,
+            messages=[{"role": "user", "content": [{"text": prompt}]}],
+            inferenceConfig={"maxTokens": max_tokens, "temperature": 0})
+        return response["output"]["message"]["content"][0]["text"]
+    return generate
+
+
+class StageCache:
+    """
+    Petit cache LRU en mémoire pour les résultats d'une étape ; avec `ttl`, une entrée plus ancienne
+    que ttl secondes n'est plus servie.
+    """
+    def __init__(self, max_entries: int = DEFAULT_STAGE_CACHE_SIZE, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[object, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, stored_at = item
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RagSession:
+    """
+    Passages déjà retrouvés dans une conversation : réutilisés comme candidats pour les questions suivantes.
+    """
+    def __init__(self, max_passages: int = DEFAULT_SESSION_PASSAGES):
+        self.max_passages = max_passages
+        self.passages: "OrderedDict[str, Passage]" = OrderedDict()
+
+    def remember(self, passages: List[Passage]) -> None:
+        for passage in passages:
+            self.passages[passage.passage_id] = passage
+            self.passages.move_to_end(passage.passage_id)
+        while len(self.passages) > self.max_passages:
+            self.passages.popitem(last=False)
+
+
+class RagResult:
+    def __init__(self, answer: str, passages: List[Passage], context: str, timings: Dict[str, float],
+                 cached: List[str]):
+        self.answer = answer
+        self.passages = passages
+        self.context = context
+        self.timings = timings
+        self.cached = cached
+
+
+class RagPipeline:
+    def __init__(self, retriever, generate: Callable[[str], str], reranker=None, top_k: int = DEFAULT_TOP_K,
+                 top_n: int = DEFAULT_TOP_N, context_tokens: int = DEFAULT_CONTEXT_TOKENS,
+                 cache_size: int = DEFAULT_STAGE_CACHE_SIZE, cache_ttl: Optional[float] = None):
+        """
+        cache_ttl : durée de vie des recherches et reclassements en cache, par défaut celle du retriever
+        (attribut cache_ttl) ; les étapes suivantes dépendent du contenu des passages et n'expirent pas.
+        """
+        self.retriever = retriever
+        self.generate = generate
+        self.reranker = reranker if reranker is not None else Bm25Reranker()
+        self.top_k = top_k
+        self.top_n = top_n
+        self.context_tokens = context_tokens
+        ttl = cache_ttl if cache_ttl is not None else getattr(retriever, "cache_ttl", None)
+        self.caches = {stage: StageCache(cache_size, ttl if stage in ("retrieve", "rerank") else None)
+                       for stage in ("retrieve", "rerank", "compress", "generate")}
+
+    def _stage(self, name: str, key: Hashable, compute: Callable, timings: Dict[str, float], cached: List[str]):
+        started = time.perf_counter()
+        value = self.caches[name].get(key)
+        if value is None:
+            value = compute()
+            self.caches[name].put(key, value)
+        else:
+            cached.append(name)
+        timings[name] = time.perf_counter() - started
+        return value
+
+    def answer(self, question: str, session: Optional[RagSession] = None) -> RagResult:
+        timings: Dict[str, float] = {}
+        cached: List[str] = []
+        query = normalize_prompt(question)
+        # Un index modifiable (genia/vector_store.py) expose sa version : les résultats mis en cache
+        # avant un ajout ou une suppression de document ne sont plus servis
+        version = getattr(self.retriever, "version", None)
+        retrieved = self._stage("retrieve", (query, self.top_k, version),
+                                lambda: self.retriever.retrieve(question, self.top_k), timings, cached)
+        candidates = list(retrieved)
+        if session is not None:
+            # Les passages des questions précédentes restent candidats (questions de suivi)
+            # leur score vectoriel (calculé pour une autre requête) est ramené au plus faible score retrouvé
+            known = {p.passage_id for p in candidates}
+            floor = min((p.score for p in candidates), default=0.0)
+            candidates += [p.with_score(floor) for p in session.passages.values() if p.passage_id not in known]
+        candidate_ids = tuple(p.passage_id for p in candidates)
+        passages = self._stage("rerank", (query, candidate_ids, version),
+                               lambda: self.reranker.rerank(question, candidates, self.top_n), timings, cached)
+        passage_ids = tuple(p.passage_id for p in passages)
+        context = self._stage("compress", (query, passage_ids, self.context_tokens),
+                              lambda: compress_context(question, passages, self.context_tokens), timings, cached)
+        prompt = build_prompt(question, context)
+        answer = self._stage("generate", (query, hashlib.sha256(context.encode("utf-8")).hexdigest()),
+                             lambda: self.generate(prompt), timings, cached)
+        if session is not None:
+            session.remember(retrieved)
+        logger.info("RAG : " + ", ".join(f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in timings.items())
+                    + (f" (cache : {', '.join(cached)})" if cached else ""))
+        return RagResult(answer, passages, context, timings, cached)
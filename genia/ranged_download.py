@@ -0,0 +1,214 @@
+import os
+import re
+import mmap
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Mapping, Optional, Tuple
+
+# ----------------------------------------------------------------
+# Téléchargement parallèle des gros fichiers par requêtes Range
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+LARGE_FILE_THRESHOLD = 64 * 1024 * 1024
+DEFAULT_RANGE_WORKERS = 4
+MIN_RANGE_SIZE = 1024 * 1024
+MAX_RANGE_SIZE = 32 * 1024 * 1024
+# Durée visée pour chaque requête Range : la taille des plages suit le débit mesuré
+TARGET_RANGE_SECONDS = 2.0
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+def ranged_download_size(status_code: int, headers: Mapping[str, str],
+                         threshold: int = LARGE_FILE_THRESHOLD) -> Optional[int]:
+    """
+    Retourne la taille du fichier si la réponse permet un téléchargement par plages
+    (200, Accept-Ranges: bytes, Content-Length connu et supérieur au seuil, pas d'encodage), sinon None.
+    """
+    if status_code != 200 or threshold is None:
+        return None
+    if headers.get("Accept-Ranges", "").lower() != "bytes" or headers.get("Content-Encoding"):
+        return None
+    content_length = headers.get("Content-Length")
+    if not content_length or int(content_length) < threshold:
+        return None
+    return int(content_length)
+
+
+def check_range_response(status_code: int, headers: Mapping[str, str], start: int, end: int, total: int) -> None:
+    if status_code != 206:
+        raise IOError(f"Réponse {status_code} au lieu de 206 pour la plage {start}-{end} (ressource modifiée ?)")
+    match = _CONTENT_RANGE_RE.match(headers.get("Content-Range", ""))
+    if (match is None or int(match.group(1)) != start or int(match.group(2)) != end
+            or (match.group(3) != "*" and int(match.group(3)) != total)):
+        raise IOError(f"Content-Range inattendu : {headers.get('Content-Range')} (attendu {start}-{end}/{total})")
+
+
+class RangePlanner:
+    """
+    Distribue les plages d'octets aux workers. La taille de chaque plage s'adapte au débit
+    mesuré par le worker (TARGET_RANGE_SECONDS de transfert), entre MIN_RANGE_SIZE et MAX_RANGE_SIZE.
+    """
+    def __init__(self, total: int, workers: int):
+        self.total = total
+        self.completed = 0
+        self._next = 0
+        self._failed = False
+        self._lock = threading.Lock()
+        self.initial_size = min(MAX_RANGE_SIZE, max(MIN_RANGE_SIZE, total // (workers * 4)))
+
+    def next_range(self, throughput: Optional[float] = None) -> Optional[Tuple[int, int]]:
+        size = self.initial_size
+        if throughput:
+            size = int(min(MAX_RANGE_SIZE, max(MIN_RANGE_SIZE, throughput * TARGET_RANGE_SECONDS)))
+        with self._lock:
+            if self._failed or self._next >= self.total:
+                return None
+            start = self._next
+            end = min(self.total, start + size) - 1
+            self._next = end + 1
+            return start, end
+
+    def done(self, size: int) -> None:
+        with self._lock:
+            self.completed += size
+
+    def abort(self) -> None:
+        with self._lock:
+            self._failed = True
+
+
+class MappedOutput:
+    """
+    Fichier de sortie préalloué à sa taille finale et projeté en mémoire (mmap) :
+    chaque worker écrit directement à la position de sa plage.
+    """
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self._file = None
+        self._map = None
+
+    def __enter__(self) -> "MappedOutput":
+        self._file = open(self.path, "w+b")
+        self._file.truncate(self.size)
+        self._map = mmap.mmap(self._file.fileno(), self.size)
+        return self
+
+    def write_at(self, offset: int, chunk: bytes, end: int) -> int:
+        """
+        Écrit chunk à offset sans dépasser la fin de la plage (incluse) ; retourne la nouvelle position.
+        """
+        if offset + len(chunk) > end + 1:
+            raise IOError(f"Le serveur a renvoyé plus d'octets que la plage demandée (fin {end})")
+        self._map[offset:offset + len(chunk)] = chunk
+        return offset + len(chunk)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+
+
+def _range_headers(start: int, end: int, validator: Optional[str]) -> dict:
+    headers = {"Range": f"bytes={start}-{end}"}
+    if validator:
+        headers["If-Range"] = validator
+    return headers
+
+
+def download_ranges(session, url: str, part_path: str, total: int, validator: Optional[str] = None,
+                    workers: int = DEFAULT_RANGE_WORKERS, timeout: float = 10) -> int:
+    """
+    Télécharge url dans part_path par plages parallèles (session requests partagée entre threads).
+    Retourne le nombre d'octets écrits ; lève IOError si le fichier n'est pas complet.
+    """
+    planner = RangePlanner(total, workers)
+
+    def worker() -> None:
+        throughput = None
+        try:
+            while True:
+                byte_range = planner.next_range(throughput)
+                if byte_range is None:
+                    return
+                start, end = byte_range
+                started = time.monotonic()
+                with session.get(url, headers=_range_headers(start, end, validator), stream=True, timeout=timeout) as response:
+                    check_range_response(response.status_code, response.headers, start, end, total)
+                    offset = start
+                    for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                        offset = output.write_at(offset, chunk, end)
+                if offset != end + 1:
+                    raise IOError(f"Plage {start}-{end} incomplète : {offset - start} octets reçus")
+                planner.done(end - start + 1)
+                throughput = (end - start + 1) / max(time.monotonic() - started, 1e-3)
+        except Exception:
+            planner.abort()
+            raise
+
+    with MappedOutput(part_path, total) as output:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(worker) for _ in range(workers)]
+            for future in futures:
+                future.result()
+    if planner.completed != total:
+        raise IOError(f"Téléchargement par plages incomplet pour {url} : {planner.completed}/{total} octets")
+    return planner.completed
+
+
+async def download_ranges_async(session, url: str, part_path: str, total: int, validator: Optional[str] = None,
+                                workers: int = DEFAULT_RANGE_WORKERS, semaphore: Optional[asyncio.Semaphore] = None,
+                                rate_limiter=None) -> int:
+    """
+    Équivalent asynchrone de download_ranges pour une session aiohttp ; chaque requête Range
+    passe par le limiteur de débit et le sémaphore d'hôte du crawler s'ils sont fournis.
+    """
+    planner = RangePlanner(total, workers)
+    semaphore = semaphore or asyncio.Semaphore(workers)
+
+    async def worker() -> None:
+        throughput = None
+        try:
+            while True:
+                byte_range = planner.next_range(throughput)
+                if byte_range is None:
+                    return
+                start, end = byte_range
+                if rate_limiter is not None:
+                    await rate_limiter.acquire()
+                async with semaphore:
+                    started = time.monotonic()
+                    async with session.get(url, headers=_range_headers(start, end, validator)) as response:
+                        check_range_response(response.status, response.headers, start, end, total)
+                        offset = start
+                        async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                            offset = output.write_at(offset, chunk, end)
+                if offset != end + 1:
+                    raise IOError(f"Plage {start}-{end} incomplète : {offset - start} octets reçus")
+                planner.done(end - start + 1)
+                throughput = (end - start + 1) / max(time.monotonic() - started, 1e-3)
+        except Exception:
+            planner.abort()
+            raise
+
+    with MappedOutput(part_path, total) as output:
+        # On attend tous les workers avant de fermer la projection mémoire
+        results = await asyncio.gather(*[worker() for _ in range(workers)], return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    if planner.completed != total:
+        raise IOError(f"Téléchargement par plages incomplet pour {url} : {planner.completed}/{total} octets")
+    return planner.completed
+
+
+def remove_part(part_path: str) -> None:
+    """
+    Supprime un fichier partiel issu d'un téléchargement par plages (non reprenable : il contient des trous).
+    """
+    if os.path.exists(part_path):
+        os.remove(part_path)
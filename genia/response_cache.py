@@ -0,0 +1,293 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# ----------------------------------------------------------------
+# Cache des réponses du modèle (correspondance exacte puis similarité sémantique)
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+# Une réponse est retrouvée soit par la question normalisée (même modèle, même configuration), soit par
+# la question la plus proche au sens des embeddings, au-delà d'un seuil de similarité cosinus. Le cache n'a
+# de sens que pour des appels déterministes (temperature 0). Ce module ne dépend que de numpy et de la
+# bibliothèque standard pour pouvoir être embarqué dans les Lambda.
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_PATH = os.environ.get("GENIA_RESPONSE_CACHE",
+                                     os.path.join(tempfile.gettempdir(), "genia_response_cache.sqlite3"))
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL = 24 * 3600
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+EMBEDDING_MODEL_ID = "amazon.titan-embed-text-v2:0"
+
+TIER_EXACT = "exact"
+TIER_SEMANTIC = "semantic"
+
+_SPACES = re.compile(r"\s+")
+_SPACE_BEFORE_PUNCTUATION = re.compile(r"\s+([?!.,;:])")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Forme canonique d'une question : casse, espaces et ponctuation finale ignorés.
+    """
+    text = unicodedata.normalize("NFKC", prompt).casefold()
+    text = _SPACE_BEFORE_PUNCTUATION.sub(r"\1", _SPACES.sub(" ", text)).strip()
+    return text.rstrip(" ?!.")
+
+
+def cache_scope(model_id: str, config: Optional[Dict] = None) -> str:
+    payload = json.dumps({"model": model_id, "config": config or {}}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(prompt: str, model_id: str, config: Optional[Dict] = None) -> str:
+    payload = json.dumps({"prompt": normalize_prompt(prompt), "scope": cache_scope(model_id, config)})
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def bedrock_embedder(client, model_id: str = EMBEDDING_MODEL_ID) -> Callable[[str], List[float]]:
+    """
+    Fonction d'embedding pour le niveau sémantique, à partir d'un client bedrock-runtime.
+    """
+    def embed(text: str) -> List[float]:
+        response = client.invoke_model(body=json.dumps({"inputText": text}), modelId=model_id,
+                                       accept="application/json", contentType="application/json")
+        return json.loads(response["body"].read())["embedding"]
+    return embed
+
+
+# Stockage des entrées (en mémoire ou sur disque)
+# Une entrée est un dict : key, scope, prompt, response, embedding (np.float32 normalisé ou None), created_at.
+# put() retourne les clés évincées (LRU) pour que l'index sémantique les oublie ; version() change quand
+# un autre processus modifie les entrées (None : stockage propre au processus, jamais modifié ailleurs).
+
+class MemoryBackend:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, entry: Dict) -> List[str]:
+        self._entries[entry["key"]] = entry
+        self._entries.move_to_end(entry["key"])
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            evicted.append(self._entries.popitem(last=False)[0])
+        return evicted
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def embeddings(self) -> List[Tuple[str, str, np.ndarray]]:
+        return [(e["key"], e["scope"], e["embedding"]) for e in self._entries.values() if e["embedding"] is not None]
+
+    def version(self) -> Optional[int]:
+        return None
+
+
+class DiskBackend:
+    """
+    Entrées dans une base SQLite locale, partagée entre les exécutions (et les processus) d'une même machine.
+    """
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, scope TEXT, prompt TEXT, "
+                         "response TEXT, embedding BLOB, created_at REAL, used_at REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+
+    @staticmethod
+    def _entry(row) -> Dict:
+        key, scope, prompt, response, embedding, created_at = row
+        return {"key": key, "scope": scope, "prompt": prompt, "response": response, "created_at": created_at,
+                "embedding": None if embedding is None else np.frombuffer(embedding, dtype=np.float32)}
+
+    def get(self, key: str) -> Optional[Dict]:
+        row = self._db.execute("SELECT key, scope, prompt, response, embedding, created_at FROM responses "
+                               "WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._db.execute("UPDATE responses SET used_at = ? WHERE key = ?", (time.time(), key))
+        return self._entry(row)
+
+    def put(self, entry: Dict) -> List[str]:
+        embedding = entry["embedding"]
+        self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (entry["key"], entry["scope"], entry["prompt"], entry["response"],
+                          None if embedding is None else embedding.tobytes(), entry["created_at"], time.time()))
+        excess = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+        if excess <= 0:
+            return []
+        evicted = [row[0] for row in self._db.execute(
+            "SELECT key FROM responses ORDER BY used_at LIMIT ?", (excess,))]
+        self._db.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in evicted])
+        return evicted
+
+    def delete(self, key: str) -> None:
+        self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def embeddings(self) -> List[Tuple[str, str, np.ndarray]]:
+        return [(key, scope, np.frombuffer(embedding, dtype=np.float32)) for key, scope, embedding in
+                self._db.execute("SELECT key, scope, embedding FROM responses WHERE embedding IS NOT NULL")]
+
+    def version(self) -> Optional[int]:
+        # Change à chaque écriture validée par une autre connexion (les nôtres sont suivies par l'index)
+        return self._db.execute("PRAGMA data_version").fetchone()[0]
+
+
+# Cache de réponses
+class CacheLookup:
+    """
+    Résultat d'une recherche : `response` vaut None en cas d'absence ; l'objet est ensuite passé
+    à ResponseCache.store pour enregistrer la réponse sans recalculer la clé ni l'embedding.
+    """
+    def __init__(self, prompt: str, key: str, scope: str):
+        self.prompt = prompt
+        self.key = key
+        self.scope = scope
+        self.embedding: Optional[np.ndarray] = None
+        self.response: Optional[str] = None
+        self.tier: Optional[str] = None
+        self.similarity: Optional[float] = None
+
+    @property
+    def hit(self) -> bool:
+        return self.response is not None
+
+
+class ResponseCache:
+    def __init__(self, backend=None, ttl: Optional[float] = DEFAULT_TTL,
+                 embed: Optional[Callable[[str], Sequence[float]]] = None,
+                 similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self.stats = {"exact": 0, "semantic": 0, "miss": 0}
+        self._lock = threading.Lock()
+        # Index sémantique par (modèle, configuration) : clés et matrice des embeddings normalisés
+        self._vectors: Dict[str, Dict[str, np.ndarray]] = {}
+        self._matrices: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        self._backend_version: Optional[int] = None
+        self._load_index()
+
+    def _load_index(self) -> None:
+        # Version lue avant les entrées : une écriture concurrente provoquera un nouveau chargement
+        self._backend_version = self.backend.version()
+        self._vectors, self._matrices = {}, {}
+        for key, scope, embedding in self.backend.embeddings():
+            self._vectors.setdefault(scope, {})[key] = embedding
+
+    def _refresh_index(self) -> None:
+        """
+        Recharge l'index sémantique si un autre processus a modifié le stockage partagé.
+        """
+        if self.backend.version() != self._backend_version:
+            self._load_index()
+
+    def _expired(self, entry: Dict) -> bool:
+        return self.ttl is not None and time.time() - entry["created_at"] > self.ttl
+
+    def _forget(self, key: str, scope: Optional[str] = None) -> None:
+        for name in ([scope] if scope is not None else list(self._vectors)):
+            if self._vectors.get(name, {}).pop(key, None) is not None:
+                self._matrices.pop(name, None)
+
+    def _get_entry(self, key: str) -> Optional[Dict]:
+        entry = self.backend.get(key)
+        if entry is not None and self._expired(entry):
+            self.backend.delete(key)
+            self._forget(key, entry["scope"])
+            return None
+        return entry
+
+    def _nearest(self, scope: str, embedding: np.ndarray) -> Tuple[Optional[str], float]:
+        vectors = self._vectors.get(scope)
+        if not vectors:
+            return None, 0.0
+        if scope not in self._matrices:
+            self._matrices[scope] = (list(vectors), np.vstack(list(vectors.values())))
+        keys, matrix = self._matrices[scope]
+        similarities = matrix @ embedding
+        best = int(np.argmax(similarities))
+        return keys[best], float(similarities[best])
+
+    def _embedding(self, prompt: str) -> np.ndarray:
+        embedding = np.asarray(self.embed(normalize_prompt(prompt)), dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+
+    def lookup(self, prompt: str, model_id: str, config: Optional[Dict] = None) -> CacheLookup:
+        result = CacheLookup(prompt, cache_key(prompt, model_id, config), cache_scope(model_id, config))
+        with self._lock:
+            entry = self._get_entry(result.key)
+            if entry is not None:
+                result.response, result.tier = entry["response"], TIER_EXACT
+                self.stats["exact"] += 1
+                return result
+        if self.embed is None:
+            with self._lock:
+                self.stats["miss"] += 1
+            return result
+        # Calcul de l'embedding hors verrou : c'est un appel réseau. En cas d'échec, la requête
+        # continue sans le niveau sémantique (absence du cache, réponse enregistrée sans embedding)
+        try:
+            result.embedding = self._embedding(prompt)
+        except Exception as e:
+            logger.warning(f"Embedding indisponible pour le cache sémantique : {e}")
+            with self._lock:
+                self.stats["miss"] += 1
+            return result
+        with self._lock:
+            self._refresh_index()
+            key, similarity = self._nearest(result.scope, result.embedding)
+            entry = self._get_entry(key) if key is not None and similarity >= self.similarity_threshold else None
+            if entry is not None:
+                result.response, result.tier, result.similarity = entry["response"], TIER_SEMANTIC, similarity
+                self.stats["semantic"] += 1
+                logger.debug(f"Réponse en cache (similarité {similarity:.3f}) : {entry['prompt']!r}")
+            else:
+                self.stats["miss"] += 1
+        return result
+
+    def store(self, lookup: CacheLookup, response: str) -> None:
+        entry = {"key": lookup.key, "scope": lookup.scope, "prompt": lookup.prompt, "response": response,
+                 "embedding": lookup.embedding, "created_at": time.time()}
+        with self._lock:
+            for key in self.backend.put(entry):
+                self._forget(key)
+            if lookup.embedding is not None:
+                self._vectors.setdefault(lookup.scope, {})[lookup.key] = lookup.embedding
+                self._matrices.pop(lookup.scope, None)
+
+    def get_or_call(self, prompt: str, model_id: str, config: Optional[Dict], call: Callable[[], str]) -> str:
+        """
+        Réponse en cache si elle existe, sinon résultat de `call()` (enregistré).
+        """
+        lookup = self.lookup(prompt, model_id, config)
+        if lookup.hit:
+            return lookup.response
+        response = call()
+        self.store(lookup, response)
+        return response
@@ -0,0 +1,306 @@
+import os
+import re
+import time
+import codecs
+import logging
+import requests
+from html.parser import HTMLParser
+from functools import lru_cache
+from urllib.parse import urljoin
+import json
+from typing import Callable, Iterable, Iterator, Set, List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from genia.metrics import CrawlMetrics, NullTrace, start_trace
+from genia.download_store import DownloadStore, STATUS_DEDUPLICATED, STATUS_NOT_MODIFIED
+from genia.datagouv_api import API_URL, iter_datasets, resource_urls
+
+# ----------------------------------------------------------------
+# Configuration de la journalisation
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+console_handler = logging.StreamHandler()
+formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+console_handler.setFormatter(formatter)
+logger.addHandler(console_handler)
+
+# ----------------------------------------------------------------
+# Constantes pour le scraping depuis data.gouv.fr
+# ----------------------------------------------------------------
+BASE_URL = "https://www.data.gouv.fr/fr/datasets/"
+SEARCH_URL = "https://www.data.gouv.fr/fr/search/?q={commune}"
+DOCUMENT_TYPES = [
+    "DICRIM", "PCS", "PLU", "PPRN", "PCAET", "SCoT", "PLUi", "PICS", "DDRM", "SRADDET"
+]
+SUMMARY_FILENAME = "download_summary.json"
+# Découverte des fichiers : pages HTML du site ou API JSON (voir genia/datagouv_api.py)
+DISCOVERY_BACKENDS = ("html", "api")
+
+# ----------------------------------------------------------------
+# Fonctions utilitaires partagées (moteur synchrone et asynchrone)
+# ----------------------------------------------------------------
+
+def commune_folder_path(commune_name: str, output_dir: str) -> str:
+    """
+    Retourne le dossier de sortie d'une commune (nom nettoyé) et le crée si besoin.
+    """
+    commune_safe = "".join(c for c in commune_name if c.isalnum() or c in " -_").strip()
+    commune_folder = os.path.join(output_dir, commune_safe)
+    os.makedirs(commune_folder, exist_ok=True)
+    return commune_folder
+
+class LinkExtractor(HTMLParser):
+    """
+    Parseur événementiel (style SAX) : collecte en un seul passage les href des balises <a>
+    acceptés par `accept`, au fur et à mesure que le HTML lui est fourni.
+    """
+    def __init__(self, accept: Callable[[str], bool]):
+        super().__init__()
+        self._accept = accept
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.pending: List[str] = []
+
+    def feed_bytes(self, chunk: bytes, final: bool = False) -> List[str]:
+        """
+        Analyse un morceau de page et retourne les liens trouvés depuis le dernier appel.
+        """
+        self.feed(self._decoder.decode(chunk, final=final))
+        if final:
+            self.close()
+        links, self.pending = self.pending, []
+        return links
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'a':
+            return
+        for name, value in attrs:
+            if name == 'href' and value is not None:
+                if self._accept(value):
+                    self.pending.append(value)
+                return
+
+def iter_links(chunks: Iterable[bytes], accept: Callable[[str], bool]) -> Iterator[str]:
+    """
+    Produit les liens acceptés dès que le morceau de page qui les contient est reçu.
+    """
+    parser = LinkExtractor(accept)
+    for chunk in chunks:
+        yield from parser.feed_bytes(chunk)
+    yield from parser.feed_bytes(b"", final=True)
+
+@lru_cache(maxsize=32)
+def file_type_pattern(file_types: tuple) -> re.Pattern:
+    """
+    Expression régulière précompilée reconnaissant toutes les extensions demandées en une fois.
+    """
+    suffixes = "|".join(re.escape(file_type.lower()) for file_type in file_types)
+    return re.compile(rf"\.(?:{suffixes})$", re.IGNORECASE)
+
+def extract_dataset_links(content: bytes) -> List[str]:
+    """
+    Extrait les liens uniques vers des pages /datasets/ d'une page de recherche.
+    """
+    links = iter_links([content], lambda href: '/datasets/' in href)
+    return list(dict.fromkeys(links))
+
+def file_link_extractor(file_types: List[str]) -> LinkExtractor:
+    pattern = file_type_pattern(tuple(file_types))
+    return LinkExtractor(lambda href: pattern.search(href) is not None)
+
+def iter_file_links(chunks: Iterable[bytes], file_types: List[str], trace=None) -> Iterator[str]:
+    """
+    Produit, en un seul passage sur le flux de la page, les URLs absolues des fichiers aux extensions demandées.
+    trace (genia.metrics.RequestTrace) reçoit les phases transfer / parse ; le temps passé par
+    l'appelant entre deux liens en est exclu.
+    """
+    trace = trace or NullTrace()
+    parser = file_link_extractor(file_types)
+    for chunk in chunks:
+        trace.mark("transfer")
+        trace.bytes += len(chunk)
+        links = parser.feed_bytes(chunk)
+        trace.mark("parse")
+        for file_url in links:
+            yield urljoin(BASE_URL, file_url)
+        trace.exclude()
+    links = parser.feed_bytes(b"", final=True)
+    trace.mark("parse")
+    for file_url in links:
+        yield urljoin(BASE_URL, file_url)
+    trace.exclude()
+
+def extract_file_links(content: bytes, file_types: List[str]) -> List[str]:
+    """
+    Extrait d'une page de dataset les URLs absolues des fichiers aux extensions demandées.
+    """
+    return list(iter_file_links([content], file_types))
+
+def write_download_summary(commune_folder: str, downloaded_summary: List[str]) -> None:
+    """
+    Écrit le résumé des téléchargements d'une commune dans download_summary.json.
+    """
+    summary_file = os.path.join(commune_folder, SUMMARY_FILENAME)
+    try:
+        with open(summary_file, 'w', encoding='utf-8') as f:
+            json.dump(downloaded_summary, f, indent=4, ensure_ascii=False)
+        logger.info(f"Résumé des téléchargements généré : {summary_file}")
+    except IOError as e:
+        logger.error(f"Erreur lors de l'écriture du résumé {summary_file} : {e}")
+
+# ----------------------------------------------------------------
+# Fonctions de téléchargement et de scraping
+# ----------------------------------------------------------------
+
+def download_file(url: str, output_folder: str, downloaded_files: Set[str], session: requests.Session,
+                  store: Optional[DownloadStore] = None, metrics: Optional[CrawlMetrics] = None) -> Optional[str]:
+    """
+    Télécharge un fichier à partir de l'URL et le sauvegarde dans output_folder.
+    downloaded_files contient les URLs déjà traitées pendant la collecte en cours ; l'index
+    persistant (store) évite de retélécharger un fichier inchangé (ETag / Last-Modified),
+    reprend les fichiers partiels et déduplique les contenus identiques.
+    Retourne le chemin local si un nouveau contenu a été ajouté au dossier.
+    """
+    if url in downloaded_files:
+        logger.info(f"Fichier déjà traité : {url}")
+        return None
+    downloaded_files.add(url)
+    own_store = store is None
+    if own_store:
+        store = DownloadStore(os.path.dirname(os.path.normpath(output_folder)))
+    try:
+        with start_trace(metrics, url, "download", os.path.basename(os.path.normpath(output_folder))) as trace:
+            local_filename, status = store.fetch(url, output_folder, session, trace=trace)
+    except (requests.RequestException, IOError) as e:
+        logger.error(f"Erreur lors du téléchargement de {url} : {e}")
+        return None
+    finally:
+        if own_store:
+            store.close()
+    if status == STATUS_NOT_MODIFIED:
+        logger.info(f"Fichier inchangé : {local_filename}")
+        return None
+    if status == STATUS_DEDUPLICATED:
+        logger.info(f"Fichier dédupliqué (lien vers un contenu existant) : {local_filename}")
+    else:
+        logger.info(f"Fichier téléchargé : {local_filename}")
+    return local_filename
+
+def google_dorks(commune_name: str, file_types: List[str]) -> None:
+    """
+    Génère et affiche (dans les logs) des requêtes Google Dorks pour une recherche manuelle.
+    """
+    dork_templates = [
+        "site:data.gouv.fr {commune} {doc_type} filetype:{filetype}",
+        "site:georisques.gouv.fr {commune} {doc_type} filetype:{filetype}",
+        "site:insee.fr {commune} {doc_type} filetype:{filetype}",
+        "site:urbanisme.gouv.fr {commune} {doc_type} filetype:{filetype}",
+        "site:geoportail-urbanisme.gouv.fr {commune} {doc_type} filetype:{filetype}"
+    ]
+    for file_type in file_types:
+        for doc_type in DOCUMENT_TYPES:
+            for template in dork_templates:
+                dork_query = template.format(commune=commune_name, doc_type=doc_type, filetype=file_type)
+                logger.info(f"Requête Google Dork : {dork_query}")
+
+def process_dataset_page(full_link: str, file_types: List[str], commune_folder: str, downloaded_files: Set[str], session: requests.Session,
+                         store: Optional[DownloadStore] = None, metrics: Optional[CrawlMetrics] = None) -> List[str]:
+    """
+    Pour une page donnée de dataset, recherche et télécharge les fichiers correspondant aux types spécifiés.
+    Retourne la liste des fichiers téléchargés pour cette page.
+    """
+    downloaded_summary = []
+    try:
+        with start_trace(metrics, full_link, "dataset_page", os.path.basename(commune_folder)) as trace:
+            with session.get(full_link, stream=True, timeout=10) as dataset_page:
+                trace.mark("ttfb")
+                trace.status = dataset_page.status_code
+                dataset_page.raise_for_status()
+                # Chaque fichier est téléchargé dès que son lien est lu, sans attendre la fin de la page
+                for absolute_url in iter_file_links(dataset_page.iter_content(chunk_size=16384), file_types, trace):
+                    result = download_file(absolute_url, commune_folder, downloaded_files, session, store, metrics)
+                    if result:
+                        downloaded_summary.append(result)
+    except requests.RequestException as e:
+        logger.error(f"Erreur lors de l'accès à {full_link} : {e}")
+    return downloaded_summary
+
+def download_from_api(commune_name: str, file_types: List[str], commune_folder: str, downloaded_files: Set[str],
+                      session: requests.Session, store: DownloadStore, max_workers: int = 10,
+                      api_url: str = API_URL, metrics: Optional[CrawlMetrics] = None) -> List[str]:
+    """
+    Découvre les ressources de la commune via l'API JSON (pagination par curseur, lecture en flux)
+    et lance chaque téléchargement dès que son URL est connue.
+    """
+    downloaded_summary = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(download_file, url, commune_folder, downloaded_files, session, store, metrics)
+            for url in resource_urls(iter_datasets(session, commune_name, api_url=api_url, metrics=metrics,
+                                                   commune_label=os.path.basename(commune_folder)), file_types)
+        ]
+        logger.info(f"Pour la commune '{commune_name}', trouvé {len(futures)} fichiers via l'API.")
+        for future in as_completed(futures):
+            result = future.result()
+            if result:
+                downloaded_summary.append(result)
+    return downloaded_summary
+
+def find_and_download_files(commune_name: str, output_dir: str, file_types: List[str], max_workers: int = 10,
+                            backend: str = "html", api_url: str = API_URL,
+                            metrics: Optional[CrawlMetrics] = None) -> List[str]:
+    """
+    Recherche des datasets pour la commune donnée, télécharge les fichiers correspondants et retourne un résumé des téléchargements.
+    backend="api" utilise l'API JSON de data.gouv.fr au lieu d'analyser les pages HTML.
+    metrics (genia.metrics.CrawlMetrics) collecte les temps par requête et le débit de la commune.
+    """
+    if backend not in DISCOVERY_BACKENDS:
+        raise ValueError(f"Backend de découverte inconnu : {backend}")
+    started = time.monotonic()
+    commune_folder = commune_folder_path(commune_name, output_dir)
+    commune_label = os.path.basename(commune_folder)
+    downloaded_files: Set[str] = set()
+    downloaded_summary: List[str] = []
+    search_url = SEARCH_URL.format(commune=commune_name)
+    session = requests.Session()
+    store = DownloadStore(output_dir)
+    try:
+        if backend == "api":
+            downloaded_summary = download_from_api(commune_name, file_types, commune_folder, downloaded_files,
+                                                   session, store, max_workers, api_url, metrics)
+        else:
+            with start_trace(metrics, search_url, "search", commune_label) as trace:
+                response = session.get(search_url, timeout=10)
+                trace.mark("transfer")
+                trace.status = response.status_code
+                trace.bytes = len(response.content)
+                response.raise_for_status()
+                unique_links = extract_dataset_links(response.content)
+                trace.mark("parse")
+            logger.info(f"Pour la commune '{commune_name}', trouvé {len(unique_links)} jeux de données.")
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(
+                        process_dataset_page,
+                        urljoin(BASE_URL, link),
+                        file_types,
+                        commune_folder,
+                        downloaded_files,
+                        session,
+                        store,
+                        metrics
+                    )
+                    for link in unique_links
+                ]
+                for future in as_completed(futures):
+                    downloaded_summary.extend(future.result())
+        # Affichage des requêtes Google Dorks dans les logs
+        google_dorks(commune_name, file_types)
+    except (requests.RequestException, ValueError) as e:
+        logger.error(f"Erreur lors de la recherche pour {commune_name} : {e}")
+    store.close()
+    write_download_summary(commune_folder, downloaded_summary)
+    if metrics is not None:
+        metrics.record_commune(commune_label, time.monotonic() - started)
+    return downloaded_summary
@@ -0,0 +1,151 @@
+"""
+Banc d'essai de la compression des vecteurs : rappel, empreinte mémoire et latence selon le niveau de compression.
+
+    python -m genia.vector_benchmark --output vector_benchmark.json
+    python -m genia.vector_benchmark --vectors embeddings.npy --levels float16 int8 pq pq64 --k 10
+
+Pour chaque niveau, une base vectorielle (genia/vector_store.py) est construite et compactée dans un dossier
+temporaire, puis interrogée avec et sans reclassement des candidats sur les vecteurs float32. Le rapport JSON
+contient, par niveau et mode : recall@k (par rapport à une recherche exacte), octets parcourus par recherche
+(codes résidents en mémoire) et par vecteur, taille sur disque des codes, durée du compactage (entraînement
+et encodage) et latence des requêtes (moyenne, p50, p95).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from genia.vector_store import DEFAULT_NPROBE, RERANK_FACTOR, VectorStore, normalize_rows
+
+# ----------------------------------------------------------------
+# Banc d'essai de la compression des vecteurs
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+DEFAULT_LEVELS = ["float32", "float16", "int8", "pq", "pq64"]
+DEFAULT_K = 10
+DEFAULT_RERANK_FACTORS = [0, RERANK_FACTOR, 4 * RERANK_FACTOR]
+
+
+def synthetic_vectors(rows: int = 20000, dimension: int = 256, clusters: int = 100, seed: int = 0) -> np.ndarray:
+    """
+    Vecteurs regroupés autour de centres aléatoires (thèmes des documents), comme des embeddings de morceaux.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension))
+    vectors = centers[rng.integers(0, clusters, rows)] + 0.4 * rng.normal(size=(rows, dimension))
+    return vectors.astype(np.float32)
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    scores = queries @ normalize_rows(vectors).T
+    return [set(np.argpartition(-row, k - 1)[:k]) for row in scores]
+
+
+def run_level(vectors: np.ndarray, queries: np.ndarray, truth: List[set], level: str, k: int, nprobe: int,
+              rerank_factors: List[int]) -> List[Dict]:
+    root = tempfile.mkdtemp(prefix="genia_vector_benchmark_")
+    try:
+        store = VectorStore(root, nprobe=nprobe, compression=level)
+        store.add("benchmark", vectors, [{"chunk_id": str(i)} for i in range(len(vectors))])
+        start = time.perf_counter()
+        store.compact()
+        compact_seconds = time.perf_counter() - start
+        segment = store.segments[0]
+        codes_file = os.path.join(root, segment.name + (".codes.npy" if segment.codec else ".vectors.npy"))
+        results = []
+        for rerank in rerank_factors if segment.codec else [0]:
+            store.rerank = rerank
+            latencies, recall = [], []
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                found = store.search(query, k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                recall.append(len(expected & {int(item["chunk_id"]) for item in found}) / k)
+            results.append({
+                "level": level, "rerank": rerank, "k": k, "nprobe": nprobe,
+                "lists": len(segment.centroids) if segment.centroids is not None else 1,
+                "recall_at_k": round(float(np.mean(recall)), 4),
+                "scan_bytes": int(segment.scan_bytes),
+                "bytes_per_vector": round(segment.scan_bytes / len(segment), 1),
+                "compression_ratio": round(segment.vectors.nbytes / segment.scan_bytes, 1),
+                "codes_file_bytes": os.path.getsize(codes_file),
+                "compact_seconds": round(compact_seconds, 3),
+                "latency_ms_mean": round(float(np.mean(latencies)), 3),
+                "latency_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+                "latency_ms_p95": round(float(np.percentile(latencies, 95)), 3),
+            })
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def run_benchmark(vectors: np.ndarray, levels: List[str], queries: int = 200, k: int = DEFAULT_K,
+                  nprobe: int = DEFAULT_NPROBE, rerank_factors: Optional[List[int]] = None,
+                  source: str = "synthetic", seed: int = 1) -> Dict:
+    rerank_factors = rerank_factors or DEFAULT_RERANK_FACTORS
+    rng = np.random.default_rng(seed)
+    # Requêtes : vecteurs de la base légèrement bruités (questions proches d'un passage existant)
+    picked = vectors[rng.choice(len(vectors), queries, replace=False)]
+    query_vectors = normalize_rows(picked + 0.1 * picked.std() * rng.normal(size=picked.shape))
+    truth = exact_neighbours(vectors, query_vectors, k)
+    report = {
+        "environment": {"python": platform.python_version(), "numpy": np.__version__,
+                        "cpu_count": os.cpu_count(), "platform": platform.platform()},
+        "dataset": {"source": source, "rows": len(vectors), "dimension": vectors.shape[1], "queries": queries},
+        "results": [],
+    }
+    for level in levels:
+        report["results"].extend(run_level(vectors, query_vectors, truth, level, k, nprobe, rerank_factors))
+    return report
+
+
+def format_report(report: Dict) -> str:
+    lines = [f"{'niveau':<8} {'reclass.':>8} {'recall@k':>9} {'octets/vec':>10} {'ratio':>6} "
+             f"{'mémoire (Mo)':>12} {'compact. (s)':>12} {'moy. (ms)':>9} {'p95 (ms)':>9}"]
+    for r in report["results"]:
+        lines.append(f"{r['level']:<8} {r['rerank']:>8} {r['recall_at_k']:>9.3f} {r['bytes_per_vector']:>10.1f} "
+                     f"{r['compression_ratio']:>6.1f} {r['scan_bytes'] / 2 ** 20:>12.2f} "
+                     f"{r['compact_seconds']:>12.2f} {r['latency_ms_mean']:>9.2f} {r['latency_ms_p95']:>9.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m genia.vector_benchmark",
+                                     description="Banc d'essai de la compression des vecteurs (rappel, mémoire, latence).")
+    parser.add_argument("--vectors", help="Fichier .npy d'embeddings (sinon vecteurs synthétiques)")
+    parser.add_argument("--rows", type=int, default=20000, help="Nombre de vecteurs synthétiques")
+    parser.add_argument("--dimension", type=int, default=256, help="Dimension des vecteurs synthétiques")
+    parser.add_argument("--levels", nargs="+", default=DEFAULT_LEVELS,
+                        help="Niveaux de compression : float32, float16, int8, pq, pq<N>")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=DEFAULT_K)
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE, help="Listes IVF parcourues par requête")
+    parser.add_argument("--rerank", type=int, nargs="+", default=DEFAULT_RERANK_FACTORS,
+                        help="Facteurs de reclassement en pleine précision (0 : scores estimés seuls)")
+    parser.add_argument("--output", default="vector_benchmark.json", help="Rapport JSON")
+    args = parser.parse_args(argv)
+
+    if args.vectors:
+        vectors = np.load(args.vectors).astype(np.float32)
+        source = os.path.basename(args.vectors)
+    else:
+        vectors = synthetic_vectors(args.rows, args.dimension)
+        source = f"synthetic({args.rows}x{args.dimension})"
+    report = run_benchmark(vectors, args.levels, queries=args.queries, k=args.k, nprobe=args.nprobe,
+                           rerank_factors=args.rerank, source=source)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    sys.stderr.write(format_report(report) + "\n")
+    print(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
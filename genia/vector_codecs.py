@@ -0,0 +1,214 @@
+from typing import BinaryIO, Dict, Optional, Type
+
+import numpy as np
+
+# ----------------------------------------------------------------
+# Compression des vecteurs de la base vectorielle (float16, int8 scalaire, quantification par produit)
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+# Un codec est entraîné sur les vecteurs d'un segment (normalisés), les encode en codes compacts et estime
+# le produit scalaire entre une requête et des codes sans les décompresser entièrement. Les scores estimés
+# servent à présélectionner les candidats, reclassés ensuite sur les vecteurs float32 (genia/vector_store.py).
+SCORE_BATCH = 65536
+PQ_CENTROIDS = 256
+PQ_ITERATIONS = 10
+# Points d'entraînement par sous-espace (64 par centroïde suffisent)
+PQ_SAMPLE = 64 * PQ_CENTROIDS
+DEFAULT_PQ_SUBSPACES = 16
+
+
+def _batched_scores(codes: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    # Conversion en float32 par blocs : la matrice décompressée complète n'est jamais allouée
+    return np.concatenate([np.asarray(codes[i:i + SCORE_BATCH], dtype=np.float32) @ weights
+                           for i in range(0, len(codes), SCORE_BATCH)]) if len(codes) else np.zeros(0, np.float32)
+
+
+class Codec:
+    level = ""
+
+    def train(self, vectors: np.ndarray) -> "Codec":
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def bytes_per_vector(self, dimension: int) -> int:
+        raise NotImplementedError
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> "Codec":
+        return self
+
+
+class Float32Codec(Codec):
+    """
+    Sans compression : les codes sont les vecteurs eux-mêmes.
+    """
+    level = "float32"
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float32)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return np.asarray(codes @ query)
+
+    def bytes_per_vector(self, dimension: int) -> int:
+        return 4 * dimension
+
+
+class Float16Codec(Codec):
+    level = "float16"
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float16)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return _batched_scores(codes, query)
+
+    def bytes_per_vector(self, dimension: int) -> int:
+        return 2 * dimension
+
+
+class ScalarInt8Codec(Codec):
+    """
+    Quantification scalaire sur 8 bits, par dimension : x ≈ low + step * code (code de 0 à 255).
+    """
+    level = "int8"
+
+    def __init__(self):
+        self.low: Optional[np.ndarray] = None
+        self.step: Optional[np.ndarray] = None
+
+    def train(self, vectors: np.ndarray) -> "ScalarInt8Codec":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.low = vectors.min(axis=0)
+        span = vectors.max(axis=0) - self.low
+        self.step = np.where(span > 0, span / 255, 1).astype(np.float32)
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((np.asarray(vectors, dtype=np.float32) - self.low) / self.step)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # q·x ≈ q·low + (q * step)·code
+        return _batched_scores(codes, query * self.step) + float(query @ self.low)
+
+    def bytes_per_vector(self, dimension: int) -> int:
+        return dimension
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"low": self.low, "step": self.step}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> "ScalarInt8Codec":
+        self.low, self.step = state["low"], state["step"]
+        return self
+
+
+class ProductQuantizer(Codec):
+    """
+    Quantification par produit : le vecteur est découpé en `subspaces` sous-vecteurs, chacun remplacé par
+    l'indice (1 octet) du plus proche de 256 centroïdes appris par k-means. Les scores sont calculés par
+    tables de correspondance (produit scalaire de la requête avec chaque centroïde de chaque sous-espace).
+    """
+    level = "pq"
+
+    def __init__(self, subspaces: int = DEFAULT_PQ_SUBSPACES, seed: int = 0):
+        self.subspaces = subspaces
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape[1] % self.subspaces:
+            raise ValueError(f"La dimension {vectors.shape[1]} n'est pas divisible par {self.subspaces} sous-espaces.")
+        return vectors.reshape(len(vectors), self.subspaces, -1)
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # ||c||² - 2 x·c (||x||² ne change pas le plus proche), calculé en place
+        distances = points @ centroids.T
+        distances *= -2
+        distances += (centroids ** 2).sum(axis=1)
+        return np.argmin(distances, axis=1)
+
+    def train(self, vectors: np.ndarray) -> "ProductQuantizer":
+        rng = np.random.default_rng(self.seed)
+        if len(vectors) > PQ_SAMPLE:
+            vectors = np.asarray(vectors[np.sort(rng.choice(len(vectors), PQ_SAMPLE, replace=False))])
+        parts = self._split(vectors)
+        count = min(PQ_CENTROIDS, len(parts))
+        self.centroids = np.zeros((self.subspaces, PQ_CENTROIDS, parts.shape[2]), dtype=np.float32)
+        for m in range(self.subspaces):
+            points = np.ascontiguousarray(parts[:, m])
+            centroids = points[rng.choice(len(points), count, replace=False)].copy()
+            for _ in range(PQ_ITERATIONS):
+                assignment = self._nearest(points, centroids)
+                sums = np.stack([np.bincount(assignment, weights=points[:, d], minlength=count)
+                                 for d in range(points.shape[1])], axis=1).astype(np.float32)
+                sizes = np.bincount(assignment, minlength=count)
+                # Centroïdes vides : réinitialisés sur des points tirés au hasard
+                empty = sizes == 0
+                sums[empty] = points[rng.choice(len(points), int(empty.sum()))]
+                sizes[empty] = 1
+                centroids = (sums / sizes[:, None]).astype(np.float32)
+            self.centroids[m, :count] = centroids
+            # Avec moins de 256 points d'entraînement, les indices restants (copies du premier) ne sont jamais attribués
+            self.centroids[m, count:] = centroids[0]
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for i in range(0, len(vectors), SCORE_BATCH):
+            parts = self._split(vectors[i:i + SCORE_BATCH])
+            for m in range(self.subspaces):
+                codes[i:i + len(parts), m] = self._nearest(np.ascontiguousarray(parts[:, m]), self.centroids[m])
+        return codes
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        tables = np.einsum("mkd,md->mk", self.centroids, query.astype(np.float32).reshape(self.subspaces, -1))
+        scores = np.zeros(len(codes), dtype=np.float32)
+        for m in range(self.subspaces):
+            scores += tables[m][codes[:, m]]
+        return scores
+
+    def bytes_per_vector(self, dimension: int) -> int:
+        return self.subspaces
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"centroids": self.centroids}
+
+    def load_state(self, state: Dict[str, np.ndarray]) -> "ProductQuantizer":
+        self.centroids = state["centroids"]
+        self.subspaces = len(self.centroids)
+        return self
+
+
+CODECS: Dict[str, Type[Codec]] = {codec.level: codec for codec in
+                                  (Float32Codec, Float16Codec, ScalarInt8Codec, ProductQuantizer)}
+
+
+def make_codec(level: str) -> Codec:
+    """
+    float32, float16, int8, pq (16 sous-espaces) ou pq<N> (N sous-espaces, N octets par vecteur).
+    """
+    if level.startswith("pq") and level[2:].isdigit():
+        return ProductQuantizer(int(level[2:]))
+    try:
+        return CODECS[level]()
+    except KeyError:
+        raise ValueError(f"Niveau de compression inconnu : {level} (attendu : {', '.join(CODECS)}, pq<N>)") from None
+
+
+def save_codec(f: BinaryIO, codec: Codec) -> None:
+    np.savez(f, level=np.array(codec.level), **codec.state())
+
+
+def load_codec(path: str) -> Codec:
+    with np.load(path) as state:
+        return make_codec(str(state["level"])).load_state({key: state[key] for key in state.files if key != "level"})
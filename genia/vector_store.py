@@ -0,0 +1,473 @@
+import os
+import json
+import fcntl
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from genia.rag_pipeline import Passage
+from genia.vector_codecs import Codec, load_codec, make_codec, save_codec
+
+# ----------------------------------------------------------------
+# Base vectorielle du corpus (index IVF, ajouts incrémentaux, suppression par document)
+# Créé par CAFAM pour le Hackathon HGEN IA 2025
+# ----------------------------------------------------------------
+# Un dossier contient un manifeste (manifest.json) et des segments :
+#   - un segment de base, indexé en IVF : centroïdes et vecteurs triés par liste (offsets de chaque liste) ;
+#   - des segments delta ajoutés à chaque document, parcourus exhaustivement jusqu'au prochain compactage.
+# Vecteurs (.npy, float32 normalisés) et métadonnées (.arrow, Arrow IPC colonnaire : document, page, positions,
+# texte) sont projetés en mémoire : les processus de recherche partagent les mêmes pages. Les suppressions sont
+# des pierres tombales (identifiants de lignes) jusqu'au compactage, qui réécrit un segment de base unique.
+# Les écritures sont sérialisées par un verrou de fichier ; le manifeste est remplacé atomiquement.
+# Le segment de base peut être compressé (genia/vector_codecs.py : float16, int8, pq) : la recherche parcourt
+# alors les codes compacts, seuls résidents en mémoire, puis reclasse les meilleurs candidats sur les vecteurs
+# float32 dont seules les lignes concernées sont lues.
+logger = logging.getLogger(__name__)
+
+VECTOR_STORE_DIR = os.environ.get("GENIA_VECTOR_STORE", os.path.join(tempfile.gettempdir(), "genia_vector_store"))
+MANIFEST = "manifest.json"
+# Pierres tombales d'une génération : référencées par le manifeste, elles changent avec lui en une écriture
+TOMBSTONES = "tombstones-{generation:06d}.npy"
+LOCK_FILE = ".lock"
+VECTOR_COMPRESSION = os.environ.get("GENIA_VECTOR_COMPRESSION", "float32")
+DEFAULT_NPROBE = 8
+# Candidats reclassés en pleine précision : RERANK_FACTOR * k par segment compressé
+RERANK_FACTOR = 4
+# En dessous de ce nombre de vecteurs, le segment de base reste une seule liste (recherche exacte)
+MIN_IVF_ROWS = 4096
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 256
+ASSIGN_BATCH = 65536
+# Compactage quand les deltas ou les lignes supprimées dépassent cette fraction du segment de base
+COMPACT_DELTA_RATIO = 0.2
+COMPACT_DELETED_RATIO = 0.2
+MIN_COMPACT_ROWS = 1024
+
+METADATA_SCHEMA = pa.schema([
+    ("row_id", pa.int64()),
+    ("doc_id", pa.string()),
+    ("chunk_id", pa.string()),
+    ("page", pa.int32()),
+    ("start", pa.int64()),
+    ("end", pa.int64()),
+    ("section", pa.string()),
+    ("text", pa.string()),
+])
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def default_nlist(rows: int) -> int:
+    return 1 if rows < MIN_IVF_ROWS else int(np.sqrt(rows))
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """
+    k-means sphérique (similarité cosinus) sur un échantillon des vecteurs.
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * KMEANS_SAMPLE_PER_LIST)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = ~np.bincount(assignment, minlength=nlist).astype(bool)
+        # Listes vides : réinitialisées sur des points tirés au hasard
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.concatenate([np.argmax(vectors[i:i + ASSIGN_BATCH] @ centroids.T, axis=1)
+                           for i in range(0, len(vectors), ASSIGN_BATCH)]) if len(vectors) else np.zeros(0, int)
+
+
+def _atomic_save(path: str, write) -> None:
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _top(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(scores) <= k:
+        return rows, scores
+    top = np.argpartition(-scores, k - 1)[:k]
+    return rows[top], scores[top]
+
+
+class Segment:
+    """
+    Segment ouvert en lecture : vecteurs, identifiants et métadonnées projetés en mémoire.
+    """
+    def __init__(self, root: str, info: Dict):
+        self.name = info["name"]
+        base = os.path.join(root, self.name)
+        self.vectors = np.load(base + ".vectors.npy", mmap_mode="r")
+        self.ids = np.load(base + ".ids.npy", mmap_mode="r")
+        self.metadata = pa.ipc.open_file(pa.memory_map(base + ".meta.arrow")).read_all()
+        self.centroids = np.load(base + ".centroids.npy") if info.get("ivf") else None
+        self.offsets = np.load(base + ".offsets.npy") if info.get("ivf") else None
+        compressed = info.get("codec", "float32") != "float32"
+        self.codec: Optional[Codec] = load_codec(base + ".codec.npz") if compressed else None
+        self.codes = np.load(base + ".codes.npy", mmap_mode="r") if compressed else self.vectors
+
+    @property
+    def scan_bytes(self) -> int:
+        """
+        Octets parcourus par une recherche exhaustive (codes compressés ou vecteurs float32).
+        """
+        return self.codes.nbytes
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def candidate_rows(self, query: np.ndarray, nprobe: int) -> Optional[np.ndarray]:
+        """
+        Lignes des `nprobe` listes les plus proches (None : toutes les lignes).
+        """
+        if self.centroids is None or nprobe >= len(self.centroids):
+            return None
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists])
+
+    def _scores(self, rows: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+        codes = self.codes if rows is None else self.codes[rows]
+        return np.asarray(codes @ query) if self.codec is None else self.codec.scores(codes, query)
+
+    def search(self, query: np.ndarray, k: int, nprobe: int, deleted: Optional[np.ndarray] = None,
+               rerank: int = RERANK_FACTOR) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sur un segment compressé, les `rerank * k` meilleurs candidats (scores estimés) sont reclassés
+        sur les vecteurs float32 ; rerank=0 retourne directement les scores estimés.
+        """
+        rows = self.candidate_rows(query, nprobe)
+        scores = self._scores(rows, query)
+        if rows is None:
+            rows = np.arange(len(scores))
+        if deleted is not None and len(deleted):
+            alive = ~np.isin(self.ids[rows], deleted)
+            rows, scores = rows[alive], scores[alive]
+        if self.codec is not None and rerank:
+            rows, _ = _top(rows, scores, rerank * k)
+            rows = np.sort(rows)
+            scores = np.asarray(self.vectors[rows] @ query)
+        return _top(rows, scores, k)
+
+    def row_metadata(self, rows: Sequence[int]) -> List[Dict]:
+        return self.metadata.take(pa.array(rows, type=pa.int64())).to_pylist()
+
+
+class VectorStore:
+    def __init__(self, root: str = VECTOR_STORE_DIR, dimension: Optional[int] = None, nprobe: int = DEFAULT_NPROBE,
+                 compression: Optional[str] = None, rerank: int = RERANK_FACTOR):
+        """
+        compression : niveau appliqué au segment de base au prochain compactage (par défaut celui de la base,
+        sinon GENIA_VECTOR_COMPRESSION) ; rerank : facteur de candidats reclassés en pleine précision.
+        """
+        if compression is not None:
+            make_codec(compression)
+        self.root = root
+        self.nprobe = nprobe
+        self.compression = compression
+        self.rerank = rerank
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        # (st_ino, st_mtime_ns) du manifeste lu : os.replace change toujours l'inode, même quand deux écritures
+        # tombent dans le même intervalle d'horodatage (systèmes de fichiers à mtime grossier)
+        self._manifest_stat = None
+        self.manifest: Dict = {"dimension": dimension, "next_row_id": 0, "generation": 0, "segments": []}
+        self.segments: List[Segment] = []
+        self.tombstones = np.zeros(0, dtype=np.int64)
+        self._refresh()
+
+    # ------------------------------------------------------------
+    # État sur disque
+    # ------------------------------------------------------------
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _refresh(self, force: bool = False) -> None:
+        """
+        Relit le manifeste s'il a changé (écriture par un autre processus).
+        """
+        try:
+            stat = os.stat(self._path(MANIFEST))
+        except FileNotFoundError:
+            return
+        signature = (stat.st_ino, stat.st_mtime_ns)
+        if signature == self._manifest_stat and not force:
+            return
+        with open(self._path(MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        try:
+            segments = [Segment(self.root, info) for info in manifest["segments"]]
+            tombstones = (np.load(self._path(manifest["tombstones"])) if manifest.get("tombstones")
+                          else np.zeros(0, dtype=np.int64))
+        except FileNotFoundError:
+            # Écriture concurrente : les fichiers de ce manifeste viennent d'être remplacés, on relit le nouveau
+            return self._refresh(force=True)
+        with self._lock:
+            self.manifest, self.segments, self.tombstones = manifest, segments, tombstones
+            self._manifest_stat = signature
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        with open(self._path(LOCK_FILE), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _commit(self, manifest: Dict, tombstones: Optional[np.ndarray] = None) -> None:
+        """
+        Publie une nouvelle génération : le remplacement du manifeste rend visibles ensemble
+        les nouveaux segments et les nouvelles pierres tombales.
+        """
+        previous = self.manifest.get("tombstones")
+        manifest["generation"] += 1
+        if tombstones is not None:
+            manifest["tombstones"] = None
+            if len(tombstones):
+                manifest["tombstones"] = TOMBSTONES.format(generation=manifest["generation"])
+                _atomic_save(self._path(manifest["tombstones"]), lambda f: np.save(f, tombstones))
+        _atomic_save(self._path(MANIFEST), lambda f: f.write(json.dumps(manifest, indent=1).encode("utf-8")))
+        self._refresh(force=True)
+        if previous and previous != manifest.get("tombstones"):
+            os.remove(self._path(previous))
+
+    def _write_segment(self, name: str, vectors: np.ndarray, ids: np.ndarray, metadata: pa.Table,
+                       centroids: Optional[np.ndarray] = None, offsets: Optional[np.ndarray] = None,
+                       codec: Optional[Codec] = None) -> Dict:
+        base = self._path(name)
+        _atomic_save(base + ".vectors.npy", lambda f: np.save(f, np.ascontiguousarray(vectors, dtype=np.float32)))
+        _atomic_save(base + ".ids.npy", lambda f: np.save(f, np.asarray(ids, dtype=np.int64)))
+
+        def write_metadata(f):
+            with pa.ipc.new_file(f, METADATA_SCHEMA) as writer:
+                writer.write_table(metadata)
+        _atomic_save(base + ".meta.arrow", write_metadata)
+        if centroids is not None:
+            _atomic_save(base + ".centroids.npy", lambda f: np.save(f, centroids))
+            _atomic_save(base + ".offsets.npy", lambda f: np.save(f, offsets))
+        info = {"name": name, "rows": len(ids), "ivf": centroids is not None}
+        if codec is not None and codec.level != "float32":
+            _atomic_save(base + ".codes.npy", lambda f: np.save(f, codec.encode(vectors)))
+            _atomic_save(base + ".codec.npz", lambda f: save_codec(f, codec))
+            info["codec"] = codec.level
+        return info
+
+    def _remove_segment_files(self, name: str) -> None:
+        # Les processus qui ont encore le segment projeté en mémoire continuent de le lire (POSIX)
+        for suffix in (".vectors.npy", ".ids.npy", ".meta.arrow", ".centroids.npy", ".offsets.npy", ".codes.npy",
+                       ".codec.npz"):
+            try:
+                os.remove(self._path(name + suffix))
+            except FileNotFoundError:
+                pass
+
+    # ------------------------------------------------------------
+    # Écritures
+    # ------------------------------------------------------------
+    def _live_rows(self, doc_id: str) -> np.ndarray:
+        rows = [np.asarray(segment.metadata.column("row_id").filter(
+            pc.equal(segment.metadata.column("doc_id"), doc_id)).to_numpy(), dtype=np.int64)
+            for segment in self.segments]
+        return np.setdiff1d(np.concatenate(rows + [np.zeros(0, dtype=np.int64)]), self.tombstones)
+
+    def _stage_segment(self, manifest: Dict, doc_id: str, vectors: np.ndarray, metadata: Sequence[Dict]) -> None:
+        """
+        Écrit le segment delta d'un document et l'ajoute au manifeste en préparation (rien n'est publié
+        avant _commit ; en cas d'erreur, les fichiers écrits sont supprimés).
+        """
+        if manifest["dimension"] is None:
+            manifest["dimension"] = vectors.shape[1]
+        elif manifest["dimension"] != vectors.shape[1]:
+            raise ValueError(f"Dimension {vectors.shape[1]} incompatible avec la base ({manifest['dimension']}).")
+        first = manifest["next_row_id"]
+        ids = np.arange(first, first + len(vectors), dtype=np.int64)
+        table = pa.Table.from_pylist([{
+            "row_id": int(row_id), "doc_id": doc_id, "chunk_id": item.get("chunk_id"),
+            "page": item.get("page"), "start": item.get("start"), "end": item.get("end"),
+            "section": item.get("section"), "text": item.get("text"),
+        } for row_id, item in zip(ids, metadata)], schema=METADATA_SCHEMA)
+        name = f"delta-{manifest['generation'] + 1:06d}"
+        try:
+            manifest["segments"].append(self._write_segment(name, vectors, ids, table))
+        except BaseException:
+            self._remove_segment_files(name)
+            raise
+        manifest["next_row_id"] = first + len(vectors)
+
+    def add(self, doc_id: str, vectors: np.ndarray, metadata: Sequence[Dict]) -> int:
+        """
+        Ajoute les vecteurs d'un document dans un nouveau segment delta ; `metadata[i]` décrit le vecteur i
+        (chunk_id, page, start, end, section, text). Retourne le nombre de lignes ajoutées.
+        """
+        return self.replace(doc_id, vectors, metadata, delete_previous=False)
+
+    def delete(self, doc_id: str) -> int:
+        """
+        Supprime (logiquement) toutes les lignes d'un document ; retourne leur nombre.
+        """
+        with self._writing():
+            rows = self._live_rows(doc_id)
+            if not len(rows):
+                return 0
+            self._commit(json.loads(json.dumps(self.manifest)), np.union1d(self.tombstones, rows))
+        logger.info(f"{len(rows)} vecteurs supprimés pour {doc_id}")
+        self.maybe_compact()
+        return len(rows)
+
+    def replace(self, doc_id: str, vectors: np.ndarray, metadata: Sequence[Dict], delete_previous: bool = True) -> int:
+        """
+        Remplace les vecteurs d'un document déjà indexé (nouvelle version du fichier). Suppression de
+        l'ancienne version et ajout de la nouvelle sont publiés ensemble : les lecteurs voient l'une ou
+        l'autre, et l'ancienne reste en place si l'ajout échoue.
+        """
+        vectors = normalize_rows(vectors)
+        if len(vectors) != len(metadata):
+            raise ValueError("Un dictionnaire de métadonnées est attendu par vecteur.")
+        with self._writing():
+            manifest = json.loads(json.dumps(self.manifest))
+            deleted = self._live_rows(doc_id) if delete_previous else np.zeros(0, dtype=np.int64)
+            if len(vectors):
+                self._stage_segment(manifest, doc_id, vectors, metadata)
+            elif not len(deleted):
+                return 0
+            self._commit(manifest, np.union1d(self.tombstones, deleted) if len(deleted) else None)
+        logger.info(f"{len(vectors)} vecteurs ajoutés pour {doc_id} ({len(deleted)} remplacés)")
+        self.maybe_compact()
+        return len(vectors)
+
+    def needs_compaction(self) -> bool:
+        base_rows = sum(s["rows"] for s in self.manifest["segments"] if s["ivf"])
+        delta_rows = sum(s["rows"] for s in self.manifest["segments"] if not s["ivf"])
+        reference = max(base_rows, MIN_COMPACT_ROWS)
+        return (delta_rows > COMPACT_DELTA_RATIO * reference
+                or len(self.tombstones) > COMPACT_DELETED_RATIO * reference)
+
+    def maybe_compact(self) -> bool:
+        if self.needs_compaction():
+            self.compact()
+            return True
+        return False
+
+    def compact(self, nlist: Optional[int] = None, compression: Optional[str] = None) -> None:
+        """
+        Réécrit toutes les lignes vivantes dans un segment de base IVF unique (centroïdes et codec réentraînés).
+        """
+        with self._writing():
+            level = compression or self.compression or self.manifest.get("compression") or VECTOR_COMPRESSION
+            old = list(self.segments)
+            vectors, ids, tables = [], [], []
+            for segment in old:
+                alive = ~np.isin(segment.ids, self.tombstones)
+                vectors.append(np.asarray(segment.vectors)[alive])
+                ids.append(np.asarray(segment.ids)[alive])
+                tables.append(segment.metadata.filter(pa.array(alive)))
+            manifest = json.loads(json.dumps(self.manifest))
+            manifest["segments"] = []
+            manifest["compression"] = level
+            if old:
+                vectors, ids = np.concatenate(vectors), np.concatenate(ids)
+                table = pa.concat_tables(tables)
+            if old and len(ids):
+                nlist = min(nlist or default_nlist(len(ids)), len(ids))
+                centroids = train_centroids(vectors, nlist) if nlist > 1 else normalize_rows(vectors.mean(0, keepdims=True))
+                lists = assign_lists(vectors, centroids)
+                # Lignes triées par liste : chaque liste est une plage contiguë du fichier de vecteurs
+                order = np.argsort(lists, kind="stable")
+                offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=len(centroids)))])
+                vectors = vectors[order]
+                manifest["segments"].append(self._write_segment(
+                    f"base-{manifest['generation'] + 1:06d}", vectors, ids[order],
+                    table.take(pa.array(order)), centroids, offsets, make_codec(level).train(vectors)))
+            self._commit(manifest, np.zeros(0, dtype=np.int64))
+            for segment in old:
+                self._remove_segment_files(segment.name)
+        logger.info(f"Base vectorielle compactée : {len(self)} vecteurs")
+
+    # ------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------
+    def __len__(self) -> int:
+        return sum(len(s) for s in self.segments) - len(self.tombstones)
+
+    @property
+    def version(self) -> str:
+        """
+        Identifiant de l'état publié (génération et inode du manifeste) : change à chaque ajout,
+        suppression ou compactage, y compris par un autre processus. Sert de clé aux caches de résultats.
+        """
+        self._refresh()
+        with self._lock:
+            inode = self._manifest_stat[0] if self._manifest_stat else 0
+            return f"{self.manifest['generation']}-{inode}"
+
+    def search(self, vector: Sequence[float], k: int = 10, nprobe: Optional[int] = None) -> List[Dict]:
+        """
+        Les k lignes les plus proches (similarité cosinus) avec leurs métadonnées et leur score.
+        """
+        self._refresh()
+        with self._lock:
+            segments, tombstones = self.segments, self.tombstones
+        query = normalize_rows(np.asarray(vector, dtype=np.float32)[None, :])[0]
+        found = []
+        for index, segment in enumerate(segments):
+            rows, scores = segment.search(query, k, nprobe or self.nprobe, tombstones, self.rerank)
+            found.extend((float(score), index, int(row)) for row, score in zip(rows, scores))
+        found.sort(reverse=True)
+        results = []
+        for score, index, row in found[:k]:
+            item = segments[index].row_metadata([row])[0]
+            item["score"] = score
+            results.append(item)
+        return results
+
+    def documents(self) -> List[str]:
+        doc_ids = set()
+        for segment in self.segments:
+            alive = ~np.isin(segment.ids, self.tombstones)
+            doc_ids.update(segment.metadata.column("doc_id").filter(pa.array(alive)).to_pylist())
+        return sorted(doc_ids)
+
+
+class VectorStoreRetriever:
+    """
+    Étape de recherche du pipeline RAG (genia/rag_pipeline.py) sur la base vectorielle du corpus.
+    """
+    def __init__(self, store: VectorStore, embed: Callable[[str], Sequence[float]]):
+        self.store = store
+        self.embed = embed
+
+    @property
+    def version(self) -> str:
+        return self.store.version
+
+    def retrieve(self, query: str, k: int) -> List[Passage]:
+        passages = []
+        for item in self.store.search(self.embed(query), k):
+            text, score = item.pop("text"), item.pop("score")
+            passages.append(Passage(f"{item['doc_id']}#{item['chunk_id']}", text, score, item))
+        return passages
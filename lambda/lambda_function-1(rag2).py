@@ -1,31 +1,79 @@
+import os
 import json
+from collections import OrderedDict
 #1. import boto3
 import boto3
+from genia.response_cache import ResponseCache, bedrock_embedder
+from genia.rag_pipeline import (
+    GENERATION_MODEL_ID,
+    KnowledgeBaseRetriever,
+    LocalRetriever,
+    PassageIndex,
+    RagPipeline,
+    RagSession,
+    bedrock_generator,
+)
+from genia.vector_store import VectorStore, VectorStoreRetriever
 #2 create client connection with bedrock
 client_bedrock_knowledgebase = boto3.client('bedrock-agent-runtime')
+client_bedrock = boto3.client('bedrock-runtime')
+KNOWLEDGE_BASE_ID = 'O41RCIQ46A'
+MODEL_ARN = 'arn:aws:bedrock:us-west-2::foundation-model/anthropic.claude-instant-v1'
+# Index local (fichiers <chemin>.npz / <chemin>.json), sinon base vectorielle du corpus alimentée par
+# uploadPdfToS3 (GENIA_VECTOR_STORE, volume EFS partagé) ; à défaut, recherche seule dans la base de connaissances
+RAG_INDEX_PATH = os.environ.get('RAG_INDEX_PATH')
+VECTOR_STORE_DIR = os.environ.get('GENIA_VECTOR_STORE')
+MAX_SESSIONS = 500
+# Cache en mémoire : conservé entre les invocations tant que l'environnement Lambda reste chaud
+response_cache = ResponseCache(embed=bedrock_embedder(client_bedrock))
+if RAG_INDEX_PATH:
+    retriever = LocalRetriever(PassageIndex.load(RAG_INDEX_PATH), bedrock_embedder(client_bedrock))
+elif VECTOR_STORE_DIR:
+    retriever = VectorStoreRetriever(VectorStore(VECTOR_STORE_DIR), bedrock_embedder(client_bedrock))
+else:
+    retriever = KnowledgeBaseRetriever(client_bedrock_knowledgebase, KNOWLEDGE_BASE_ID)
+rag = RagPipeline(retriever, bedrock_generator(client_bedrock, GENERATION_MODEL_ID))
+sessions = OrderedDict()
+
+def retrieval_context():
+    """
+    Source des passages pour la clé du cache de réponses ; la version de la base vectorielle change
+    à chaque envoi ou suppression de document.
+    """
+    if RAG_INDEX_PATH:
+        return {'index': RAG_INDEX_PATH}
+    if VECTOR_STORE_DIR:
+        return {'vectorStore': VECTOR_STORE_DIR, 'version': retriever.version}
+    return {'knowledgeBaseId': KNOWLEDGE_BASE_ID}
+
+def get_session(session_id):
+    session = sessions.pop(session_id, None) or RagSession()
+    sessions[session_id] = session
+    while len(sessions) > MAX_SESSIONS:
+        sessions.popitem(last=False)
+    return session
+
 def lambda_handler(event, context):
     #3 Store the user prompt
     print(event['prompt'])
     user_prompt=event['prompt']
-    # 4. Use retrieve and generate API
-    client_knowledgebase = client_bedrock_knowledgebase.retrieve_and_generate(
-    input={
-        'text': user_prompt
-    },
-    retrieveAndGenerateConfiguration={
-        'type': 'KNOWLEDGE_BASE',
-        'knowledgeBaseConfiguration': {
-            'knowledgeBaseId': 'O41RCIQ46A',
-            'modelArn': 'arn:aws:bedrock:us-west-2::foundation-model/anthropic.claude-instant-v1'
-                }
-            })
-            
-    # print(client_knowledgebase)     
-    #print(client_knowledgebase['output']['text'])
-    #print(client_knowledgebase['citations'][0]['generatedResponsePart']['textResponsePart'])
-    response_kbase_final=client_knowledgebase['output']['text']
+    session_id = event.get('sessionId')
+    # Sans session, la réponse ne dépend que de la question
+    lookup = None
+    if session_id is None:
+        lookup = response_cache.lookup(user_prompt, MODEL_ARN, retrieval_context())
+        if lookup.hit:
+            return {
+                'statusCode': 200,
+                'body': lookup.response
+            }
+    # 4. Recherche, reclassement et compression locaux, puis un seul appel de génération
+    result = rag.answer(user_prompt, get_session(session_id) if session_id is not None else None)
+    print(json.dumps({'timings': result.timings, 'cached': result.cached}))
+    response_kbase_final = result.answer
+    if lookup is not None:
+        response_cache.store(lookup, response_kbase_final)
     return {
         'statusCode': 200,
         'body': response_kbase_final
     }
-    
\ No newline at end of file
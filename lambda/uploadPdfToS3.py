@@ -1,54 +1,63 @@
 
 # probleme : il faut ajouter des layers adapter pour la lambda function, hors proposition d'aws
 # pour résume la function permet aux users de televerser un fichier pdf, le code va extraire le texte du pdf, 
-# le resumer et l'indexer avec faiss et titan embeddings
+# le resumer et l'indexer avec titan embeddings dans la base vectorielle du corpus (genia/vector_store.py)
 
-import boto3
 import os
-import tempfile
+import boto3
 import json
-import base64
-from PyPDF2 import PdfReader
-from sentence_transformers import SentenceTransformer
-import faiss
+import numpy as np
+from genia.embeddings import EmbeddingCache, EmbeddingExecutor, bedrock_runtime_client
+from genia.chunking import chunk_pages
+from genia.pdf_ingest import TextPrefix, decode_base64_pdf, ingest_pdf, spool_stream
+from genia.vector_store import VectorStore
 
 s3_client = boto3.client('s3')
 BUCKET_NAME = "sfil-documents-bucket"
 S3_FOLDER = "UploadsFront"
+# Nombre de morceaux envoyés en une fenêtre au calcul des embeddings
+INDEX_BATCH_SIZE = 256
+# Client et pool de requêtes partagés entre les invocations ; le cache (dans /tmp) évite de recalculer
+# les morceaux inchangés quand un document est renvoyé tant que l'environnement reste chaud
+embedder = EmbeddingExecutor(bedrock_runtime_client(), cache=EmbeddingCache())
+# Base vectorielle unique pour tout le corpus, sur un volume partagé (EFS monté sur la lambda,
+# chemin donné par GENIA_VECTOR_STORE) : les lambdas de recherche projettent les mêmes fichiers en mémoire.
+# Pas de dossier par défaut : un index écrit dans le /tmp de la lambda serait invisible pour la recherche et perdu
+VECTOR_STORE_DIR = os.environ.get('GENIA_VECTOR_STORE')
+vector_store = VectorStore(VECTOR_STORE_DIR) if VECTOR_STORE_DIR else None
 
 def lambda_handler(event, context):
     try:
+        if vector_store is None:
+            return {"statusCode": 500, "body": json.dumps({
+                "error": "GENIA_VECTOR_STORE n'est pas défini : indiquez le dossier de la base vectorielle partagée (volume EFS)."
+            })}
+
         # Extraction des données de l'event
         body = json.loads(event["body"])
         file_name = body.get("file_name", "uploaded.pdf")
         file_content_base64 = body.get("file_content")
+        source_key = body.get("s3_key")
+        s3_key = f"{S3_FOLDER}/{file_name}"
 
-        if not file_content_base64:
+        if source_key:
+            # PDF déjà déposé dans S3 (URL présignée) : lu en flux, sans nouvel envoi
+            obj = s3_client.get_object(Bucket=BUCKET_NAME, Key=source_key)
+            source, upload, s3_key = spool_stream(obj["Body"]), False, source_key
+        elif file_content_base64:
+            # Décodage du PDF en Base64 (les pages sont ensuite lues directement dans ces octets)
+            source, upload = decode_base64_pdf(file_content_base64), True
+        else:
             return {"statusCode": 400, "body": json.dumps({"error": "Le fichier est manquant."})}
 
-        # Décodage du  PDF en Base64
-        file_content = base64.b64decode(file_content_base64)
-
-        # Sauvegarde temporaire 
-        temp_file_path = f"/tmp/{file_name}"
-        with open(temp_file_path, "wb") as f:
-            f.write(file_content)
-
-        # Upload vers notre S3
-        s3_key = f"{S3_FOLDER}/{file_name}"
-        s3_client.upload_file(temp_file_path, BUCKET_NAME, s3_key)
-
-        # Extraction du texte du PDF avc pdfreader
-        reader = PdfReader(temp_file_path)
-        full_text = " ".join(page.extract_text() for page in reader.pages if page.extract_text())
+        # Envoi vers notre S3 pendant l'extraction du texte page par page ;
+        # seul le début du document est conservé pour le résumé
+        prefix = TextPrefix()
+        index_status = ingest_pdf(source, s3_client, BUCKET_NAME, s3_key, upload=upload,
+                                  consume=lambda pages: embed_and_index(chunk_pages(prefix.collect(pages)), file_name))
 
         # Résumé du texte avec Mistral 7x8b
-        summary = summarize_text(full_text)
-
-        # Indexation du document avec FAISS et Titan Embeddings
-        index_status = embed_and_index(full_text, file_name)
-
-        os.remove(temp_file_path)  # Suppression du fichier temporaire
+        summary = summarize_text(prefix.text)
 
         return {
             "statusCode": 200,
@@ -79,41 +88,25 @@ def summarize_text(text):
     except Exception as e:
         return f"Erreur lors du résumé : {str(e)}"
 
-# Indexation avec FAISS et Titan
-def embed_and_index(text, file_name):
-    bedrock_client = boto3.client('bedrock', region_name='us-west-2')
-    model_arn = "arn:aws:bedrock:us-west-2::foundation-model/amazon.titan-embeddings-text-v2"
-
-    chunks = [text[i:i+512] for i in range(0, len(text), 512)]
-    embeddings = []
-
+# Indexation avec Titan dans la base vectorielle
+def embed_and_index(chunks, file_name):
+    """
+    chunks : itérable de Chunk (genia/chunking.py), consommé au fil de l'extraction ; les embeddings sont calculés
+    par fenêtres (requêtes parallèles, cache par empreinte du texte). Les vecteurs du document remplacent ensuite
+    ceux de sa version précédente dans la base, avec leurs métadonnées (page, positions, section, texte).
+    """
     try:
-        for chunk in chunks:
-            response = bedrock_client.invoke_model(
-                modelId=model_arn,
-                contentType="application/json",
-                body=json.dumps({"text": chunk})
-            )
-            result = json.loads(response["body"])
-            embedding = result.get("embedding", [])
-            embeddings.append(embedding)
-
-        # Conversion en matrice numpy pour FAISS
-        import numpy as np
-        embedding_matrix = np.array(embeddings)
-
-        # Indexer dans FAISS
-        index = faiss.IndexFlatL2(embedding_matrix.shape[1])
-        index.add(embedding_matrix)
-
-        # Sauvegarde de l'index dans S3
-        index_file = f"/tmp/{file_name}.index"
-        faiss.write_index(index, index_file)
-        s3_client.upload_file(index_file, BUCKET_NAME, f"{S3_FOLDER}/{file_name}.index")
-        os.remove(index_file)
+        metadata, matrices = [], []
+        for window, embedding_matrix in embedder.embed_stream(((chunk, chunk.text) for chunk in chunks),
+                                                              window=INDEX_BATCH_SIZE):
+            metadata.extend(chunk.to_dict() for chunk in window)
+            matrices.append(embedding_matrix)
+        if not matrices:
+            return "Aucun texte à indexer"
+
+        vector_store.replace(file_name, np.concatenate(matrices), metadata)
 
         return "Indexation réussie"
 
     except Exception as e:
         return f"Erreur lors de l'indexation : {str(e)}"
-